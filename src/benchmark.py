@@ -0,0 +1,421 @@
+import argparse
+import json
+import platform
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from docx import Document
+from openpyxl import Workbook
+
+import discovery
+import read_write as rw
+import validate_trace as vt
+
+# Corpus sizes for --scale; each can be overridden with its own argument
+SCALES = {
+    "small": {"txt_files": 20, "lines_per_file": 200, "manual_tests": 200, "prds": 500, "obsolete_srs": 100},
+    "medium": {"txt_files": 200, "lines_per_file": 1000, "manual_tests": 1000, "prds": 5000, "obsolete_srs": 1000},
+    "large": {"txt_files": 2000, "lines_per_file": 1000, "manual_tests": 5000, "prds": 50000, "obsolete_srs": 10000},
+}
+
+VV_REPORT = "ER2228014 v51"
+VERSION_NUM = "1.33.0"
+
+# What's timed: the whole pipeline, or one change against the code it replaced
+MODES = ["pipeline", "txt_metadata", "coverage"]
+
+# Trace sizes for --mode coverage
+COVERAGE_ROWS = [100000, 1000000, 5000000]
+
+# PRD/SRS coverage checks of validate_trace.py: (stage name, check function)
+COVERAGE_CHECKS = [
+    ("prd_has_srs", vt._check_prd_has_srs),
+    ("srs_has_test", vt._check_srs_has_test),
+    ("srs_has_prd", vt._check_srs_has_prd),
+]
+
+
+def generate_corpus(corpus_dir, txt_files, lines_per_file, manual_tests, prds, obsolete_srs, seed=0):
+    """Generates a synthetic V&V corpus laid out like the real inputs
+
+    Creates `ER####### v## .../<version>/RestApiTests/<RC>/<owner>/*.txt` and `Rx` trees,
+    a manual as-runs .docx with "Run ID:" paragraphs and Status tables, an active PRD .xlsx
+    and an obsolete SRS .csv.
+
+    Args:
+        corpus_dir (str or pathlib.Path): folder to write the corpus to
+        txt_files (int): number of .txt files in each of the RestApiTests and Rx trees
+        lines_per_file (int): number of test results per .txt file
+        manual_tests (int): number of tests in the manual as-runs
+        prds (int): number of active PRDs
+        obsolete_srs (int): number of obsolete SRSs
+        seed (int): random seed, so the same arguments always give the same corpus
+
+    Returns:
+        dict: paths of the inputs, with the same keys as the `run.py` arguments
+    """
+    rng = random.Random(seed)
+    corpus_dir = Path(corpus_dir)
+    statuses = ["PASSED", "PASSED", "PASSED", "FAILED", "SKIPPED"]
+    owners = ["TeamCity", "Landy", "sahdal", "vnavanee"]
+
+    # Automated test .txt trees
+    vv_folder = corpus_dir / f"{VV_REPORT} ATT2 Automated as-run"
+    for base_folder_name in ["RestApiTests", "Rx"]:
+        for i in range(txt_files):
+            folder = vv_folder / VERSION_NUM / base_folder_name / f"RC{i % 4 + 1}" / owners[i % len(owners)]
+            folder.mkdir(parents=True, exist_ok=True)
+
+            lines = []
+            for j in range(lines_per_file):
+                tc = rng.randint(1, 5 * prds)
+                if j % 5 == 0:
+                    # Some tests aren't part of the trace
+                    name = f"tests.reports.business.Test_{i}_{j}"
+                elif base_folder_name == "RestApiTests":
+                    name = f"com.philips.sapphire.systemintegrationtests.TC{tc} tests.auth.Test_{i}_{j}"
+                else:
+                    name = f"RxTest TC{tc} Case_{i}_{j}"
+                lines.append(f"{name}|{rng.choice(statuses)}")
+            (folder / f"{i:06d}-LegacyTrace-GroupByMethod.txt").write_text("\n".join(lines) + "\n")
+
+    # Manual as-runs .docx
+    document = Document()
+    for i in range(manual_tests):
+        prd = rng.randint(1, prds)
+        document.add_paragraph(f"PRD US{prd} SRS TC{rng.randint(1, 5 * prds)} TC{rng.randint(1, 5 * prds)} Verify feature {i}")
+        document.add_paragraph(f"Run ID: {50000 + i}")
+        table = document.add_table(rows=3, cols=4)
+        table.cell(0, 0).text = "Status:"
+        table.cell(0, 1).text = rng.choice(["Passed", "Passed", "Failed", "Blocked"])
+        table.cell(1, 1).text = rng.choice(owners)
+        table.cell(1, 2).text = "1. Product"
+        table.cell(1, 3).text = "Sapphire"
+        table.cell(2, 1).text = f"{VERSION_NUM}.{rng.randint(1, 5)}"
+        document.add_paragraph("Test steps and results")
+    as_run_path = corpus_dir / f"{VV_REPORT} ATT1 Manual As-Runs.docx"
+    document.save(as_run_path)
+
+    # Active PRD .xlsx (some referenced PRDs are left out, so validation finds errors)
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(["ID", "Name"])
+    for i in range(1, prds + 1):
+        if rng.random() < 0.95:
+            worksheet.append([f"US{i}", f"Requirement {i}"])
+    active_prd_path = corpus_dir / "PRD.xlsx"
+    workbook.save(active_prd_path)
+
+    # Obsolete SRS .csv
+    obs_srs_path = corpus_dir / "Obsolete SRS.csv"
+    pd.DataFrame({"Formatted ID": [f"TC{rng.randint(1, 5 * prds)}" for _ in range(obsolete_srs)]}).to_csv(obs_srs_path, index=False)
+
+    return {
+        "automated_tests_path": str(vv_folder),
+        "manual_as_runs": str(as_run_path),
+        "active_prd_path": str(active_prd_path),
+        "obs_srs_path": str(obs_srs_path),
+        "version_num": VERSION_NUM
+    }
+
+
+def run_benchmark(inputs, output_dir, jobs=1, parser="rows"):
+    """Times each stage of a `run.run()` of a corpus
+
+    The run is made with --profile and --validate, and the stages come from its profile report
+    (see profiling.py), so they're the same stages, timed the same way, as a profiled run of the
+    real inputs.
+
+    Args:
+        inputs (dict): output of `generate_corpus()`
+        output_dir (str or pathlib.Path): folder for the trace, error log and profile report that get written
+        jobs (int): number of worker processes for reading the .txt files
+        parser (str): how the .txt files are parsed, "rows", "columnar" or "bytes"
+
+    Returns:
+        list(dict): name, seconds, CPU seconds, rows, rows/sec, files, bytes, cached files/bytes and peak RSS of each stage, then of the whole run
+    """
+    import run
+    output_dir = Path(output_dir)
+    params = run.complete_params({
+        "out_path": str(output_dir / "trace.csv"),
+        "error_log_path": str(output_dir / "error_log.csv"),
+        "manual_as_runs": inputs["manual_as_runs"],
+        "obs_srs_path": inputs["obs_srs_path"],
+        "active_prd_path": inputs["active_prd_path"],
+        "automated_tests_path": inputs["automated_tests_path"],
+        "version_num": inputs["version_num"],
+        "srs_prefix": "TC",
+        "jobs": jobs,
+        "parser": parser,
+        "no_cache": True,
+        "profile": True,
+        "validate": True
+    })
+    summary = run.run(params)[0]
+    with open(f"{params['out_path']}.profile.json") as f:
+        report = json.load(f)
+
+    stages = []
+    for record in report["stages"] + [{"stage": "run", "wall_seconds": summary["Seconds"], "rows_out": summary["Trace Rows"]}]:
+        # Rows a stage made, or took in if it only writes them out
+        rows = record.get("rows_out") if record.get("rows_out") is not None else record.get("rows_in")
+        seconds = record["wall_seconds"]
+        stages.append({
+            "stage": record["stage"],
+            "seconds": seconds,
+            "cpu_seconds": record.get("cpu_seconds"),
+            "rows": rows,
+            "rows_per_sec": round(rows / seconds, 1) if rows is not None and seconds > 0 else None,
+            "files": record.get("files"),
+            "bytes_read": record.get("bytes_read"),
+            "cached_files": record.get("cached_files"),
+            "cached_bytes": record.get("cached_bytes"),
+            "peak_rss_mb": record.get("peak_rss_mb"),
+            "process_peak_rss_mb": record.get("process_peak_rss_mb")
+        })
+        print(f"{record['stage']}: {seconds:.2f}s" + (f", {rows} rows" if rows is not None else ""))
+    return stages
+
+
+def benchmark_txt_metadata(inputs, base_folder_name="Rx"):
+    """Times reading the .txt files of a tree with the per-file metadata against the old per-line version
+
+    The .txt readers used to find the RestApiTests/Rx folder in the path, run the ER regex and
+    rebuild Release, V&V Test Report, RC and Owner for every line; now it's done once per file
+    (see `rw._resolve_file_metadata()`). Both read the same files, one after another, and must
+    give the same rows.
+
+    >>> python src/benchmark.py --mode txt_metadata --txt_files 1000 --lines_per_file 1000
+
+    Args:
+        inputs (dict): output of `generate_corpus()`
+        base_folder_name (str): "RestApiTests" or "Rx"
+
+    Returns:
+        list(dict): name, seconds, rows and rows/sec of the "per_line" (before) and "per_file" (after) reads
+    """
+    version_path = Path(inputs["automated_tests_path"]) / inputs["version_num"]
+    txt_files = discovery.find_txt_files(version_path / base_folder_name)
+    read_txt = rw._read_rx_txt if base_folder_name == "Rx" else rw._read_group_by_method_txt
+
+    stages = []
+    results = {}
+    for name, read_file in [("per_line", lambda txt_file: _read_txt_per_line(txt_file.path, base_folder_name)),
+                            ("per_file", lambda txt_file: read_txt(txt_file, return_df=False))]:
+        start = time.perf_counter()
+        data = [row for txt_file in txt_files for row in read_file(txt_file)]
+        seconds = time.perf_counter() - start
+        results[name] = data
+        stages.append({
+            "stage": name,
+            "seconds": round(seconds, 4),
+            "rows": len(data),
+            "rows_per_sec": round(len(data) / seconds, 1) if seconds > 0 else None
+        })
+        print(f"{name}: {seconds:.2f}s, {len(data)} rows, {len(data) / seconds:,.0f} rows/sec")
+
+    assert results["per_line"] == results["per_file"], "Per-file metadata gave different rows than the per-line version"
+    return stages
+
+
+def generate_trace(rows, seed=0):
+    """Generates a random trace matrix for timing the validation rules
+
+    There are about a tenth as many PRDs and a fifth as many SRSs as rows. Some PRDs never have
+    an SRS, and some SRSs never have a test or a PRD, so every coverage check finds invalid rows.
+
+    Args:
+        rows (int): number of rows
+        seed (int): random seed, so the same arguments always give the same trace
+
+    Returns:
+        pd.DataFrame: Test Name, PRD and SRS ID columns
+    """
+    rng = np.random.default_rng(seed)
+    prd_num = rng.integers(0, max(rows // 10, 1), rows)
+    srs_num = rng.integers(0, max(rows // 5, 1), rows)
+
+    test_name = pd.Series("TC" + pd.Series(srs_num).astype(str) + " Test_" + pd.Series(np.arange(rows)).astype(str), dtype=object)
+    prd = pd.Series("US" + pd.Series(prd_num).astype(str), dtype=object)
+    srs = pd.Series("TC" + pd.Series(srs_num).astype(str), dtype=object)
+
+    # Blank cells: at random, and for every row of some PRDs/SRSs
+    srs[(prd_num % 7 == 0) | (rng.random(rows) < 0.05)] = None
+    test_name[srs_num % 11 == 0] = None
+    prd[(srs_num % 13 == 0) | (rng.random(rows) < 0.05)] = None
+    return pd.DataFrame({"Test Name": test_name, "PRD": prd, "SRS ID": srs})
+
+
+def benchmark_coverage(row_counts=COVERAGE_ROWS, seed=0):
+    """Times the PRD/SRS coverage checks of `validate_trace.py` on random traces of each size
+
+    >>> python src/benchmark.py --mode coverage --rows 100000 1000000 5000000
+
+    Args:
+        row_counts (list(int)): sizes of the traces
+        seed (int): random seed for `generate_trace()`
+
+    Returns:
+        list(dict): name, rows, seconds, rows/sec and invalid rows of each check on each trace
+    """
+    reference = vt.ReferenceIndex([], [])
+    stages = []
+    for rows in row_counts:
+        trace = generate_trace(rows, seed)
+        # The checks only use the trace and the PRD/SRS masks, but they come with the tokenized Test Names
+        tokenized = vt.TokenizedTrace(trace, reference, "US", "TC")
+        for name, check in COVERAGE_CHECKS:
+            start = time.perf_counter()
+            invalid = check(tokenized)
+            seconds = time.perf_counter() - start
+            stages.append({
+                "stage": name,
+                "rows": rows,
+                "seconds": round(seconds, 4),
+                "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+                "invalid_rows": int(invalid.sum())
+            })
+            print(f"{name}, {rows} rows: {seconds:.2f}s, {invalid.sum()} invalid")
+    return stages
+
+
+def _read_txt_per_line(file_path, base_folder_name):
+    """`rw._read_rx_txt()`/`rw._read_group_by_method_txt()` as they were before the file metadata
+    was resolved once per file; the baseline of `benchmark_txt_metadata()`"""
+    lines = [line for line in file_path.read_text().split("\n") if len(line) > 0]
+
+    data = []
+    for line in lines:
+        if len(line) < 2:
+            continue
+        if base_folder_name == "RestApiTests":
+            line = line.replace(rw._API_TEST_PACKAGE, "")
+        line_data = line.split("|")
+        if len(line_data) > 2:
+            line_data = ["".join(line_data[:-1]), line_data[-1]]
+        if len(line_data) < 2:
+            line_data.append(None)
+
+        # Get relevant data for other columns
+        base_folder_idx = [i for i, s in enumerate(file_path.parts) if base_folder_name in str(s)][0]
+
+        # Also add the V&V Test Report info by extracting it from file name
+        er_folder_name = file_path.parts[base_folder_idx - 2]
+        v_v = re.findall("ER([0-9]+ v[0-9]+|[0-9]+v[0-9]+)", er_folder_name)[0].replace("ER", "")
+
+        # If there's no space in the file name (like ER2228014v53), add one
+        v_idx = v_v.find("v")
+        if v_v[v_idx - 1] != " ":
+            v_v = v_v[:v_idx] + " " + v_v[v_idx:]
+
+        data.append({
+            'Test Name': line_data[0],
+            'Test Status': line_data[1].lower().capitalize() if line_data[1] is not None else None,
+            'Release': file_path.parts[base_folder_idx - 1],
+            'V&V Test Report': v_v,
+            'RC': file_path.parts[base_folder_idx + 1],
+            'Owner': file_path.parts[base_folder_idx + 2],
+            'File Path': str(file_path)
+        })
+    return data
+
+
+def _git_commit():
+    """Commit of the code being benchmarked, so results can be compared across commits"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    """Generates a synthetic corpus and times the pipeline on it
+
+    >>> python src/benchmark.py --scale medium -o bench_results.json
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the trace matrix pipeline on a synthetic V&V corpus. "
+                                     "Writes per-stage timings, rows/sec and peak memory to a JSON file")
+    parser.add_argument("-o", "--out_path",
+                        help="Output path of the benchmark results `.json`",
+                        default="bench_results.json", required=False)
+    parser.add_argument("--mode",
+                        help="What to time: the whole pipeline, reading the `.txt` files with per-file metadata against "
+                        "the old per-line version (use `--txt_files 1000 --lines_per_file 1000` for 1M lines), "
+                        "or the PRD/SRS coverage checks on random traces of `--rows` rows",
+                        choices=MODES, default="pipeline", required=False)
+    parser.add_argument("--rows",
+                        help="Sizes of the random traces that `--mode coverage` times the PRD/SRS coverage checks on",
+                        type=int, nargs="+", default=COVERAGE_ROWS, required=False)
+    parser.add_argument("--scale",
+                        help="Size of the generated corpus",
+                        choices=list(SCALES), default="small", required=False)
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name}",
+                            help=f"Override the {name.replace('_', ' ')} of the chosen scale",
+                            type=int, required=False)
+    parser.add_argument("--corpus_dir",
+                        help="Folder to generate the corpus in. Defaults to a temporary folder that is deleted afterwards",
+                        required=False)
+    parser.add_argument("--seed",
+                        help="Random seed for the corpus (or the traces of `--mode coverage`)",
+                        type=int, default=0, required=False)
+    parser.add_argument("-j", "--jobs",
+                        help="Number of worker processes for reading the `.txt` files. Use 0 for one per CPU",
+                        type=int, default=1, required=False)
+    parser.add_argument("--parser",
+                        help="How the `.txt` files are parsed",
+                        choices=rw.TXT_PARSERS, default="rows", required=False)
+    args = vars(parser.parse_args())
+
+    corpus_args = dict(SCALES[args["scale"]])
+    for name in corpus_args:
+        if args[name] is not None:
+            corpus_args[name] = args[name]
+
+    if args["mode"] == "coverage":
+        # Random traces, no corpus needed
+        stages = benchmark_coverage(args["rows"], args["seed"])
+    else:
+        corpus_dir = Path(args["corpus_dir"]) if args["corpus_dir"] else Path(tempfile.mkdtemp(prefix="trace_bench_"))
+        try:
+            print(f"Generating corpus in {corpus_dir}: {corpus_args}")
+            start = time.perf_counter()
+            inputs = generate_corpus(corpus_dir, seed=args["seed"], **corpus_args)
+            print(f"Generated corpus in {time.perf_counter() - start:.1f}s")
+
+            output_dir = corpus_dir / "output"
+            output_dir.mkdir(exist_ok=True)
+            if args["mode"] == "txt_metadata":
+                stages = benchmark_txt_metadata(inputs)
+            else:
+                stages = run_benchmark(inputs, output_dir, args["jobs"], args["parser"])
+        finally:
+            if not args["corpus_dir"]:
+                shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "mode": args["mode"],
+        "rows": args["rows"] if args["mode"] == "coverage" else None,
+        "scale": args["scale"],
+        "corpus": corpus_args,
+        "jobs": args["jobs"],
+        "parser": args["parser"],
+        "stages": stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages if "/" not in stage["stage"] and stage["stage"] != "run"), 4)
+    }
+    with open(args["out_path"], "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results written to {args['out_path']}")
@@ -1,20 +1,37 @@
 import re
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+import discovery
+import profiling
 import read_write as rw
+import readers
 
+# Test results that `create_trace()` reads: name -> input type (see `readers.READERS`). Adding
+# a source takes a reader (`readers.register_reader()`), an entry here with its path in
+# `test_loaders()`, and processing its rows in `create_trace()`.
+TEST_SOURCES = {"as_run": "manual_as_run", "rest_api": "rest_api", "rx": "rx"}
 
-def create_trace(vv_folder_path, as_run_path, version_num, srs_prefix="TC"):
+
+def create_trace(vv_folder_path, as_run_path, version_num, srs_prefix="TC", jobs=1, parser="rows", cache=None, requirements=None, tests=None):
     """ Function for processing manual and automatic tests
     
+    The test results can be read beforehand (e.g. at the same time as the other inputs of the
+    run) with the readers from `test_loaders()`, and passed in as `tests`.
+    
     Args:
         vv_folder_path (str): folder path of root folder
         as_run_path (str): file path of the manual as-runs .docx
         version_num (str): version number
         srs_prefix (str): str that SRS starts with
+        jobs (int): number of worker processes for reading the automatic test files (0 = one per CPU)
+        parser (str): how the automatic test files are parsed, "rows", "columnar" or "bytes"
+        cache (parse_cache.ParseCache): if given, only inputs that changed since the last run are parsed
+        requirements (requirement_index.RequirementIndex): if given, fills in the SRS ID, PRD and Name columns
+        tests (dict): test results that were already read, by `test_loaders()` name; the rest are read here
         
     Returns:
         pd.DataFrame: New trace matrix
@@ -24,17 +41,10 @@ def create_trace(vv_folder_path, as_run_path, version_num, srs_prefix="TC"):
     # ----------------
     # 1. Preprocessing
     # ----------------
-    # Create a path object (from pathlib) for the vv root folder.
-    if isinstance(vv_folder_path, str):
-        vv_folder_path = Path(vv_folder_path)
-    
-    # Check that the user input folder location actually exists
-    assert vv_folder_path.exists(), "The specified V&V automatic test data folder does not exist."
-    
-    # Get the correct folder for the provided version number.
-    version_path = [x for x in vv_folder_path.iterdir() if x.is_dir() and x.name == version_num][0]
+    # Inputs that weren't read beforehand are read when they're processed
+    tests = {**test_loaders(vv_folder_path, as_run_path, version_num, jobs, parser, cache), **(tests or {})}
     
-    # TODO: Load previous traces (for backfilling if needed)
+    # Note: backfilling from the previous trace is done afterwards, by `BackfillIndex`/`backfill_trace()`
     
     # ----------------------------------------------------
     # 2. Parsing and processing manual and automatic tests
@@ -43,18 +53,283 @@ def create_trace(vv_folder_path, as_run_path, version_num, srs_prefix="TC"):
     dfs = []
     
     # Get the manual as run results
-    df, invalid = _process_as_run_tests(as_run_path, srs_prefix)
+    with profiling.stage("process_as_run_tests") as record:
+        df, invalid = _process_as_run_tests(_loaded(tests["as_run"]), as_run_path, srs_prefix)
+        record.rows_out = len(df)
     invalid_dfs.extend(invalid)
     dfs.append(df)
     
     # Get the automatic (Rest API and Rx) test results
-    df, invalid = _process_automatic_tests(version_path, srs_prefix)
+    with profiling.stage("process_automatic_tests") as record:
+        df, invalid = _process_automatic_tests(_loaded(tests["rest_api"]), _loaded(tests["rx"]), srs_prefix)
+        record.rows_out = len(df)
     invalid_dfs.extend(invalid)
     dfs.append(df)
     
     # TODO: Implement input from more test info sources
 
-    return pd.concat(dfs), invalid_dfs
+    trace = rw.concat_frames(dfs)
+
+    # ---------------------------------------
+    # 3. Filling in SRS ID, PRD and Name
+    # ---------------------------------------
+    if requirements is not None:
+        with profiling.stage("fill_requirements", rows_in=len(trace)) as record:
+            trace = requirements.fill(trace)
+            record.rows_out = len(trace)
+
+    return trace, invalid_dfs
+
+
+def iter_trace(vv_folder_path, as_run_path, version_num, srs_prefix="TC", jobs=1, parser="rows", batch_files=100, requirements=None, tests=None):
+    """ Streaming version of `create_trace()`: yields the trace a batch at a time
+    
+    The automatic test files are read, filtered and expanded a batch of files at a time, so
+    memory use doesn't grow with the size of the V&V folder. Concatenating the trace batches
+    gives the same trace as `create_trace()`; the invalid rows are the same too, but come out
+    batch by batch instead of grouped by error.
+    
+    Args:
+        vv_folder_path (str): folder path of root folder
+        as_run_path (str): file path of the manual as-runs .docx
+        version_num (str): version number
+        srs_prefix (str): str that SRS starts with
+        jobs (int): number of worker processes for reading the automatic test files (0 = one per CPU)
+        parser (str): how the automatic test files are parsed, "rows", "columnar" or "bytes"
+        batch_files (int): number of automatic test files per batch
+        requirements (requirement_index.RequirementIndex): if given, fills in the SRS ID, PRD and Name columns
+        tests (dict): as in `create_trace()`, but only "as_run" is used; the automatic tests are always read in batches
+        
+    Yields:
+        pd.DataFrame: trace matrix rows of a batch
+        list(pd.DataFrame): list of invalid data frames of a batch
+    """
+    version_path = _get_version_path(vv_folder_path, version_num)
+    
+    def batches():
+        # The manual as-runs are a single document, so they're a single batch
+        as_run_df = _loaded(tests["as_run"]) if tests and "as_run" in tests else load_as_run_tests(as_run_path)
+        yield _process_as_run_tests(as_run_df, as_run_path, srs_prefix)
+        for tests_df in rw.iter_rest_api_tests(version_path / "RestApiTests", batch_files, jobs, parser):
+            yield _process_automatic_batch(tests_df, srs_prefix)
+        for tests_df in rw.iter_rx_tests(version_path / "Rx", batch_files, jobs, parser):
+            yield _process_automatic_batch(tests_df, srs_prefix)
+    
+    for trace, invalid_dfs in batches():
+        if requirements is not None:
+            trace = requirements.fill(trace)
+        yield trace, invalid_dfs
+
+
+def test_loaders(vv_folder_path, as_run_path, version_num, jobs=1, parser="rows", cache=None):
+    """ Readers of the test results that `create_trace()` processes
+    
+    Each reader only reads its own input, so they can be run concurrently, with each other
+    and with the run's other inputs; their results can then be passed to `create_trace()`.
+    
+    Args:
+        vv_folder_path (str): folder path of root folder
+        as_run_path (str): file path of the manual as-runs .docx
+        version_num (str): version number
+        jobs (int): number of worker processes for reading the automatic test files (0 = one per CPU)
+        parser (str): how the automatic test files are parsed, "rows", "columnar" or "bytes"
+        cache (parse_cache.ParseCache): if given, only inputs that changed since the last run are parsed
+        
+    Returns:
+        dict: each TEST_SOURCES name ("as_run", "rest_api" and "rx") -> function with no arguments that reads that input into a pd.DataFrame
+    """
+    version_path = _get_version_path(vv_folder_path, version_num)
+    paths = {
+        "as_run": as_run_path,
+        "rest_api": version_path / "RestApiTests", # Note: "/" on a pathlib.Path allows navigating into child folders
+        "rx": version_path / "Rx"
+    }
+    return {name: _test_loader(input_type, paths[name], cache, jobs=jobs, parser=parser) for name, input_type in TEST_SOURCES.items()}
+
+
+def load_as_run_tests(as_run_path, cache=None):
+    """ Reads in the manual as-runs
+    
+    Args:
+        as_run_path (str): file path of as_runs
+        cache (parse_cache.ParseCache): if given, the as-runs are only parsed if they changed since the last run
+        
+    Returns:
+        pd.DataFrame: the as-run tests (mostly unprocessed)
+    """
+    return _test_loader("manual_as_run", as_run_path, cache)()
+
+
+def _test_loader(input_type, path, cache=None, **options):
+    """ Function with no arguments that reads a test input with `readers.read()`, timed as a stage named after its reader """
+    def load():
+        with profiling.stage(readers.READERS[input_type].function) as record:
+            df = readers.read(input_type, path, cache, **options)
+            record.rows_out = len(df)
+        return df
+    return load
+
+
+def _loaded(test_input):
+    """ A test input of `create_trace()`: the pd.DataFrame itself, or its reader from `test_loaders()` """
+    return test_input() if callable(test_input) else test_input
+
+
+# Columns of the invalid rows that `create_trace()`/`iter_trace()` return, in the order
+# `rw.write_error_log()` puts them. Streaming writes need them before any rows are read.
+ERROR_LOG_COLUMNS = rw.ERROR_LOG_COLUMNS + ["Test Name", "Test Status", "Release", "Application", "Owner", "V&V Test Report", "RC"]
+
+
+# Columns of the previous trace matrix (see `rw.read_trace()`) used for backfilling: the
+# columns that are joined on, in the order they're tried, and the columns that get filled in
+BACKFILL_KEYS = ["TC ID", "Test Name"]
+BACKFILL_COLUMNS = ["PRD", "SRS ID", "Name"]
+
+# Columns of the backfill report: which columns each carried forward row got, and the key it matched on
+BACKFILL_REPORT_COLUMNS = ["Backfilled Columns", "Matched On"] + rw.TRACE_COLUMNS
+
+
+def backfill_trace(trace, prev_trace):
+    """ Fills in the empty PRD, SRS ID and Name columns of the trace from the previous trace matrix
+    
+    Args:
+        trace (pd.DataFrame): new trace matrix
+        prev_trace (pd.DataFrame): previous trace matrix (from `rw.read_trace()`)
+        
+    Returns:
+        pd.DataFrame: the trace with the empty columns filled in where possible
+        pd.DataFrame: the rows that were carried forward (see BACKFILL_REPORT_COLUMNS)
+    """
+    return BackfillIndex(prev_trace).fill(trace)
+
+
+class BackfillIndex:
+    """Lookup of the PRD, SRS ID and Name of each TC ID/Test Name in the previous trace matrix
+    
+    Built once. Each key's unique values go in a hashed pd.Index, alongside the row of the
+    previous trace to take each column from, so filling a trace (or each batch of a streamed
+    one) is one vectorized join per key instead of a search of the previous trace per row.
+    When a key appears more than once, each column comes from its first non-empty value.
+    """
+    
+    def __init__(self, prev_trace):
+        """
+        Args:
+            prev_trace (pd.DataFrame): previous trace matrix (from `rw.read_trace()`)
+        """
+        self.columns = [column for column in BACKFILL_COLUMNS if column in prev_trace.columns]
+        self.values = {column: prev_trace[column].to_numpy(dtype=object, na_value=None) for column in self.columns}
+        
+        # key -> (unique key values, {column: row of the previous trace to take the column from, per unique value})
+        self.lookups = {}
+        for key in BACKFILL_KEYS:
+            if key not in prev_trace.columns:
+                print(f"Previous trace has no {key} column, not backfilling on it")
+                continue
+            codes, uniques = pd.factorize(prev_trace[key])
+            rows = {}
+            for column in self.columns:
+                has_value = (codes != -1) & prev_trace[column].notna().to_numpy()
+                value_rows = np.flatnonzero(has_value)
+                # drop_duplicates() keeps the first row of each key
+                first = pd.Series(codes[has_value]).drop_duplicates()
+                rows[column] = np.full(len(uniques), -1)
+                rows[column][first.to_numpy()] = value_rows[first.index.to_numpy()]
+            self.lookups[key] = (pd.Index(uniques), rows)
+    
+    def fill(self, trace):
+        """ Fills in the empty backfill columns of a trace (or a batch of one)
+        
+        Args:
+            trace (pd.DataFrame): new trace matrix
+            
+        Returns:
+            pd.DataFrame: the trace with the empty columns filled in where possible
+            pd.DataFrame: the rows that were carried forward (see BACKFILL_REPORT_COLUMNS)
+        """
+        trace = trace.copy()
+        # Bit i is set if self.columns[i] was filled; matched_on is the position of the key in self.lookups (+1)
+        filled = np.zeros(len(trace), dtype=np.int8)
+        matched_on = np.zeros(len(trace), dtype=np.int8)
+        
+        for key_num, (key, (uniques, rows)) in enumerate(self.lookups.items(), start=1):
+            # Position of each trace row's key in the lookup (-1 if it isn't in the previous trace)
+            idx = uniques.get_indexer(trace[key])
+            found = idx != -1
+            
+            for column_num, column in enumerate(self.columns):
+                values = trace[column].to_numpy(dtype=object, na_value=None) if column in trace.columns else np.full(len(trace), None, dtype=object)
+                
+                # Row of the previous trace to fill each cell from; only empty cells are filled
+                prev_rows = np.where(found, rows[column][idx], -1)
+                fill = (prev_rows != -1) & pd.isna(values)
+                if not fill.any():
+                    continue
+                
+                values = values.copy()
+                values[fill] = self.values[column][prev_rows[fill]]
+                trace[column] = values
+                
+                filled[fill] |= 1 << column_num
+                matched_on[fill & (matched_on == 0)] = key_num
+        
+        # Turn the bits into text once per combination, rather than once per row
+        column_names = np.array([", ".join(column for i, column in enumerate(self.columns) if bits & (1 << i))
+                                 for bits in range(1 << len(self.columns))], dtype=object)
+        key_names = np.array([""] + list(self.lookups), dtype=object)
+        
+        carried = filled != 0
+        report = trace[carried].copy()
+        report.insert(0, "Backfilled Columns", column_names[filled[carried]])
+        report.insert(1, "Matched On", key_names[matched_on[carried]])
+        return trace, report
+
+
+def list_versions(vv_folder_path):
+    """ Finds all the version folders in the V&V automatic test data folder
+    
+    Args:
+        vv_folder_path (str or pathlib.Path): folder path of root folder
+        
+    Returns:
+        list(str): the version numbers (folders named like 1.33.0), oldest first
+    """
+    # Create a path object (from pathlib) for the vv root folder.
+    if isinstance(vv_folder_path, str):
+        vv_folder_path = Path(vv_folder_path)
+    
+    # Check that the user input folder location actually exists
+    assert vv_folder_path.exists(), "The specified V&V automatic test data folder does not exist."
+    
+    versions = [name for name in discovery.list_subfolders(vv_folder_path) if _VERSION_PATTERN.fullmatch(name)]
+    return sorted(versions, key=lambda version: [int(part) for part in version.split(".")])
+
+
+# Version folder name, with two periods in it (i.e. 1.33.0)
+_VERSION_PATTERN = re.compile("[0-9]+\\.[0-9]+\\.[0-9]+")
+
+
+def _get_version_path(vv_folder_path, version_num):
+    """ Finds the folder of a version in the V&V automatic test data folder
+    
+    Args:
+        vv_folder_path (str or pathlib.Path): folder path of root folder
+        version_num (str): version number
+        
+    Returns:
+        pathlib.Path: the version folder
+    """
+    # Create a path object (from pathlib) for the vv root folder.
+    if isinstance(vv_folder_path, str):
+        vv_folder_path = Path(vv_folder_path)
+    
+    # Check that the user input folder location actually exists
+    assert vv_folder_path.exists(), "The specified V&V automatic test data folder does not exist."
+    
+    # Get the correct folder for the provided version number, without listing the others
+    version_path = vv_folder_path / version_num
+    assert version_path.is_dir(), f"There's no folder for version {version_num} in the V&V automatic test data folder."
+    return version_path
     
 
 def _filter_status(tests_df):
@@ -71,10 +346,11 @@ def _filter_status(tests_df):
     return valid, invalid
 
 
-def _process_as_run_tests(as_run_path, srs_prefix="TC"):
+def _process_as_run_tests(as_run_df, as_run_path, srs_prefix="TC"):
     """ Function for processing as runs
     
     Args:
+        as_run_df (pd.DataFrame): the as-run tests, from `load_as_run_tests()`
         as_run_path (str): file path of as_runs
         srs_prefix (str): string that SRS starts with
         
@@ -83,9 +359,6 @@ def _process_as_run_tests(as_run_path, srs_prefix="TC"):
         list(pd.DataFrame): list of invalid data frames
     """
     
-    # Load in dataset (mostly unprocessed)
-    as_run_df = rw.read_as_run_tests(as_run_path)
-    
     # ----------
     # Filtering
     # ----------
@@ -94,56 +367,40 @@ def _process_as_run_tests(as_run_path, srs_prefix="TC"):
     # Filter out if Test Status != "Passed" or "Failed"
     as_run_df, invalid_df = _filter_status(as_run_df)
     if len(invalid_df) > 0:
-        invalid_df.insert(0, "Error:", f"Manual as-run entry invalid status for trace")
+        invalid_df.insert(0, "Error", f"Manual as-run entry invalid status for trace")
+        invalid_df.insert(1, "Source", "Manual as-run")
         invalid_dfs.append(invalid_df)
 
     # Filter out tests with blank names (name wasnt in original document; just the run id)
     invalid_df = as_run_df.loc[as_run_df["Test Name"].isin([""])]
-    invalid_df.insert(0, "Error:", f"Name not found in {as_run_path}")
+    invalid_df.insert(0, "Error", f"Name not found in {as_run_path}")
+    invalid_df.insert(1, "Source", "Manual as-run")
     invalid_dfs.append(invalid_df)
     as_run_df = as_run_df.loc[~as_run_df["Test Name"].isin([""])]
     
     # Filter out entries that won't go in the trace
     invalid_df = as_run_df.loc[~as_run_df["Test Name"].str[0:3].isin(["PRD", "SRS"])]
-    invalid_df.insert(0, "Error:", "Manual test not part of trace")
+    invalid_df.insert(0, "Error", "Manual test not part of trace")
+    invalid_df.insert(1, "Source", "Manual as-run")
     invalid_dfs.append(invalid_df)
     as_run_df = as_run_df.loc[as_run_df["Test Name"].str[0:3].isin(["PRD", "SRS"])]
 
     # ---------------------------------
     # Formatting and filling in columns
     # ---------------------------------
-    new_trace = []
-    for row in as_run_df.values:
-        test_name = row[0]
-
-        tcs = re.findall(f"{srs_prefix}[0-9]+", test_name)
-        # prds = re.findall(f"{srs_prefix}[0-9]+", test_name)
-
-        # for prd in prds:
-        for tc in tcs:
-            entry = {
-                "PRD": np.nan, # TODO: Fix by finding out where prd can be looked up
-                "SRS ID": np.nan, # TODO: Fix by finding out where SRS ID (ESA) can be looked up
-                "Method": "Manual",
-                "Test Name": test_name,
-                "V&V Test Report": row[6],
-                "TC ID": tc,
-                "Test Status": row[2],
-                "Release": row[3],
-                "Name": np.nan, # TODO: Fix by finding out where name can be looked up
-                "Owner": row[5],
-                "Application": row[4]
-            }
-            new_trace.append(entry)
-
-    return pd.DataFrame(new_trace), invalid_dfs
-    
-    
-def _process_automatic_tests(version_path, srs_prefix="TC"):
+    with profiling.stage("expand_trace_rows", rows_in=len(as_run_df)) as record:
+        new_trace = _expand_trace_rows(as_run_df, srs_prefix, "Manual", as_run_df["Application"])
+        record.rows_out = len(new_trace)
+
+    return new_trace, invalid_dfs
+    
+    
+def _process_automatic_tests(api_df, rx_df, srs_prefix="TC"):
     """ Function for processing automatic tests
     
     Args:
-        version_path (str): path to the folder containing RestApiTests and Rx folders
+        api_df (pd.DataFrame): the Rest API tests (mostly unprocessed)
+        rx_df (pd.DataFrame): the Rx tests (mostly unprocessed)
         srs_prefix (str): string that SRS starts with
         
     Returns:
@@ -151,12 +408,28 @@ def _process_automatic_tests(version_path, srs_prefix="TC"):
         list(pd.DataFrame): list of invalid data frames
     """
     
-    # Load in dataset (mostly unprocessed)
-    api_df = rw.read_rest_api_tests(version_path / "RestApiTests") # Note: "/" on a pathlib.Path allows navigating into child folders
-    rx_df = rw.read_rx_tests(version_path / "Rx")
-    
     # Can concatenate these two and process together; similar data format
-    df = pd.concat([api_df, rx_df])
+    df = rw.concat_frames([api_df, rx_df])
+    
+    with profiling.stage("filter_and_expand", rows_in=len(df)) as record:
+        new_trace, invalid_dfs = _process_automatic_batch(df, srs_prefix)
+        record.rows_out = len(new_trace)
+
+    return new_trace, invalid_dfs
+
+
+def _process_automatic_batch(df, srs_prefix="TC", extra_columns=()):
+    """ Function for filtering automatic test results and turning them into trace matrix rows
+    
+    Args:
+        df (pd.DataFrame): automatic test results (Rest API and/or Rx)
+        srs_prefix (str): string that SRS starts with
+        extra_columns (list): columns of the test results to also keep in the trace rows (e.g. "File Path")
+        
+    Returns:
+        pd.DataFrame: new trace matrix with valid automatic tests
+        list(pd.DataFrame): list of invalid data frames
+    """
     
     # ----------
     # Filtering
@@ -166,39 +439,88 @@ def _process_automatic_tests(version_path, srs_prefix="TC"):
     # Filter out if Test Status != "Passed" or "Failed"
     df, invalid_df = _filter_status(df)
     if len(invalid_df) > 0:
-        invalid_df.insert(0, "Error:", f"Automatic test entry invalid status for trace")
+        invalid_df.insert(0, "Error", f"Automatic test entry invalid status for trace")
+        invalid_df.insert(1, "Source", "Automated as-run")
         invalid_dfs.append(invalid_df)
     
     # Filter out entries that won't go in the trace
     invalid_df = df.loc[~df["Test Name"].str[0:2].isin(["TC", "ES"])]
-    invalid_df.insert(0, "Error:", "Automatic test not part of trace")
+    invalid_df.insert(0, "Error", "Automatic test not part of trace")
+    invalid_df.insert(1, "Source", "Automated as-run")
     invalid_dfs.append(invalid_df)
 
     # ---------------------------------
     # Formatting and filling in columns
     # ---------------------------------
-    new_trace = []
-    for row in df.values:
-        test_name = row[0]
-
-        tcs = re.findall(f"{srs_prefix}[0-9]+", test_name)
-        # prds = re.findall(f"{srs_prefix}[0-9]+", test_name)
-
-        # for prd in prds:
-        for tc in tcs:
-            entry = {
-                "PRD": np.nan, # TODO: Fix by finding out where prd can be looked up
-                "SRS ID": np.nan, # TODO: Fix by finding out where SRS ID (ESA) can be looked up
-                "Method": "Automatic",
-                "Test Name": test_name,
-                "V&V Test Report": row[3],
-                "TC ID": tc,
-                "Test Status": row[1],
-                "Release": row[2],
-                "Name": np.nan, # TODO: Fix by finding out where name can be looked up
-                "Owner": row[5],
-                "Application": "Sapphire" # TODO: These may not all be sapphire; may need to fix
-            }
-            new_trace.append(entry)
-
-    return pd.DataFrame(new_trace), invalid_dfs
+    new_trace = _expand_trace_rows(df, srs_prefix, "Automatic", "Sapphire", extra_columns) # TODO: These may not all be sapphire; may need to fix
+
+    return new_trace, invalid_dfs
+
+
+def _expand_trace_rows(tests_df, srs_prefix, method, application, extra_columns=()):
+    """ Function for turning test results into trace matrix rows, one row per TC ID in the test name
+    
+    Args:
+        tests_df (pd.DataFrame): test results, with Test Name, Test Status, Release, V&V Test Report and Owner columns
+        srs_prefix (str): string that SRS starts with
+        method (str): value of the Method column ("Manual" or "Automatic")
+        application (str or pd.Series): value(s) of the Application column
+        extra_columns (list): columns of tests_df to add after the trace columns
+        
+    Returns:
+        pd.DataFrame: trace matrix rows
+    """
+    # Find every TC ID in each test name, then give each one its own row.
+    # The index of tc_ids is the position of the test that each TC ID came from.
+    test_names = pd.Series(tests_df["Test Name"].to_numpy(), dtype=object)
+    tc_ids = test_names.str.findall(_srs_pattern(srs_prefix)).explode().dropna()
+    test_idx = tc_ids.index.to_numpy()
+
+    # take() on the column arrays keeps the categorical columns categorical
+    if isinstance(application, pd.Series):
+        application = application.array.take(test_idx)
+    else:
+        application = _repeat_categorical(application, len(test_idx))
+
+    trace = pd.DataFrame({
+        "PRD": np.nan, # Filled in from the requirement index and/or the previous trace, if given
+        "SRS ID": np.nan, # Filled in from the requirement index and/or the previous trace, if given
+        "Method": _repeat_categorical(method, len(test_idx)),
+        "Test Name": test_names.to_numpy()[test_idx],
+        "V&V Test Report": tests_df["V&V Test Report"].array.take(test_idx),
+        "TC ID": tc_ids.to_numpy(),
+        "Test Status": tests_df["Test Status"].array.take(test_idx),
+        "Release": tests_df["Release"].array.take(test_idx),
+        "Name": np.nan, # Filled in from the requirement index and/or the previous trace, if given
+        "Owner": tests_df["Owner"].array.take(test_idx),
+        "Application": application
+    })
+    for column in extra_columns:
+        trace[column] = tests_df[column].array.take(test_idx)
+    return trace
+
+
+def _repeat_categorical(value, length):
+    """ Categorical column with the same value on every row
+    
+    Args:
+        value (str): value of the column
+        length (int): number of rows
+        
+    Returns:
+        pd.Categorical: the column
+    """
+    return pd.Categorical.from_codes(np.zeros(length, dtype=np.int8), [value])
+
+
+@lru_cache(maxsize=None)
+def _srs_pattern(srs_prefix):
+    """ Compiled regex that finds the SRS (TC) IDs in a test name
+    
+    Args:
+        srs_prefix (str): string that SRS starts with
+        
+    Returns:
+        re.Pattern: the compiled pattern
+    """
+    return re.compile(f"{srs_prefix}[0-9]+")
@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import NamedTuple
+
+# Folders that are never walked into: anything with one of these in its name (e.g. the
+# __MACOSX folders that zip files made on a Mac have)
+IGNORED_FOLDERS = ["__MACOSX"]
+
+# Most folders listed at the same time. Listing a folder is mostly waiting on the disk (or
+# the network share), so sibling folders are listed in threads.
+WALK_THREADS = 8
+
+
+class TxtFile(NamedTuple):
+    """An automatic test .txt file found by `find_txt_files()`
+
+    Files are expected to be laid out as
+    `<ER folder>/<Release>/<RestApiTests or Rx>/<RC>/<Owner>/<file>.txt`. The walker splits the
+    path into those parts once, so the readers don't have to; RC and Owner are None for files
+    that aren't that deep.
+    """
+    path: Path
+    report_folder: str # name of the ER (V&V Test Report) folder
+    release: str
+    rc: str
+    owner: str
+    size: int
+    mtime_ns: int
+
+
+def find_txt_files(folder_path, threads=WALK_THREADS):
+    """Finds all the .txt files under a RestApiTests or Rx folder
+
+    Walks the folder with `os.scandir`, so each file is only looked at once, and skips the
+    IGNORED_FOLDERS without going into them. Each level of the tree is listed in parallel.
+    The files come out in the same order as `Path.rglob("*.txt")`: a folder's own files,
+    then each of its subfolders in turn, in the order the file system lists them.
+
+    Args:
+        folder_path (str or pathlib.Path): the RestApiTests or Rx folder of a release
+        threads (int): most folders to list at the same time (1 = one after another)
+
+    Returns:
+        list(TxtFile): the files
+    """
+    root = str(folder_path)
+    report_folder, release = _release_parts(root)
+
+    # Folder -> (subfolders, files), one level of the tree at a time
+    listings = {}
+    level = [root]
+    with ThreadPoolExecutor(max_workers=threads) if threads > 1 else nullcontext() as executor:
+        while level:
+            listed = executor.map(_try_list_folder, level) if executor is not None else map(_try_list_folder, level)
+            listings.update(zip(level, listed))
+            level = [subfolder for folder in level for subfolder in listings[folder][0]]
+
+    files = []
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        subfolders, folder_files = listings[folder]
+        rc, owner = _rc_and_owner(folder[len(root) + 1:].split(os.sep) if folder != root else [])
+        files.extend(TxtFile(Path(folder, name), report_folder, release, rc, owner, size, mtime_ns)
+                     for name, size, mtime_ns in folder_files)
+        stack.extend(reversed(subfolders))
+    return files
+
+
+def describe_txt_file(file_path, folder_path, size=None, mtime_ns=None):
+    """The TxtFile of a .txt file under a RestApiTests or Rx folder, for a file that wasn't found by `find_txt_files()`
+
+    Args:
+        file_path (str or pathlib.Path): path to the file
+        folder_path (str or pathlib.Path): the RestApiTests or Rx folder the file is in
+        size (int, optional): size of the file; the file is stat-ed if it or mtime_ns isn't given
+        mtime_ns (int, optional): modification time of the file
+
+    Returns:
+        TxtFile: the file
+    """
+    file_path = Path(file_path)
+    if size is None or mtime_ns is None:
+        stat = file_path.stat()
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    report_folder, release = _release_parts(str(folder_path))
+    rc, owner = _rc_and_owner(file_path.parent.relative_to(folder_path).parts)
+    return TxtFile(file_path, report_folder, release, rc, owner, size, mtime_ns)
+
+
+def list_folder(folder):
+    """Lists the subfolders and .txt files of a folder, skipping the IGNORED_FOLDERS
+
+    Args:
+        folder (str): path to the folder
+
+    Returns:
+        list(str): paths of the subfolders (symlinked folders aren't followed)
+        list(tuple): (name, size, mtime_ns) of each .txt file
+
+    Raises:
+        OSError: if the folder can't be listed
+    """
+    subfolders = []
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if any(name in entry.name for name in IGNORED_FOLDERS):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subfolders.append(entry.path)
+            elif os.path.normcase(entry.name).endswith(".txt") and entry.is_file(): # Case insensitive on Windows, like rglob
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return subfolders, files
+
+
+def list_subfolders(folder_path):
+    """Names of the folders in a folder (not their subfolders), skipping the IGNORED_FOLDERS
+
+    Args:
+        folder_path (str or pathlib.Path): path to the folder
+
+    Returns:
+        list(str): the folder names
+    """
+    with os.scandir(folder_path) as entries:
+        return [entry.name for entry in entries
+                if entry.is_dir() and not any(name in entry.name for name in IGNORED_FOLDERS)]
+
+
+def _try_list_folder(folder):
+    """`list_folder()`, but a folder that can't be listed (e.g. deleted while walking) counts as empty"""
+    try:
+        return list_folder(folder)
+    except OSError:
+        return [], []
+
+
+def _release_parts(folder_path):
+    """Names of the ER folder and the release folder that a RestApiTests or Rx folder is in"""
+    release_path = Path(folder_path).parent
+    return release_path.parent.name, release_path.name
+
+
+def _rc_and_owner(parts):
+    """RC and Owner of a file, from the folders between the RestApiTests or Rx folder and the file"""
+    return (parts[0] if len(parts) > 0 else None), (parts[1] if len(parts) > 1 else None)
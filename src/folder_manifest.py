@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import discovery
+
+
+class FolderManifest:
+    """Index of the .txt files under a folder, kept up to date with a cheap `os.scandir` diff
+
+    Adding, removing or renaming a file changes the modification time of its folder, so a
+    folder whose modification time hasn't changed since the last scan is taken from the manifest
+    without listing it or stat-ing its files; only the folders themselves are stat-ed. Writing to
+    a file that's already there doesn't change its folder, so a folder is only trusted once it and
+    all its files are older than `settle_seconds` (i.e. nothing was still being copied into it
+    when it was listed); until then it's listed again on every scan. A full scan lists every
+    folder again, to catch files that were overwritten in place after that.
+
+    The manifest is saved to a .json file, so a restarted watch doesn't have to stat every file
+    of a network share again. Folders are listed like `discovery.find_txt_files()` does, so the
+    files come out in the same order, without the `discovery.IGNORED_FOLDERS`.
+
+    Attributes:
+        folder_path (pathlib.Path): the folder
+        files (dict): pathlib.Path -> [size, mtime] of each .txt file, in walk order
+    """
+
+    def __init__(self, folder_path, manifest_dir=None, settle_seconds=60):
+        """
+        Args:
+            folder_path (str or pathlib.Path): folder to index
+            manifest_dir (str or pathlib.Path, optional): folder to save the manifest in (e.g. the
+                parse cache folder); created if needed. Defaults to None (the manifest isn't saved)
+            settle_seconds (float): how long a folder and its files must go unchanged before the
+                manifest stops re-listing it
+        """
+        self.folder_path = Path(folder_path)
+        self.settle_seconds = settle_seconds
+        self.files = {}
+
+        self._manifest_path = None
+        self._folders = {}
+        if manifest_dir is not None:
+            Path(manifest_dir).mkdir(parents=True, exist_ok=True)
+            name = hashlib.sha1(str(self.folder_path.resolve()).encode()).hexdigest()
+            self._manifest_path = Path(manifest_dir) / f"manifest_{name}.json"
+            if self._manifest_path.exists():
+                self._folders = json.loads(self._manifest_path.read_text())
+
+    def scan(self, full=False):
+        """Updates the manifest from the folder, and saves it if anything changed
+
+        Args:
+            full (bool): if True, lists every folder and stats every file, even the ones that haven't changed
+
+        Returns:
+            dict: "added", "changed" and "removed" -> list of the pathlib.Path's of those .txt files
+        """
+        cutoff_ns = time.time_ns() - int(self.settle_seconds * 1e9)
+        folders = {}
+        relisted = {} # folder -> its entry before it was listed again (None if it's new)
+        self._scan_folder(str(self.folder_path), folders, relisted, cutoff_ns, full)
+
+        # Only the folders that were listed again (or are gone) can have changed files
+        changes = {"added": [], "changed": [], "removed": []}
+        for folder, old_entry in relisted.items():
+            old_files = old_entry["files"] if old_entry is not None else {}
+            new_files = folders[folder]["files"]
+            changes["added"].extend(Path(folder, name) for name in new_files if name not in old_files)
+            changes["changed"].extend(Path(folder, name) for name, signature in new_files.items()
+                                      if name in old_files and old_files[name] != signature)
+            changes["removed"].extend(Path(folder, name) for name in old_files if name not in new_files)
+        removed_folders = [folder for folder in self._folders if folder not in folders]
+        for folder in removed_folders:
+            changes["removed"].extend(Path(folder, name) for name in self._folders[folder]["files"])
+
+        changed = len(removed_folders) > 0 or any(entry != folders[folder] for folder, entry in relisted.items())
+        self._folders = folders
+        if changed or not self.files:
+            self.files = dict(self._recorded_files())
+        if changed and self._manifest_path is not None:
+            self._save()
+        return changes
+
+    def txt_files(self, file_paths=None):
+        """The recorded files as `discovery.TxtFile`'s, for the .txt readers
+
+        Args:
+            file_paths (list, optional): pathlib.Path's of the files to describe. Defaults to None (all the files, in walk order)
+
+        Returns:
+            list(discovery.TxtFile): the files
+        """
+        file_paths = list(self.files) if file_paths is None else file_paths
+        return [discovery.describe_txt_file(file_path, self.folder_path, *self.files[file_path]) for file_path in file_paths]
+
+    def _scan_folder(self, folder, folders, relisted, cutoff_ns, full=False):
+        """Records a folder and everything under it in `folders`, listing only the folders that changed"""
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return # Deleted since its parent was listed
+
+        entry = self._folders.get(folder)
+        if full or entry is None or entry["mtime"] != mtime or not entry["settled"]:
+            old_entry = entry
+            try:
+                subfolders, files = discovery.list_folder(folder)
+            except OSError:
+                return
+            entry = {"mtime": mtime, "folders": subfolders, "files": {name: [size, mtime_ns] for name, size, mtime_ns in files}}
+            entry["settled"] = mtime < cutoff_ns and all(signature[1] < cutoff_ns for signature in entry["files"].values())
+            relisted[folder] = old_entry
+
+        folders[folder] = entry
+        for subfolder in entry["folders"]:
+            self._scan_folder(subfolder, folders, relisted, cutoff_ns, full)
+
+    def _recorded_files(self):
+        """(pathlib.Path, [size, mtime]) of each recorded file, in walk order"""
+        def walk(folder):
+            entry = self._folders.get(folder)
+            if entry is None:
+                return
+            for name, signature in entry["files"].items():
+                yield Path(folder, name), signature
+            for subfolder in entry["folders"]:
+                yield from walk(subfolder)
+
+        yield from walk(str(self.folder_path))
+
+    def _save(self):
+        """Writes the manifest atomically, so an interrupted watch can't corrupt it"""
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._folders))
+        os.replace(tmp_path, self._manifest_path)
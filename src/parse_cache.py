@@ -0,0 +1,385 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+import profiling
+import read_write as rw
+
+# Parsed data is stored as parquet if pyarrow is installed, otherwise as a pickle
+try:
+    import pyarrow
+    _DATA_EXT = ".parquet"
+except ImportError:
+    _DATA_EXT = ".pkl"
+
+# Version of the cache layout. A cache folder written by another version is emptied rather
+# than read (version 1 kept a whole folder of files in one entry, and didn't keep the columns
+# of a folder without files)
+CACHE_VERSION = 2
+
+# The files of a group (see `ParseCache.read_files()`) are spread over this many entries by a
+# hash of their path, so a new or changed file only rewrites the rows of the files it shares an entry with
+GROUP_SHARDS = 64
+
+
+class ParseCache:
+    """On-disk cache of parsed input files, so files that haven't changed since the last run
+    don't have to be parsed again.
+
+    Files are matched on path, size and modification time. Each cache entry holds the parsed
+    rows of one input (a .docx, or a shard of the files of a RestApiTests/Rx folder, see
+    GROUP_SHARDS) in a single columnar file, and the least recently used entries are evicted
+    once the cache is bigger than `max_size_mb`. Inputs can be read through the same cache from
+    several threads at once, and several processes (e.g. the workers of a batch run) can use the
+    same cache folder: each one only changes its own entries of the index, which is merged with
+    what's on disk under a file lock. Using an entry only updates its last use in memory; that's
+    saved with the next change to the index.
+    """
+
+    def __init__(self, cache_dir=".trace_cache", max_size_mb=1024, keep_in_memory=False):
+        """
+        Args:
+            cache_dir (str or pathlib.Path): folder to keep the cache in; created if needed
+            max_size_mb (int): maximum size of the cached data, in MB
+            keep_in_memory (bool): if True, also keeps the parsed data in memory, so a process that
+                reads the same inputs many times (like the trace service) doesn't load them from disk
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._memory = {} if keep_in_memory else None
+
+        self._lock = threading.Lock()
+        self._index_path = self.cache_dir / "index.json"
+        # Entries this process added, used or evicted since the index was last saved
+        self._changed = set()
+        self._removed = set()
+        with _locked(self.cache_dir / "index.lock"):
+            self._index = self._read_index()
+            if self._index is None:
+                self._clear()
+
+    def read_file(self, file_path, parse_file):
+        """Gets the parsed contents of a single file, only parsing it if it has changed.
+
+        Args:
+            file_path (str or pathlib.Path): path to the file
+            parse_file (function): parser that takes the file path and returns a pd.DataFrame
+
+        Returns:
+            pd.DataFrame: the parsed file
+        """
+        file_path = Path(file_path)
+        key = f"file:{file_path.resolve()}"
+        files = {str(file_path): file_signature(file_path)}
+
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is not None and entry["files"] == files:
+            df = self._load(key)
+            if df is not None:
+                print(f"Using cached parse of {file_path}")
+                profiling.count_cached_files(1, files[str(file_path)][0])
+                return df
+
+        df = parse_file(file_path)
+        self._store(key, df, files)
+        return df
+
+    def read_files(self, name, file_list, parse_files, path_column="File Path", signatures=None):
+        """Gets the parsed rows of a group of files, only parsing new or changed files.
+
+        The files are kept in GROUP_SHARDS entries, by a hash of their path. Only the entries
+        with new, changed or deleted files are written again, with the rows of their other files
+        taken from the cache. Rows of deleted files are dropped, and the rows come back in the
+        order of `file_list`, the same as parsing all the files from scratch.
+
+        Args:
+            name (str): unique name for the group of files (e.g. the folder they're in)
+            file_list (list): paths to the files
+            parse_files (function): parser that takes a list of file paths and returns a pd.DataFrame
+            path_column (str): column of the parsed rows that holds the path of the source file
+            signatures (dict, optional): path -> [size, mtime] of the files, if already known (e.g. from
+                a `folder_manifest.FolderManifest`), so they don't have to be stat-ed again
+
+        Returns:
+            pd.DataFrame: the parsed rows of all the files
+        """
+        if signatures is not None:
+            files = {str(file_path): list(signatures[file_path]) for file_path in file_list}
+        else:
+            files = {str(file_path): file_signature(file_path) for file_path in file_list}
+
+        # Files of each shard; a group without files keeps the parser's (empty) rows in the first
+        # one, so they have the parser's columns
+        shard_files = {}
+        for file_path, signature in files.items():
+            shard_files.setdefault(_shard(file_path), {})[file_path] = signature
+        if len(files) == 0:
+            shard_files[0] = {}
+
+        keys = {shard: f"files:{name}:{shard}" for shard in range(GROUP_SHARDS)}
+        with self._lock:
+            entries = {shard: self._index.get(key) for shard, key in keys.items()}
+
+        # Rows of each shard's files that haven't changed
+        cached = {}
+        for shard, entry in entries.items():
+            if entry is None or shard not in shard_files:
+                continue
+            unchanged = {file_path for file_path, signature in entry["files"].items()
+                         if shard_files[shard].get(file_path) == signature}
+            if len(unchanged) == 0 and entry["files"] != shard_files[shard]:
+                continue
+            df = self._load(keys[shard])
+            if df is not None:
+                cached[shard] = (entry["files"], unchanged, df)
+
+        unchanged_files = set().union(*(unchanged for _, unchanged, _ in cached.values()))
+        changed = [file_path for file_path in file_list if str(file_path) not in unchanged_files]
+        print(f"Parse cache: {len(changed)} of {len(file_list)} files new or changed")
+        profiling.count_cached_files(len(unchanged_files), sum(files[file_path][0] for file_path in unchanged_files))
+        parsed = parse_files(changed) if len(changed) > 0 or (len(files) == 0 and 0 not in cached) else None
+        if len(changed) > 0:
+            parsed_shards = parsed[path_column].map({str(file_path): _shard(str(file_path)) for file_path in changed}).to_numpy()
+
+        dfs = []
+        stored = set()
+        for shard, shard_signatures in shard_files.items():
+            entry_files, unchanged, df = cached.get(shard, (None, set(), None))
+            if entry_files == shard_signatures:
+                dfs.append(df)
+                continue
+
+            if len(files) == 0:
+                df = parsed
+            else:
+                # Rows of the shard's unchanged files, then of its new and changed ones
+                shard_dfs = [df[df[path_column].isin(unchanged)]] if df is not None else []
+                if len(changed) > 0:
+                    shard_dfs.append(parsed[parsed_shards == shard])
+                df = rw.concat_frames(shard_dfs, ignore_index=True)
+            self._store(keys[shard], df, shard_signatures, save=False)
+            stored.add(keys[shard])
+            dfs.append(df)
+
+        # Entries of shards that no longer have any files
+        for shard, entry in entries.items():
+            if entry is not None and shard not in shard_files:
+                self._discard(keys[shard])
+
+        with self._lock:
+            if self._changed or self._removed:
+                self._save_index(evict=len(stored) > 0, keep=stored)
+
+        if len(files) == 0:
+            return dfs[0]
+        # Put the rows back in file order
+        df = rw.concat_frames(dfs, ignore_index=True)
+        file_order = {str(file_path): i for i, file_path in enumerate(file_list)}
+        order = df[path_column].map(file_order).to_numpy()
+        return df.iloc[order.argsort(kind="stable")].reset_index(drop=True)
+
+    def _data_path(self, key):
+        """Path of the data file for a cache entry"""
+        return self.cache_dir / (hashlib.sha1(key.encode()).hexdigest() + _DATA_EXT)
+
+    def _load(self, key):
+        """Loads the data of a cache entry, or None if it can't be read"""
+        with self._lock:
+            df = self._memory.get(key) if self._memory is not None else None
+        if df is None:
+            data_path = self._data_path(key)
+            try:
+                if _DATA_EXT == ".parquet":
+                    df = pd.read_parquet(data_path)
+                else:
+                    df = pd.read_pickle(data_path)
+            except (OSError, ValueError):
+                return None
+
+        with self._lock:
+            # Another thread may have evicted the entry while it was being read. The last use
+            # is saved to disk with the next change to the index.
+            if key in self._index:
+                self._index[key]["last_used"] = time.time()
+                self._changed.add(key)
+                if self._memory is not None:
+                    self._memory[key] = df
+        return df
+
+    def _store(self, key, df, files, save=True):
+        """Saves the data of a cache entry, then evicts old entries if the cache is too big
+
+        With `save=False`, the index isn't saved (or the cache evicted) until `_save_index()` is
+        called, so a group of entries is saved in one go.
+        """
+        # Written under a name of its own and then moved into place, so a reader never sees half of it
+        data_path = self._data_path(key)
+        tmp_path = _temp_path(self.cache_dir, _DATA_EXT)
+        try:
+            if _DATA_EXT == ".parquet":
+                df.to_parquet(tmp_path, index=False)
+            else:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, data_path)
+        finally:
+            _remove(tmp_path)
+
+        with self._lock:
+            self._index[key] = {
+                "files": files,
+                "size": data_path.stat().st_size,
+                "last_used": time.time()
+            }
+            self._changed.add(key)
+            self._removed.discard(key)
+            if self._memory is not None:
+                self._memory[key] = df
+            if save:
+                self._save_index(evict=True, keep={key})
+
+    def _discard(self, key):
+        """Removes a cache entry; the index is saved with the next change"""
+        with self._lock:
+            if self._index.pop(key, None) is not None:
+                _remove(self._data_path(key))
+                self._removed.add(key)
+                self._changed.discard(key)
+            if self._memory is not None:
+                self._memory.pop(key, None)
+
+    def _evict(self, keep=()):
+        """Removes the least recently used entries until the cache fits in max_bytes; call with both locks held"""
+        total = sum(entry["size"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            total -= self._index[key]["size"]
+            _remove(self._data_path(key))
+            del self._index[key]
+            self._removed.add(key)
+            if self._memory is not None:
+                self._memory.pop(key, None)
+
+    def _read_index(self):
+        """The entries of the index on disk (empty if there's none yet, None if it's from another CACHE_VERSION)"""
+        try:
+            index = json.loads(self._index_path.read_text())
+        except FileNotFoundError:
+            return {}
+        if index.get("version") != CACHE_VERSION:
+            return None
+        return index["entries"]
+
+    def _clear(self):
+        """Deletes the entries of an index from another CACHE_VERSION and starts a new one; call with the file lock held"""
+        old_index = json.loads(self._index_path.read_text())
+        print(f"Parse cache in {self.cache_dir} is from another version, emptying it")
+        # Version 1 indexes are just the dict of the entries
+        entries = old_index["entries"] if "version" in old_index else old_index
+        for key in entries:
+            for ext in [".parquet", ".pkl"]:
+                _remove(self._data_path(key).with_suffix(ext))
+        self._index = {}
+        self._write_index()
+
+    def _write_index(self):
+        """Writes the index under a name of its own and then moves it into place, so an interrupted run can't corrupt it"""
+        tmp_path = _temp_path(self.cache_dir, ".json")
+        try:
+            tmp_path.write_text(json.dumps({"version": CACHE_VERSION, "entries": self._index}))
+            os.replace(tmp_path, self._index_path)
+        finally:
+            _remove(tmp_path)
+
+    def _save_index(self, evict=False, keep=()):
+        """Merges this process's changes into the index on disk and writes it; call with the lock held
+
+        Other processes may have added or evicted entries since the index was read, so only the
+        entries this process changed are taken from memory, under a lock on the cache folder.
+
+        Args:
+            evict (bool): if True, also evicts entries until the cache fits in max_bytes
+            keep (set, optional): keys that aren't evicted (the ones just stored)
+        """
+        with _locked(self.cache_dir / "index.lock"):
+            index = self._read_index() or {}
+            for key in self._removed:
+                index.pop(key, None)
+            for key in self._changed:
+                if key in self._index:
+                    index[key] = self._index[key]
+            self._index = index
+            if evict:
+                self._evict(keep)
+
+            self._write_index()
+            self._changed = set()
+            self._removed = set()
+
+
+def _shard(file_path):
+    """Which of the GROUP_SHARDS entries of its group a file is kept in"""
+    return int(hashlib.sha1(file_path.encode()).hexdigest()[:8], 16) % GROUP_SHARDS
+
+
+def _temp_path(folder, suffix):
+    """New file in folder with a unique name, for writing a file that's then moved into place"""
+    with tempfile.NamedTemporaryFile(dir=folder, suffix=suffix, prefix=".tmp_", delete=False) as file:
+        return Path(file.name)
+
+
+def _remove(file_path):
+    """Deletes a file, if it's there"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _locked(lock_path):
+    """Holds an exclusive lock on a file, so only one process at a time runs the block"""
+    with open(lock_path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+            # Locks the first byte of the file; retries for 10 seconds before giving up
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def file_signature(file_path):
+    """Size and modification time of a file, used to tell if it has changed
+
+    Stored in the parse cache index, and in the cached requirement index (see requirement_index.py).
+
+    Args:
+        file_path (str or pathlib.Path): path to the file
+
+    Returns:
+        list: [size, modification time in ns]
+    """
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
@@ -0,0 +1,332 @@
+import contextvars
+import cProfile
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Profiler that stage()/count_files() report to; None when profiling is off
+_active = None
+
+# Highest resident memory of the process before the high-water mark was last reset, in MB
+_peak_before_reset_mb = 0.0
+
+
+class StageRecord:
+    """Measurements of one stage of the pipeline
+
+    Stages set rows_in/rows_out themselves; the rest is filled in by the profiler. `files` and
+    `bytes_read` are the input files that were parsed; input files whose parsed rows came from
+    the parse cache instead are counted in `cached_files` and `cached_bytes`.
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.files = 0
+        self.bytes_read = 0
+        self.cached_files = 0
+        self.cached_bytes = 0
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        self.process_peak_rss_mb = None
+        self.thread = threading.current_thread()
+        # CPU time of nested stages that ran in other threads, which the stage's own thread doesn't see
+        self.other_threads_cpu_seconds = 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "cached_files": self.cached_files,
+            "cached_bytes": self.cached_bytes,
+            "peak_rss_mb": self.peak_rss_mb,
+            "process_peak_rss_mb": self.process_peak_rss_mb
+        }
+
+
+class Profiler:
+    """Records wall time, CPU time, rows in/out, files/bytes read and peak memory per stage
+
+    Stages can be nested; nested stages are named "<parent>/<child>". Stages can also run in
+    threads at the same time: each thread has its own stack of open stages, and a function run
+    through `submit()` starts out inside the stage that submitted it.
+
+    CPU time is the time of the thread that ran the stage, plus that of its nested stages that
+    ran in other threads; it doesn't count worker processes, or threads running other stages at
+    the same time. The peak memory of a stage is the highest resident memory of the process
+    while the stage ran (on Linux, where the high-water mark can be reset; None elsewhere), and
+    the process peak is the highest since the process started.
+    """
+
+    def __init__(self, cprofile=False):
+        """
+        Args:
+            cprofile (bool): if True, also runs cProfile on each top level stage and keeps
+                the stats of the slowest one
+        """
+        self.cprofile = cprofile
+        self.records = []
+        self._stack = contextvars.ContextVar("profiling_stack", default=())
+        self._lock = threading.Lock()
+        self._hottest = None # (wall seconds, stage name, cProfile.Profile)
+        # Highest resident memory seen so far by each stage that's running, in MB
+        self._open_peaks = {}
+        self._can_reset_peak = _reset_rss_high_water()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Context manager that measures the code run inside of it as one stage
+
+        Args:
+            name (str): name of the stage
+            rows_in (int, optional): number of rows going into the stage
+
+        Yields:
+            StageRecord: the stage's measurements; set its rows_out before the stage ends
+        """
+        stack = self._stack.get()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            name = f"{parent.name}/{name}"
+        record = StageRecord(name, rows_in)
+        with self._lock:
+            self.records.append(record)
+            if self._can_reset_peak:
+                # The high-water mark is for the whole process, so the running stages take
+                # its value before it's reset for this one
+                self._fold_peak()
+                _reset_rss_high_water()
+                self._open_peaks[record] = _rss_high_water_mb()
+        token = self._stack.set(stack + (record,))
+
+        # Only one cProfile can run at a time, so only top level stages of the main thread get one
+        profile = None
+        if self.cprofile and parent is None and threading.current_thread() is threading.main_thread():
+            profile = cProfile.Profile()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record.wall_seconds = round(time.perf_counter() - wall_start, 4)
+            cpu_seconds = time.thread_time() - cpu_start
+            self._stack.reset(token)
+
+            with self._lock:
+                record.cpu_seconds = round(cpu_seconds + record.other_threads_cpu_seconds, 4)
+                if parent is not None and parent.thread is not record.thread:
+                    parent.other_threads_cpu_seconds += record.cpu_seconds
+
+                if self._can_reset_peak:
+                    self._fold_peak()
+                    record.peak_rss_mb = self._open_peaks.pop(record)
+                record.process_peak_rss_mb = peak_rss_mb()
+                if record.peak_rss_mb is not None and record.process_peak_rss_mb is not None:
+                    record.process_peak_rss_mb = max(record.process_peak_rss_mb, record.peak_rss_mb)
+
+                # Files read in a nested stage were also read by its parent (and, once the
+                # parent finishes, by the parent's parent)
+                if parent is not None:
+                    parent.files += record.files
+                    parent.bytes_read += record.bytes_read
+                    parent.cached_files += record.cached_files
+                    parent.cached_bytes += record.cached_bytes
+
+                if profile is not None and (self._hottest is None or record.wall_seconds > self._hottest[0]):
+                    self._hottest = (record.wall_seconds, name, profile)
+
+    def _fold_peak(self):
+        """Adds the high-water mark since the last reset to the peaks of the running stages; call with the lock held"""
+        high_water = _rss_high_water_mb()
+        for record, peak in self._open_peaks.items():
+            self._open_peaks[record] = max(peak, high_water)
+
+    def count_files(self, num_files, num_bytes):
+        """Adds to the files processed and bytes read of the current stage"""
+        stack = self._stack.get()
+        if stack:
+            with self._lock:
+                stack[-1].files += num_files
+                stack[-1].bytes_read += num_bytes
+
+    def count_cached_files(self, num_files, num_bytes):
+        """Adds to the input files (and their size) of the current stage that were taken from the parse cache"""
+        stack = self._stack.get()
+        if stack:
+            with self._lock:
+                stack[-1].cached_files += num_files
+                stack[-1].cached_bytes += num_bytes
+
+    def report(self):
+        """All the measurements so far
+
+        Returns:
+            dict: stage records, in the order the stages started
+        """
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "hottest_stage": self._hottest[1] if self._hottest else None,
+            "stages": [record.to_dict() for record in self.records]
+        }
+
+    def write_report(self, output_path):
+        """Writes the measurements to a .json file
+
+        Args:
+            output_path (str): path of the .json report
+        """
+        with open(output_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Profile report written to {output_path}")
+
+    def dump_hottest_stats(self, output_path):
+        """Writes the cProfile stats of the slowest top level stage, for `pstats`/snakeviz
+
+        Args:
+            output_path (str): path of the .pstats file
+        """
+        if self._hottest is None:
+            return
+        self._hottest[2].dump_stats(output_path)
+        print(f"cProfile stats of slowest stage ({self._hottest[1]}) written to {output_path}")
+
+
+def start(cprofile=False):
+    """Turns on profiling for the pipeline
+
+    Args:
+        cprofile (bool): if True, also runs cProfile on each top level stage
+
+    Returns:
+        Profiler: the profiler that stages report to
+    """
+    global _active
+    _active = Profiler(cprofile)
+    return _active
+
+
+def stop():
+    """Turns off profiling"""
+    global _active
+    _active = None
+
+
+def is_enabled():
+    """True if profiling is on; use to skip work (like stat-ing files) that's only needed for profiling"""
+    return _active is not None
+
+
+def stage(name, rows_in=None):
+    """Measures the code inside a `with` block as one stage, if profiling is on
+
+    >>> with profiling.stage("validate_trace", rows_in=len(trace)) as record:
+    ...     trace, invalid = validate_trace(trace, ...)
+    ...     record.rows_out = len(trace)
+
+    Args:
+        name (str): name of the stage
+        rows_in (int, optional): number of rows going into the stage
+
+    Returns:
+        context manager that yields a StageRecord
+    """
+    if _active is None:
+        return _no_stage(name, rows_in)
+    return _active.stage(name, rows_in)
+
+
+@contextmanager
+def _no_stage(name, rows_in):
+    """Stand-in for Profiler.stage() when profiling is off"""
+    yield StageRecord(name, rows_in)
+
+
+def count_files(num_files, num_bytes):
+    """Adds to the files processed and bytes read of the current stage, if profiling is on"""
+    if _active is not None:
+        _active.count_files(num_files, num_bytes)
+
+
+def count_cached_files(num_files, num_bytes):
+    """Adds to the input files of the current stage that were taken from the parse cache, if profiling is on"""
+    if _active is not None:
+        _active.count_cached_files(num_files, num_bytes)
+
+
+def submit(executor, func, *args, **kwargs):
+    """`executor.submit()` for a thread pool that runs func inside the current stage
+
+    Stages that func starts are nested under the stage that submitted it, just like when
+    func is called directly. Only works with thread pools, not process pools.
+
+    Args:
+        executor (concurrent.futures.ThreadPoolExecutor): pool to run func in
+        func (function): function to run
+        *args, **kwargs: arguments of func
+
+    Returns:
+        concurrent.futures.Future: the future of func's result
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process since it started, in MB (None where it isn't available, e.g. Windows)
+
+    This never goes down; the peak of a stage is in its StageRecord.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == "darwin":
+        return round(max_rss / 1024 / 1024, 1)
+    # Resetting the high-water mark for a stage also resets ru_maxrss
+    return max(round(max_rss / 1024, 1), _peak_before_reset_mb)
+
+
+def _rss_high_water_mb():
+    """Peak resident memory of this process since the last `_reset_rss_high_water()`, in MB (Linux only)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _reset_rss_high_water():
+    """Resets the peak resident memory of this process to its current memory
+
+    Returns:
+        bool: False if the OS can't (only Linux 4.0+ can)
+    """
+    global _peak_before_reset_mb
+    high_water = _rss_high_water_mb()
+    if high_water is None:
+        return False
+    _peak_before_reset_mb = max(_peak_before_reset_mb, high_water)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
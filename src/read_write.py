@@ -1,21 +1,113 @@
+import codecs
 import csv
-import pathlib
+import gzip
+import io
+import locale
+import mmap
+import multiprocessing
+import os
 import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from xml.etree import ElementTree
 
-import openpyxl as pyxl
+import numpy as np
 import pandas as pd
-from docx import Document
-from openpyxl import Workbook
 
+import discovery
+import profiling
+from readers import TXT_PARSERS, ERROR_LOG_FORMATS, TRACE_FORMATS
 
-def read_trace(file_path, matrix_type, return_df=True):
+# openpyxl and python-docx are only imported by the readers and writers that need them, so
+# runs that don't touch .xlsx files or MSGateway documents don't have to load them
+
+# V&V Test Report number in an ER folder/file name (e.g. "ER2228014 v51" or "ER2228014v53")
+_VV_REPORT_PATTERN = re.compile("ER([0-9]+ v[0-9]+|[0-9]+v[0-9]+)")
+
+# Namespace of the WordprocessingML tags in a .docx's word/document.xml
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Package name that's stripped from the front of rest api test names
+_API_TEST_PACKAGE = "com.philips.sapphire.systemintegrationtests."
+
+# Most bytes of .txt files the "bytes" parser scans at once; bigger files are memory mapped and scanned a block at a time
+TXT_BLOCK_BYTES = 16 * 1024 * 1024
+
+# The text parsers decode .txt files with the locale's encoding; the "bytes" parser can only
+# scan non-ASCII bytes itself if that's UTF-8
+_LOCALE_IS_UTF8 = codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8"
+
+# Columns that hold a handful of distinct values repeated over many rows. The readers and
+# create_trace store them as categoricals (a small int code per row) instead of a string per row.
+CATEGORICAL_COLUMNS = ["Method", "Test Status", "Release", "V&V Test Report", "Owner", "Application", "RC"]
+
+# Columns of the rows read from the automatic test .txt files (also when there are no files)
+TXT_COLUMNS = ["Test Name", "Test Status", "Release", "V&V Test Report", "RC", "Owner", "File Path"]
+
+
+def apply_schema(df):
+    """Converts the CATEGORICAL_COLUMNS of a dataframe to categoricals, in place
+
+    Args:
+        df (pd.DataFrame): data read in by one of the readers
+
+    Returns:
+        pd.DataFrame: the same dataframe
+    """
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def concat_frames(dfs, **kwargs):
+    """`pd.concat()` that keeps the CATEGORICAL_COLUMNS categorical
+
+    `pd.concat()` turns categoricals back into strings unless every dataframe has the exact
+    same categories, so the categories are unioned first.
+
+    Args:
+        dfs (list): dataframes to concatenate
+        **kwargs: passed on to `pd.concat()`
+
+    Returns:
+        pd.DataFrame: the concatenated dataframe
+    """
+    dfs = list(dfs)
+    for column in CATEGORICAL_COLUMNS:
+        dtypes = [df[column].dtype for df in dfs if column in df.columns]
+        if len(dtypes) < 2 or not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+
+        # Union of the categories, in the order they're first seen
+        categories = dtypes[0].categories
+        for dtype in dtypes[1:]:
+            categories = categories.append(dtype.categories[~dtype.categories.isin(categories)])
+
+        dfs = [df.assign(**{column: df[column].cat.set_categories(categories)}) if column in df.columns else df for df in dfs]
+    return pd.concat(dfs, **kwargs)
+
+
+def read_trace(file_path, matrix_type, return_df=True, chunksize=10000, sidecar=False):
     """Loads trace matrix .xlsx file and extracts data
 
+    The worksheet is streamed in read-only mode (cell values only, no formulas or styles), and
+    the rows are turned into columns a chunk at a time, so the whole workbook is never loaded.
+
+    With `sidecar=True`, the trace is also saved as a columnar file next to the workbook
+    (`<name>.<matrix_type>.parquet`, or `.pkl` without pyarrow). Later loads use that file
+    instead of parsing the workbook again, until the workbook is modified.
+
     Args:
         file_path (String): path to the trace file
         matrix_type (String): "CO" or "PSC"
         return_df (bool, optional): If true (default), returns a pandas dataframe. Else, returns list of lists.
+        chunksize (int, optional): number of rows turned into columns at a time. Defaults to 10000.
+        sidecar (bool, optional): If true, reads/writes the columnar sidecar file. Defaults to False.
 
     Returns:
         list or pd.DataFrame: the trace data
@@ -26,42 +118,114 @@ def read_trace(file_path, matrix_type, return_df=True):
     matrix_type = matrix_type.upper()
     assert matrix_type in ["CO", "PSC"], f"Trace matrix type must be either 'CO' or 'PSC'\nCurrent type: {matrix_type}"
 
-    # Load in the actual excel file
-    wb = pyxl.load_workbook(file_path)
+    # Use the sidecar if it was made from the current version of the workbook
+    sidecar_path = _trace_sidecar_path(file_path, matrix_type)
+    if sidecar and sidecar_path.exists() and sidecar_path.stat().st_mtime_ns >= os.stat(file_path).st_mtime_ns:
+        print(f"Using columnar copy of trace: {sidecar_path}")
+        df = pd.read_parquet(sidecar_path) if sidecar_path.suffix == ".parquet" else pd.read_pickle(sidecar_path)
+        return df if return_df else _trace_rows(df)
+
+    # Load in the actual excel file, streaming values only
+    import openpyxl as pyxl
+    wb = pyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        # Get the appropriate matrix from the workbook
+        if matrix_type == "CO":
+            ws = wb['CO Trace Matrix']
+        else:
+            ws = wb['PSC Trace Matrix']
+
+        rows = ws.iter_rows(max_col=5, values_only=True)
+
+        # get title of workbook (A1)
+        title = _pad_row(next(rows, ()), 5)[0]
+        print(f"Loading in worksheet titled: {title}")
+
+        # extract headers for the table (A3:E3)
+        next(rows, None)
+        headers = list(_pad_row(next(rows, ()), 5))
+
+        # load in the data from row 4 onwards, a chunk of rows at a time
+        chunks = []
+        chunk = []
+        for row in rows:
+            # Stop if all the row data is none
+            # apparently the blank rows in the bottom of the worksheet are populated...
+            if all(cell is None for cell in row):
+                break
+            chunk.append(_pad_row(row, 5))
+            if len(chunk) == chunksize:
+                chunks.append(_rows_to_columns(chunk, headers))
+                chunk = []
+        if chunk or not chunks:
+            chunks.append(_rows_to_columns(chunk, headers))
+    finally:
+        # Read-only workbooks keep the file open until closed
+        wb.close()
+
+    # Give each column its type once all the rows are in (e.g. text columns become strings)
+    df = apply_schema(pd.concat(chunks, ignore_index=True).infer_objects())
+
+    if sidecar:
+        if sidecar_path.suffix == ".parquet":
+            df.to_parquet(sidecar_path, index=False)
+        else:
+            df.to_pickle(sidecar_path)
+        print(f"Saved columnar copy of trace to {sidecar_path}")
 
-    # Get the appropriate matrix from the workbook
-    if matrix_type == "CO":
-        ws = wb['CO Trace Matrix']
+    # Returns either pandas dataframe or a list of lists
+    if return_df:
+        return df
     else:
-        ws = wb['PSC Trace Matrix']
+        return _trace_rows(df)
 
-    # get title of workbook
-    title = ws['A1'].value
-    print(f"Loading in worksheet titled: {title}")
 
-    # extract headers for the table
-    headers = [cell.value for cell in ws['A3':'E3'][0]]
+def _trace_rows(df):
+    """Rows of a trace as a list of lists, with blank cells as None like in the worksheet"""
+    return df.astype(object).where(df.notna(), None).values.tolist()
 
-    # load in the data row by row
-    data = []
-    for row in ws.iter_rows(min_row=4, max_col=5, values_only=True):
-        row_data = [cell for cell in row]
 
-        # Stop if all the row data is none
-        # apparently the blank rows in the bottom of the worksheet are populated...
-        if all([cell == None for cell in row_data]):
-            break
-        data.append(row_data)
+def _pad_row(row, num_cols):
+    """Pads a worksheet row to num_cols cells (read-only rows stop at the last cell with a value)"""
+    row = tuple(row)
+    return row + (None,) * (num_cols - len(row)) if len(row) < num_cols else row
+
+
+def _rows_to_columns(rows, headers):
+    """Turns a chunk of worksheet rows into a dataframe, building each column in one go
+
+    Args:
+        rows (list): tuples of cell values
+        headers (list): column names
+
+    Returns:
+        pd.DataFrame: the rows, as object columns
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(headers)
+    df = pd.DataFrame({i: np.array(column, dtype=object) for i, column in enumerate(columns)})
+    # Set afterwards, so blank or repeated headers are kept as they are
+    df.columns = headers
+    return df
+
+
+def _trace_sidecar_path(file_path, matrix_type):
+    """Path of the columnar copy of a trace matrix workbook, saved next to it"""
+    file_path = Path(file_path)
+    try:
+        import pyarrow
+        ext = ".parquet"
+    except ImportError:
+        ext = ".pkl"
+    return file_path.with_name(f"{file_path.stem}.{matrix_type}{ext}")
 
-    # Returns either pandas dataframe or a list of lists
-    if return_df:
-        return pd.DataFrame(data, columns=headers)
-    else:
-        return data
 
 def read_as_run_tests(file_path, return_df=True):
     """Loads in the test statuses from the manual as run tests document. Document must be in .docx format.
 
+    The document's XML is streamed straight from the .docx in one pass, so the whole document
+    never has to be loaded into memory. Each "Run ID:" paragraph (the test name is the paragraph
+    before it) is paired with the status table that follows it.
+
     Args:
         file_path (String): path to the file (.docx)
         return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
@@ -69,59 +233,167 @@ def read_as_run_tests(file_path, return_df=True):
     Returns:
         pd.DataFrame or dict: Test names and corresponding statuses
     """
-    # Open the file and read with python-docx package
-    with open(file_path, 'rb') as f:
-        document = Document(f)
-        
-    # Get the test names
-    # (Need to iterate separately because theyre technically separate "paragraphs")
-    test_names = []
-    run_ids = []
-    # For each "paragraph" in the document,
-    for i, paragraph in enumerate(document.paragraphs):
-        # Find lines that have "Run ID" in them
-        if "Run ID:" in paragraph.text:
-            # The line before that has the test name
-            test_names.append(document.paragraphs[i-1].text)
-            # Also store the run_id (for error log)
-            run_id = int(paragraph.text.replace("Run ID:", ""))
-            run_ids.append(run_id)
-
-    # Get the table info
     data = []
+    if profiling.is_enabled():
+        profiling.count_files(1, os.path.getsize(file_path))
+
+    # Test name and run id of the last "Run ID:" paragraph that hasn't been paired with a table yet
+    test_name = None
+    run_id = None
+    prev_paragraph = ""
+
+    for element_type, content in _iter_docx_body(file_path):
+        if element_type == "p":
+            # Find lines that have "Run ID" in them
+            if "Run ID:" in content:
+                if run_id is not None:
+                    print(f"Run ID {run_id} has no status table, skipping it")
+
+                # The line before that has the test name
+                test_name = prev_paragraph
+                # Also store the run_id (for error log)
+                run_id = int(content.replace("Run ID:", ""))
+            prev_paragraph = content
 
-    # For each table in the document:
-    entry_idx = 0
-    for table in document.tables:
         # If the first few cells belong to a test, it's probably a test description table
-        if table.cell(0,0).text == "Status:" and table.cell(1,2).text == "1. Product":
+        elif _table_cell(content, 0, 0) == "Status:" and _table_cell(content, 1, 2) == "1. Product":
+            if run_id is None:
+                print("Found a status table without a Run ID, skipping it")
+                continue
+
             # Extract the test info from table
             data.append({
-                "Test Name": test_names[entry_idx],
-                "Run ID": run_ids[entry_idx],
-                "Test Status": table.cell(0,1).text,
-                "Release":table.cell(2,1).text,
-                "Application": table.cell(1,3).text,
-                "Owner": table.cell(1,1).text
+                "Test Name": test_name,
+                "Run ID": run_id,
+                "Test Status": _table_cell(content, 0, 1),
+                "Release": _table_cell(content, 2, 1),
+                "Application": _table_cell(content, 1, 3),
+                "Owner": _table_cell(content, 1, 1)
             })
-
-            entry_idx += 1
+            run_id = None
 
     # make a dataframe for outputting
     df = pd.DataFrame(data)
 
     # Also add the V&V Test Report info by extracting it from file name
     file_name = Path(file_path).stem
-    v_v = re.findall("ER([0-9]+ v[0-9]+|[0-9]+v[0-9]+)", file_name)[0].replace("ER", "")
+    v_v = _VV_REPORT_PATTERN.findall(file_name)[0].replace("ER", "")
     df["V&V Test Report"] = v_v
 
     # Output as either pandas dataframe or dict, depending on return_df setting.
     if return_df:
-        return df
+        return apply_schema(df)
     else:
         return df.to_dict('records')
 
 
+def _iter_docx_body(file_path):
+    """Streams the paragraphs and tables in the body of a .docx, in document order.
+
+    Paragraphs and tables inside of tables aren't returned separately; they're part of their table.
+
+    Args:
+        file_path (String): path to the file (.docx)
+
+    Yields:
+        tuple: ("p", paragraph text) or ("tbl", table cell text as a list of rows)
+    """
+    with zipfile.ZipFile(file_path) as docx_zip, docx_zip.open("word/document.xml") as xml_file:
+        # document > body > paragraphs and tables, so body level elements end at depth 2
+        depth = 0
+        body = None
+        for event, element in ElementTree.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2:
+                    body = element
+                continue
+
+            depth -= 1
+            if depth != 2:
+                continue
+
+            if element.tag == _W + "p":
+                yield "p", _paragraph_text(element)
+            elif element.tag == _W + "tbl":
+                yield "tbl", _table_text(element)
+
+            # Free the element now that it's been read
+            body.clear()
+
+
+def _paragraph_text(paragraph):
+    """Gets the text of a <w:p> element, the same way as python-docx's `Paragraph.text`"""
+    text = []
+    for child in paragraph:
+        if child.tag == _W + "r":
+            runs = [child]
+        elif child.tag == _W + "hyperlink":
+            runs = child.findall(_W + "r")
+        else:
+            continue
+
+        for run in runs:
+            for element in run:
+                if element.tag == _W + "t":
+                    text.append(element.text or "")
+                elif element.tag in (_W + "tab", _W + "ptab"):
+                    text.append("\t")
+                elif element.tag == _W + "cr":
+                    text.append("\n")
+                elif element.tag == _W + "br" and element.get(_W + "type", "textWrapping") == "textWrapping":
+                    text.append("\n")
+                elif element.tag == _W + "noBreakHyphen":
+                    text.append("-")
+    return "".join(text)
+
+
+def _table_text(table):
+    """Gets the text of each cell of a <w:tbl> element.
+
+    Like python-docx's `Table.cell()`, merged cells are repeated in each row/column they span.
+
+    Args:
+        table (xml.etree.ElementTree.Element): the table element
+
+    Returns:
+        list: rows, each a list of cell text
+    """
+    rows = []
+    # findall() only gets rows of this table, not of tables nested in its cells
+    for row in table.findall(_W + "tr"):
+        cells = []
+        for cell in row.findall(_W + "tc"):
+            text = "\n".join(_paragraph_text(p) for p in cell.findall(_W + "p"))
+
+            span = 1
+            merge = None
+            properties = cell.find(_W + "tcPr")
+            if properties is not None:
+                grid_span = properties.find(_W + "gridSpan")
+                if grid_span is not None:
+                    span = int(grid_span.get(_W + "val"))
+                v_merge = properties.find(_W + "vMerge")
+                if v_merge is not None:
+                    merge = v_merge.get(_W + "val", "continue")
+
+            for _ in range(span):
+                # Vertically merged cells show the text of the cell above
+                if merge == "continue" and len(rows) > 0 and len(cells) < len(rows[-1]):
+                    cells.append(rows[-1][len(cells)])
+                else:
+                    cells.append(text)
+        rows.append(cells)
+    return rows
+
+
+def _table_cell(rows, row_idx, col_idx):
+    """Gets the text of a table cell from `_table_text()` output, or "" if the table is too small"""
+    if row_idx < len(rows) and col_idx < len(rows[row_idx]):
+        return rows[row_idx][col_idx]
+    return ""
+
+
 def read_msgateway_results(file_path, return_df=True):
     """Loads in the test statuses from the automatic MSGateway tests document. Document must be in .docx format.
 
@@ -133,6 +405,7 @@ def read_msgateway_results(file_path, return_df=True):
         pd.DataFrame or dict: Test names and corresponding statuses
     """
     # Read the document
+    from docx import Document
     with open(file_path, 'rb') as f:
         document = Document(f)
 
@@ -175,6 +448,7 @@ def read_performance_test_results_by_tc(file_path, return_df=True):
         pd.DataFrame or dict: Test names and corresponding statuses
     """
     # Load workbook
+    import openpyxl as pyxl
     wb = pyxl.load_workbook(file_path)
 
     # Read table values (includes header at row 1)
@@ -199,37 +473,48 @@ def read_performance_test_results_by_tc(file_path, return_df=True):
         return df.to_dict('records')
 
 
-def read_rest_api_tests(folder_path, return_df=True):
+def read_rest_api_tests(folder_path, return_df=True, jobs=1, parser="rows", cache=None):
     """Reads in all the rest api automatic test .txt files.
     
-    Will recursively go through the folders and read in .txt files.
+    Will recursively go through the folders (see `discovery.find_txt_files()`) and read in .txt files.
     Make sure everything is unzipped first; in future can add functionality to
     unzip automatically if needed.
 
     Args:
         folder_path (String or pathlib.Path): path to the main RestApiTests folder.
         return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
+        jobs (int, optional): Number of worker processes used to parse the files. Defaults to 1 (no pool).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows" (default) parses line by line, "columnar" parses each file
+            with vectorized pandas string operations, "bytes" scans the raw bytes of each file (see
+            `_read_txt_bytes()`). All give the same output; a line without a '|' gets a missing Test Status.
+        cache (parse_cache.ParseCache, optional): If given, only files that are new or changed
+            since the last run are parsed. Defaults to None (parse everything).
 
     Returns:
         pd.DataFrame or dict: Test names and corresponding statuses
     """
     print(f"Loading api test files from {folder_path}")
+    assert parser in TXT_PARSERS, f"Parser must be one of {TXT_PARSERS}\nCurrent parser: {parser}"
     if isinstance(folder_path, str):
         folder_path = Path(folder_path)
 
-    # Read all .txt files recursively in the folders
-    file_list = [file_name for file_name in folder_path.rglob("*.txt") if "__MACOSX" not in str(file_name)]
+    # Find all .txt files recursively in the folders
+    txt_files = discovery.find_txt_files(folder_path)
+    file_list = [txt_file.path for txt_file in txt_files]
     
     print(f"Total # API .txt files: {len(file_list)}")
     
-    # Load in the data from each file, add to a single list
-    data = []
-    for file_name in file_list:
-        data.extend(_read_group_by_method_txt(file_name, return_df=False))
+    # Load in the data from each file into a single dataframe. The cache works with paths; the
+    # parsers get the TxtFile's back, with the Release, RC and Owner already split out.
+    if cache is not None:
+        txt_files_by_path = {txt_file.path: txt_file for txt_file in txt_files}
+        df = cache.read_files(f"RestApiTests:{folder_path.resolve()}", file_list,
+                              lambda files: _read_txt_files([txt_files_by_path[file_path] for file_path in files], "RestApiTests", jobs, parser),
+                              signatures=_txt_signatures(txt_files))
+    else:
+        df = _read_txt_files(txt_files, "RestApiTests", jobs, parser)
 
-    # make a dataframe for outputting
-    df = pd.DataFrame(data)
-    
     # Output as either pandas dataframe or dict, depending on return_df setting.
     if return_df:
         return df
@@ -237,24 +522,563 @@ def read_rest_api_tests(folder_path, return_df=True):
         return df.to_dict('records')
 
 
+def iter_rest_api_tests(folder_path, batch_files=100, jobs=1, parser="rows"):
+    """Reads in the rest api automatic test .txt files a batch at a time.
+
+    Same rows as `read_rest_api_tests()`, in the same order, but only a few batches are
+    ever in memory, however many files the folder holds.
+
+    Args:
+        folder_path (String or pathlib.Path): path to the main RestApiTests folder.
+        batch_files (int, optional): number of files per batch. Defaults to 100.
+        jobs (int, optional): Number of worker processes used to parse the batches. Defaults to 1 (no pool).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows", "columnar" or "bytes". Defaults to "rows".
+
+    Yields:
+        pd.DataFrame: Test names and corresponding statuses of a batch of files
+    """
+    print(f"Loading api test files from {folder_path} in batches of {batch_files}")
+    assert parser in TXT_PARSERS, f"Parser must be one of {TXT_PARSERS}\nCurrent parser: {parser}"
+    if isinstance(folder_path, str):
+        folder_path = Path(folder_path)
+
+    # Find all .txt files recursively in the folders
+    txt_files = discovery.find_txt_files(folder_path)
+
+    print(f"Total # API .txt files: {len(txt_files)}")
+
+    yield from _iter_txt_files(txt_files, "RestApiTests", batch_files, jobs, parser)
+
+
+def _txt_signatures(txt_files):
+    """Size and modification time of each file found by `discovery.find_txt_files()`, for the parse cache"""
+    return {txt_file.path: [txt_file.size, txt_file.mtime_ns] for txt_file in txt_files}
+
+
+def _read_txt_files(file_list, base_folder_name, jobs=1, parser="rows"):
+    """Reads in a list of automatic test .txt files, optionally spread over a process pool.
+
+    The file list is split into contiguous shards that are parsed concurrently. Shards are
+    merged back in their original order, so the rows come out exactly as if the files
+    were read one at a time.
+
+    Args:
+        file_list (list): the .txt files, as `discovery.TxtFile`'s (or paths)
+        base_folder_name (String): "RestApiTests" or "Rx"
+        jobs (int, optional): Number of worker processes. Defaults to 1 (read in this process).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows", "columnar" or "bytes". Defaults to "rows".
+
+    Returns:
+        pd.DataFrame: rows of all the files, in file order
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    file_list = [_as_txt_file(file, base_folder_name) for file in file_list]
+
+    # Workers can't report to the profiler, so the files are counted here
+    if profiling.is_enabled():
+        profiling.count_files(len(file_list), sum(txt_file.size for txt_file in file_list))
+
+    if jobs <= 1 or len(file_list) <= 1:
+        return _read_txt_shard(file_list, base_folder_name, parser)
+
+    # Use a few shards per worker so uneven file sizes don't leave workers idle
+    num_shards = min(len(file_list), jobs * 4)
+    shard_size = -(-len(file_list) // num_shards) # ceiling division
+    shards = [file_list[i:i + shard_size] for i in range(0, len(file_list), shard_size)]
+
+    with _process_pool(jobs) as executor:
+        # map() returns results in submission order, no matter which shard finishes first
+        dfs = list(executor.map(_read_txt_shard, shards, [base_folder_name] * len(shards), [parser] * len(shards)))
+    return concat_frames(dfs, ignore_index=True)
+
+
+def _iter_txt_files(file_list, base_folder_name, batch_files=100, jobs=1, parser="rows"):
+    """Reads in a list of automatic test .txt files, yielding the rows a batch of files at a time.
+
+    With a process pool, only a couple of batches per worker are submitted ahead of the one
+    being yielded, so memory stays bounded. Batches come out in file order.
+
+    Args:
+        file_list (list): the .txt files, as `discovery.TxtFile`'s (or paths)
+        base_folder_name (String): "RestApiTests" or "Rx"
+        batch_files (int, optional): number of files per batch. Defaults to 100.
+        jobs (int, optional): Number of worker processes. Defaults to 1 (read in this process).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows", "columnar" or "bytes". Defaults to "rows".
+
+    Yields:
+        pd.DataFrame: rows of a batch of files
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    file_list = [_as_txt_file(file, base_folder_name) for file in file_list]
+
+    batches = [file_list[i:i + batch_files] for i in range(0, len(file_list), batch_files)]
+
+    if jobs <= 1 or len(batches) <= 1:
+        for batch in batches:
+            if profiling.is_enabled():
+                profiling.count_files(len(batch), sum(txt_file.size for txt_file in batch))
+            yield _read_txt_shard(batch, base_folder_name, parser)
+        return
+
+    with _process_pool(jobs) as executor:
+        pending = deque()
+        for batch in batches:
+            if profiling.is_enabled():
+                profiling.count_files(len(batch), sum(txt_file.size for txt_file in batch))
+            pending.append(executor.submit(_read_txt_shard, batch, base_folder_name, parser))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _process_pool(jobs, initializer=None, initargs=()):
+    """Process pool for parsing .txt files (or processing releases, in run.py's batch mode)
+
+    Forking a process while other threads are running (e.g. when run.py loads its inputs
+    concurrently, or in the trace service) can leave the children stuck on a lock that one of
+    those threads held, so pools started from a thread other than the main one fork their
+    workers from a fresh server process instead.
+
+    Args:
+        jobs (int): number of worker processes
+        initializer (function, optional): run in each worker when it starts
+        initargs (tuple, optional): arguments of initializer
+
+    Returns:
+        ProcessPoolExecutor: the pool
+    """
+    if threading.current_thread() is threading.main_thread() or "forkserver" not in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs)
+    # Workers are forked from a single-threaded server process that has already imported this module
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=initializer, initargs=initargs)
+
+
+def _read_txt_shard(file_list, base_folder_name, parser="rows"):
+    """Reads in one shard of .txt files in the current process.
+
+    Args:
+        file_list (list): the .txt files, as `discovery.TxtFile`'s (or paths)
+        base_folder_name (String): "RestApiTests" or "Rx"
+        parser (String, optional): "rows", "columnar" or "bytes". Defaults to "rows".
+
+    Returns:
+        pd.DataFrame: rows of all the files, in file order
+    """
+    file_list = [_as_txt_file(file, base_folder_name) for file in file_list]
+    if parser == "columnar":
+        return _read_txt_columnar(file_list, base_folder_name)
+    if parser == "bytes":
+        return _read_txt_bytes(file_list, base_folder_name)
+
+    read_txt = _read_group_by_method_txt if base_folder_name == "RestApiTests" else _read_rx_txt
+    data = []
+    for txt_file in file_list:
+        data.extend(read_txt(txt_file, return_df=False))
+    return apply_schema(pd.DataFrame(data, columns=TXT_COLUMNS))
+
+
+def _read_txt_columnar(file_list, base_folder_name):
+    """Reads in automatic test .txt files column-wise instead of building a dict per line.
+
+    Each file is read as a whole buffer and split on '|' by pandas' C csv parser, then the
+    per-file columns (Release, RC, Owner etc.) are broadcast to all the lines of the file.
+    Gives the same output as `_read_group_by_method_txt()`/`_read_rx_txt()`.
+
+    Args:
+        file_list (list): the .txt files, as `discovery.TxtFile`'s
+        base_folder_name (String): "RestApiTests" or "Rx"
+
+    Returns:
+        pd.DataFrame: rows of all the files, in file order
+    """
+    test_names = []
+    statuses = []
+    line_counts = []
+    for txt_file in file_list:
+        names, file_statuses = _split_txt_buffer(_read_txt_text(txt_file.path, base_folder_name))
+        test_names.append(names)
+        statuses.append(file_statuses)
+        line_counts.append(len(names))
+
+    status_codes, unique_statuses = pd.factorize(np.concatenate(statuses) if statuses else np.array([], dtype=object))
+    test_names = np.concatenate(test_names) if test_names else np.array([], dtype=object)
+    return _txt_frame(test_names, status_codes, unique_statuses, file_list, base_folder_name, line_counts)
+
+
+def _read_txt_text(file_path, base_folder_name):
+    """Reads in the contents of an automatic test .txt file, without the rest api package name"""
+    text = Path(file_path).read_text()
+
+    # Remove the "com.philips.sapphire.systemintegrationtests." part
+    if base_folder_name == "RestApiTests":
+        text = text.replace(_API_TEST_PACKAGE, "")
+    return text
+
+
+def _txt_frame(test_names, status_codes, unique_statuses, file_list, base_folder_name, line_counts):
+    """Builds the rows of a list of .txt files from their test names and factorized statuses.
+
+    Args:
+        test_names (np.ndarray or pd.api.extensions.ExtensionArray): test name of each line
+        status_codes (np.ndarray): code of each line's raw status in unique_statuses (-1 if it has none)
+        unique_statuses (array-like): the raw statuses (not capitalized yet)
+        file_list (list): the .txt files, as `discovery.TxtFile`'s
+        base_folder_name (String): "RestApiTests" or "Rx"
+        line_counts (list): number of lines of each file
+
+    Returns:
+        pd.DataFrame: rows of all the files, in file order
+    """
+    # Only a handful of different statuses, so only capitalize each of those once.
+    # Different raw statuses can capitalize the same way, so the capitalized ones are factorized again.
+    capitalized_codes, capitalized = pd.factorize(np.array([status.lower().capitalize() for status in unique_statuses], dtype=object))
+    # Code -1 (missing status) picks the -1 appended at the end, so it stays missing
+    status_codes = np.append(capitalized_codes, -1)[status_codes]
+
+    df = pd.DataFrame({
+        'Test Name': test_names,
+        'Test Status': pd.Categorical.from_codes(status_codes, pd.Index(capitalized))
+    })
+
+    # Broadcast the per-file columns to each line of the file. The categorical ones are
+    # built straight from each file's code, so the repeated strings never exist per line.
+    file_metadata = [_resolve_file_metadata(txt_file, base_folder_name) for txt_file in file_list]
+    file_idx = np.repeat(np.arange(len(file_list)), line_counts)
+    metadata_df = pd.DataFrame(file_metadata, columns=TXT_COLUMNS[2:])
+    for column in metadata_df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            codes, categories = pd.factorize(metadata_df[column].to_numpy(dtype=object))
+            df[column] = pd.Categorical.from_codes(codes[file_idx], pd.Index(categories))
+        else:
+            df[column] = metadata_df[column].to_numpy(dtype=object)[file_idx]
+
+    return apply_schema(df)
+
+
+def _split_txt_buffer(text):
+    """Splits the contents of an automatic test .txt file into test name and status arrays.
+
+    Args:
+        text (String): contents of the file
+
+    Returns:
+        np.ndarray: test names
+        np.ndarray: raw test statuses (not capitalized yet)
+    """
+    # Fast path: every line has exactly one '|', so the C parser can split the whole buffer
+    try:
+        df = pd.read_csv(io.StringIO(text), sep="|", header=None, names=[0, 1], dtype=object,
+                         quoting=csv.QUOTE_NONE, na_filter=False, engine="c")
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        df = None
+
+    if df is not None and isinstance(df.index, pd.RangeIndex) and not df[1].isna().any() and text.count("|") == len(df):
+        # A line of just "|" is too short to be a test; the line parsers skip it too
+        keep = ((df[0] != "") | (df[1] != "")).to_numpy()
+        return df[0].to_numpy(dtype=object)[keep], df[1].to_numpy(dtype=object)[keep]
+
+    # Otherwise some lines have multiple (or no) '|' chars; split them with string methods instead
+    lines = pd.Series(text.split("\n"), dtype=object)
+    lines = lines[lines.str.len() >= 2]
+
+    # Same as the line parsers: if there's multiple '|' chars, the status is after the last one
+    multiple = lines.str.count(r"\|") > 1
+    for line in lines[multiple]:
+        print(f"found line with multiple '|' chars: {line}")
+    line_data = lines.str.rsplit("|", n=1, expand=True).reindex(columns=[0, 1])
+    names = line_data[0].where(~multiple, line_data[0].str.replace("|", "", regex=False))
+    return names.to_numpy(dtype=object), line_data[1].to_numpy(dtype=object)
+
+
+def _read_txt_bytes(file_list, base_folder_name):
+    """Reads in automatic test .txt files as raw bytes, without decoding whole lines.
+
+    Small files are joined into blocks of up to TXT_BLOCK_BYTES, and bigger ones are memory
+    mapped and split into blocks at line breaks, so a multi-GB file is never read into memory
+    as a whole. The lines and '|' chars of a block are found by scanning its bytes with numpy,
+    and only the test name and status bytes are copied out, straight into Arrow string arrays.
+    Gives the same output as `_read_group_by_method_txt()`/`_read_rx_txt()`; a file that can't
+    be split this way (see `_split_txt_bytes()`) is read as text instead.
+
+    Needs pyarrow and pandas 2.1+; without them, the files are parsed with `_read_txt_columnar()`.
+
+    Args:
+        file_list (list): the .txt files, as `discovery.TxtFile`'s
+        base_folder_name (String): "RestApiTests" or "Rx"
+
+    Returns:
+        pd.DataFrame: rows of all the files, in file order
+    """
+    str_dtype = _arrow_string_dtype()
+    if str_dtype is None:
+        return _read_txt_columnar(file_list, base_folder_name)
+
+    import pyarrow as pa
+    package = _API_TEST_PACKAGE.encode() if base_folder_name == "RestApiTests" else None
+
+    test_names = []
+    statuses = []
+    line_counts = []
+    pending = [] # (path, contents) of small files that haven't been split yet
+    pending_bytes = 0
+    for txt_file in file_list:
+        file_path = txt_file.path
+        with open(file_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < TXT_BLOCK_BYTES:
+                pending.append((file_path, file.read()))
+                pending_bytes += size
+                if pending_bytes >= TXT_BLOCK_BYTES:
+                    _split_txt_files(pending, base_folder_name, package, test_names, statuses, line_counts)
+                    pending = []
+                    pending_bytes = 0
+                continue
+
+            # Keep the rows in file order
+            _split_txt_files(pending, base_folder_name, package, test_names, statuses, line_counts)
+            pending = []
+            pending_bytes = 0
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                _split_txt_mmap(file_path, data, base_folder_name, package, test_names, statuses, line_counts)
+    _split_txt_files(pending, base_folder_name, package, test_names, statuses, line_counts)
+
+    # pd.factorize() works on the Arrow strings directly, so only the handful of unique statuses become python strings
+    status_codes, unique_statuses = pd.factorize(pd.array(pa.chunked_array(statuses, pa.string()), dtype=str_dtype))
+    test_names = pd.array(pa.chunked_array(test_names, pa.string()), dtype=str_dtype)
+    return _txt_frame(test_names, status_codes, unique_statuses, file_list, base_folder_name, line_counts)
+
+
+@lru_cache(maxsize=None)
+def _arrow_string_dtype():
+    """pandas string dtype backed by Arrow arrays, with NaN as the missing value (None without pyarrow or pandas 2.1+)"""
+    try:
+        import pyarrow
+    except ImportError:
+        print("The bytes parser needs pyarrow (`pip install pyarrow`); parsing the .txt files with the columnar parser instead")
+        return None
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        pass
+    # pandas 2.1 and 2.2 call it "pyarrow_numpy"
+    try:
+        return pd.StringDtype("pyarrow_numpy")
+    except (TypeError, ValueError):
+        print(f"The bytes parser needs pandas 2.1 or newer (found {pd.__version__}); parsing the .txt files with the columnar parser instead")
+        return None
+
+
+def _split_txt_files(files, base_folder_name, package, test_names, statuses, line_counts):
+    """Splits a group of small .txt files as a single block, adding their names, statuses and line counts to the lists"""
+    if len(files) == 0:
+        return
+    # Each file gets its own line break, so the last line of a file never runs into the next file
+    block = b"\n".join(contents for _, contents in files) + b"\n"
+    file_ends = np.cumsum([len(contents) + 1 for _, contents in files])
+    split = _split_txt_bytes(block, package, file_ends)
+    if split is not None:
+        test_names.append(split[0])
+        statuses.append(split[1])
+        line_counts.extend(split[2])
+    elif len(files) > 1:
+        # Only the files that can't be split as bytes are read as text
+        for file in files:
+            _split_txt_files([file], base_folder_name, package, test_names, statuses, line_counts)
+    else:
+        _split_txt_fallback(files[0][0], base_folder_name, test_names, statuses, line_counts)
+
+
+def _split_txt_mmap(file_path, data, base_folder_name, package, test_names, statuses, line_counts):
+    """Splits a memory mapped .txt file a block at a time, adding its names, statuses and line count to the lists"""
+    file_names = []
+    file_statuses = []
+    num_lines = 0
+    start = 0
+    while start < len(data):
+        # Blocks end just after a line break (or at the end of the file)
+        end = data.find(b"\n", start + TXT_BLOCK_BYTES)
+        end = len(data) if end == -1 else end + 1
+        split = _split_txt_bytes(np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start), package, [end - start])
+        if split is None:
+            _split_txt_fallback(file_path, base_folder_name, test_names, statuses, line_counts)
+            return
+        file_names.append(split[0])
+        file_statuses.append(split[1])
+        num_lines += split[2][0]
+        start = end
+
+    test_names.extend(file_names)
+    statuses.extend(file_statuses)
+    line_counts.append(num_lines)
+
+
+def _split_txt_fallback(file_path, base_folder_name, test_names, statuses, line_counts):
+    """Splits a .txt file that `_split_txt_bytes()` can't as text, like `_read_txt_columnar()` does"""
+    import pyarrow as pa
+    names, file_statuses = _split_txt_buffer(_read_txt_text(file_path, base_folder_name))
+    test_names.append(pa.array(names, pa.string(), from_pandas=True))
+    statuses.append(pa.array(file_statuses, pa.string(), from_pandas=True))
+    line_counts.append(len(names))
+
+
+def _split_txt_bytes(block, package, file_ends):
+    """Splits a block of whole lines from .txt files into test name and status arrays.
+
+    Lines are cut the same way as the line parsers cut the decoded text: "\\r\\n" line breaks,
+    lines shorter than 2 chars, names with multiple '|' chars and the rest api package name
+    are all handled, but blocks with things the byte scan doesn't handle return None, to be
+    read as text instead: "\\r" line breaks, package names that aren't at the start of a line,
+    and non-ASCII bytes that aren't valid UTF-8 (or that the locale wouldn't decode as UTF-8).
+
+    Args:
+        block (bytes-like): the lines
+        package (bytes): package name to strip from the rest api test names, or None
+        file_ends (list): offset in the block just past the end of each file
+
+    Returns:
+        pyarrow.StringArray: test names
+        pyarrow.StringArray: raw test statuses (not capitalized yet; null if the line has no '|')
+        list(int): number of lines of each file
+        (or None if the block has to be read as text)
+    """
+    import pyarrow as pa
+    buf = np.frombuffer(block, dtype=np.uint8)
+    non_ascii = len(buf) > 0 and buf.max() >= 0x80
+    if non_ascii and not _LOCALE_IS_UTF8:
+        return None
+
+    line_breaks = np.flatnonzero(buf == ord("\n"))
+    starts = np.concatenate(([0], line_breaks + 1))
+    ends = np.append(line_breaks, len(buf))
+    carriage_returns = np.flatnonzero(buf == ord("\r"))
+    if len(carriage_returns) > 0:
+        if carriage_returns[-1] + 1 == len(buf) or (buf[carriage_returns + 1] != ord("\n")).any():
+            return None
+        ends[np.searchsorted(ends, carriage_returns + 1)] -= 1
+
+    # Lines shorter than 2 chars are skipped. A line of one non-ASCII char is 2-4 bytes long, so check those decoded.
+    lengths = ends - starts
+    keep = lengths >= 2
+    if non_ascii:
+        for i in np.flatnonzero(keep & (lengths <= 4)):
+            try:
+                keep[i] = len(bytes(buf[starts[i]:ends[i]]).decode()) >= 2
+            except UnicodeDecodeError:
+                return None
+    starts = starts[keep]
+    ends = ends[keep]
+    file_line_counts = np.diff(np.searchsorted(starts, file_ends), prepend=0).tolist()
+
+    if package is not None:
+        found = _find_bytes(buf, package)
+        line_idx = np.searchsorted(starts, found)
+        at_start = line_idx < len(starts)
+        at_start[at_start] = starts[line_idx[at_start]] == found[at_start]
+        if not at_start.all():
+            return None
+        starts[line_idx] += len(package)
+
+    # If there's multiple '|' chars in a line, the status is after the last one
+    pipes = np.flatnonzero(buf == ord("|"))
+    first_pipe = np.searchsorted(pipes, starts)
+    end_pipe = np.searchsorted(pipes, ends)
+    num_pipes = end_pipe - first_pipe
+    name_ends = pipes[end_pipe - 1] if len(pipes) > 0 else ends.copy()
+    no_pipe = num_pipes == 0
+    name_ends[no_pipe] = ends[no_pipe]
+
+    multiple = np.flatnonzero(num_pipes > 1)
+    for i in multiple:
+        print(f"found line with multiple '|' chars: {bytes(buf[starts[i]:ends[i]]).decode()}")
+    name_lengths = name_ends - starts
+    name_lengths[multiple] -= num_pipes[multiple] - 1
+
+    names = _gather_strings(buf, starts, name_ends, name_lengths, drop=ord("|") if len(multiple) > 0 else None)
+    status_starts = np.where(no_pipe, ends, name_ends + 1)
+    file_statuses = _gather_strings(buf, status_starts, ends, ends - status_starts, valid=~no_pipe)
+    if non_ascii:
+        try:
+            names.validate(full=True)
+            file_statuses.validate(full=True)
+        except pa.ArrowInvalid:
+            return None
+    return names, file_statuses, file_line_counts
+
+
+def _gather_strings(buf, starts, ends, lengths, drop=None, valid=None):
+    """Copies the byte ranges [starts, ends) of buf into an Arrow string array, without going through python strings.
+
+    Args:
+        buf (np.ndarray): the bytes
+        starts (np.ndarray): start of each range; the ranges don't overlap
+        ends (np.ndarray): end of each range
+        lengths (np.ndarray): length of each string (the range length, less any dropped bytes)
+        drop (int, optional): byte value to leave out of the strings
+        valid (np.ndarray, optional): False for the strings that are null
+
+    Returns:
+        pyarrow.StringArray: the strings
+    """
+    import pyarrow as pa
+    # +1 where a range starts and -1 where it ends, so the running sum is 1 inside the ranges
+    marks = np.zeros(len(buf) + 1, dtype=np.int8)
+    marks[starts] = 1
+    marks[ends] -= 1
+    mask = np.cumsum(marks[:-1], dtype=np.int8).view(bool)
+    if drop is not None:
+        mask &= buf != drop
+
+    offsets = np.zeros(len(starts) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    null_bitmap = None
+    null_count = 0
+    if valid is not None and not valid.all():
+        null_bitmap = pa.py_buffer(np.packbits(valid, bitorder="little"))
+        null_count = int(len(valid) - valid.sum())
+    return pa.StringArray.from_buffers(len(starts), pa.py_buffer(offsets), pa.py_buffer(buf[mask]), null_bitmap, null_count)
+
+
+def _find_bytes(buf, pattern):
+    """Offsets of the (non-overlapping) occurrences of a byte string in buf, like `bytes.find()` in a loop"""
+    found = np.flatnonzero(buf[:len(buf) - len(pattern) + 1] == pattern[0]) if len(buf) >= len(pattern) else np.array([], dtype=np.intp)
+    for i in range(1, len(pattern)):
+        found = found[buf[found + i] == pattern[i]]
+    # Overlapping matches only happen if the pattern starts with its own end
+    if len(found) > 1 and (np.diff(found) < len(pattern)).any():
+        matches = [found[0]]
+        for offset in found[1:]:
+            if offset >= matches[-1] + len(pattern):
+                matches.append(offset)
+        found = np.array(matches, dtype=np.intp)
+    return found
+
+
 def _read_group_by_method_txt(file_path, return_df=True):
     """Reads in a single rest api automatic test .txt file.
 
     Mostly just for the `read_rest_api_tests()` method. Usually won't need to call yourself
 
     Args:
-        file_path (String): path to the .txt file
+        file_path (String, pathlib.Path or discovery.TxtFile): the .txt file (see `discovery.find_txt_files()`)
         return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
 
     Returns:
         pd.DataFrame or dict: Test names and corresponding statuses
     """
-    # If receive str, convert to pathlib object
-    if isinstance(file_path, str):
-        file_path = Path(file_path)
+    # Release, RC, Owner etc. come from the folders the file is in
+    txt_file = _as_txt_file(file_path, "RestApiTests")
+    file_metadata = _resolve_file_metadata(txt_file, "RestApiTests")
 
     # Read in file using pathlib method, split on new line symbols
-    lines = file_path.read_text().split("\n")
+    lines = txt_file.path.read_text().split("\n")
 
     # Remove blank lines
     lines = [line for line in lines if len(line) > 0]
@@ -265,7 +1089,7 @@ def _read_group_by_method_txt(file_path, return_df=True):
             continue # skip any lines that are too short; likely empty
         
         # Remove the "com.philips.sapphire.systemintegrationtests." part
-        line = line.replace("com.philips.sapphire.systemintegrationtests.", "")
+        line = line.replace(_API_TEST_PACKAGE, "")
         
         # split on the | char; should only be one of them
         line_data = line.split("|")
@@ -273,29 +1097,18 @@ def _read_group_by_method_txt(file_path, return_df=True):
         # For some reason if theres multiple of that char, only consider the last one
         if len(line_data) > 2:
             print(f"found line with multiple '|' chars: {line}")
-            line_data = "".join(line_data[:-1]) + [line_data[-1]]
-        
-        # Get relevant data for other columns
-        base_folder_idx = [i for i, s in enumerate(file_path.parts) if "RestApiTests" in str(s)][0]
-        
-        # Also add the V&V Test Report info by extracting it from file name
-        er_folder_name = file_path.parts[base_folder_idx - 2]
-        v_v = re.findall("ER([0-9]+ v[0-9]+|[0-9]+v[0-9]+)", er_folder_name)[0].replace("ER", "")
-        
-        # If there's no space in the file name (like ER2228014v53), add one
-        v_idx = v_v.find("v")
-        if v_v[v_idx - 1] != " ":
-            v_v = v_v[:v_idx] + " " + v_v[v_idx:]
+            line_data = ["".join(line_data[:-1]), line_data[-1]]
+
+        # A line without a '|' has no status; it's kept with a missing Test Status (like the
+        # other parsers do), so it ends up in the error log instead of stopping the run
+        if len(line_data) < 2:
+            line_data.append(None)
         
-        # Store data in list
+        # Store data in list; the other columns are the same for every line in the file
         data.append({
             'Test Name':line_data[0],
-            'Test Status':line_data[1].lower().capitalize(),
-            'Release': file_path.parts[base_folder_idx - 1],
-            'V&V Test Report': v_v,
-            'RC': file_path.parts[base_folder_idx + 1],
-            'Owner': file_path.parts[base_folder_idx + 2],
-            'File Path': str(file_path)
+            'Test Status':line_data[1].lower().capitalize() if line_data[1] is not None else None,
+            **file_metadata
         })
 
     if return_df:
@@ -303,6 +1116,74 @@ def _read_group_by_method_txt(file_path, return_df=True):
     else:
         return data
 
+
+def _resolve_file_metadata(txt_file, base_folder_name):
+    """Gets the columns that are shared by every line of an automatic test .txt file.
+
+    Files are expected to be laid out as
+    `ER####### v##/<Release>/<base_folder_name>/<RC>/<Owner>/<file>.txt`; the Release, RC and
+    Owner folders were already split out of the path by `discovery.find_txt_files()`.
+
+    Args:
+        txt_file (discovery.TxtFile or pathlib.Path): the .txt file
+        base_folder_name (String): "RestApiTests" or "Rx"
+
+    Returns:
+        dict: Release, V&V Test Report, RC, Owner and File Path of the file
+    """
+    txt_file = _as_txt_file(txt_file, base_folder_name)
+    return {
+        'Release': txt_file.release,
+        'V&V Test Report': _vv_test_report(txt_file.report_folder),
+        'RC': txt_file.rc,
+        'Owner': txt_file.owner,
+        'File Path': str(txt_file.path)
+    }
+
+
+def _as_txt_file(file, base_folder_name):
+    """A .txt file as a `discovery.TxtFile`. A plain path's RestApiTests or Rx folder is found by its name.
+
+    Args:
+        file (discovery.TxtFile, String or pathlib.Path): the .txt file
+        base_folder_name (String): "RestApiTests" or "Rx"
+
+    Returns:
+        discovery.TxtFile: the file
+    """
+    if isinstance(file, discovery.TxtFile):
+        return file
+    file_path = Path(file)
+    return discovery.describe_txt_file(file_path, _base_folder(file_path.parent, base_folder_name))
+
+
+@lru_cache(maxsize=4096)
+def _base_folder(folder_path, base_folder_name):
+    """The RestApiTests or Rx folder that a folder of automatic test files is in (cached per folder)"""
+    parts = folder_path.parts
+    base_folder_idx = [i for i, s in enumerate(parts) if base_folder_name in str(s)][0]
+    return Path(*parts[:base_folder_idx + 1])
+
+
+@lru_cache(maxsize=4096)
+def _vv_test_report(er_folder_name):
+    """Gets the V&V Test Report (e.g. "2228014 v51") from the name of an ER folder.
+
+    Args:
+        er_folder_name (String): name of the ER folder, like "ER2228014 v51 ATT2 Automated as-run"
+
+    Returns:
+        String: the V&V Test Report
+    """
+    v_v = _VV_REPORT_PATTERN.findall(er_folder_name)[0].replace("ER", "")
+
+    # If there's no space in the file name (like ER2228014v53), add one
+    v_idx = v_v.find("v")
+    if v_v[v_idx - 1] != " ":
+        v_v = v_v[:v_idx] + " " + v_v[v_idx:]
+    return v_v
+
+
 def read_rally_output(file_path, return_df=True):
     """Reads in an .csv that's outputted directly from a Rally query.
 
@@ -321,61 +1202,102 @@ def read_rally_output(file_path, return_df=True):
         return df.to_dict('records')
     
 
-def read_rx_tests(folder_path, return_df=True):
+def read_rx_tests(folder_path, return_df=True, jobs=1, parser="rows", cache=None):
     """Reads in all the Rx automatic test .txt files.
     
-    Will recursively go through the folders and read in .txt files.
+    Will recursively go through the folders (see `discovery.find_txt_files()`) and read in .txt files.
     Make sure everything is unzipped first; in future can add functionality to
     unzip automatically if needed.
 
     Args:
         folder_path (String or pathlib.Path): path to the main Rx folder.
         return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
+        jobs (int, optional): Number of worker processes used to parse the files. Defaults to 1 (no pool).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows" (default) parses line by line, "columnar" parses each file
+            with vectorized pandas string operations, "bytes" scans the raw bytes of each file (see
+            `_read_txt_bytes()`). All give the same output; a line without a '|' gets a missing Test Status.
+        cache (parse_cache.ParseCache, optional): If given, only files that are new or changed
+            since the last run are parsed. Defaults to None (parse everything).
 
     Returns:
         pd.DataFrame or dict: Test names and corresponding statuses
     """
     print(f"Loading Rx test files from {folder_path}")
+    assert parser in TXT_PARSERS, f"Parser must be one of {TXT_PARSERS}\nCurrent parser: {parser}"
     if isinstance(folder_path, str):
         folder_path = Path(folder_path)
 
-    # Read all .txt files recursively in the folders
-    file_list = [file_name for file_name in folder_path.rglob("*.txt") if "__MACOSX" not in str(file_name)]
+    # Find all .txt files recursively in the folders
+    txt_files = discovery.find_txt_files(folder_path)
+    file_list = [txt_file.path for txt_file in txt_files]
 
     print(f"Total # Rx .txt files: {len(file_list)}")
 
-    # Load in the data from each file, add to a single list
-    data = []
-    for file_name in file_list:
-        data.extend(_read_rx_txt(file_name, return_df=False))
-    
-    # make a dataframe for outputting
-    df = pd.DataFrame(data)
+    # Load in the data from each file into a single dataframe. The cache works with paths; the
+    # parsers get the TxtFile's back, with the Release, RC and Owner already split out.
+    if cache is not None:
+        txt_files_by_path = {txt_file.path: txt_file for txt_file in txt_files}
+        df = cache.read_files(f"Rx:{folder_path.resolve()}", file_list,
+                              lambda files: _read_txt_files([txt_files_by_path[file_path] for file_path in files], "Rx", jobs, parser),
+                              signatures=_txt_signatures(txt_files))
+    else:
+        df = _read_txt_files(txt_files, "Rx", jobs, parser)
 
     # Output as either pandas dataframe or dict, depending on return_df setting.
     if return_df:
         return df
     else:
         return df.to_dict('records')
-    
+
+
+def iter_rx_tests(folder_path, batch_files=100, jobs=1, parser="rows"):
+    """Reads in the Rx automatic test .txt files a batch at a time.
+
+    Same rows as `read_rx_tests()`, in the same order, but only a few batches are
+    ever in memory, however many files the folder holds.
+
+    Args:
+        folder_path (String or pathlib.Path): path to the main Rx folder.
+        batch_files (int, optional): number of files per batch. Defaults to 100.
+        jobs (int, optional): Number of worker processes used to parse the batches. Defaults to 1 (no pool).
+            Use 0 to start one worker per CPU.
+        parser (String, optional): "rows", "columnar" or "bytes". Defaults to "rows".
+
+    Yields:
+        pd.DataFrame: Test names and corresponding statuses of a batch of files
+    """
+    print(f"Loading Rx test files from {folder_path} in batches of {batch_files}")
+    assert parser in TXT_PARSERS, f"Parser must be one of {TXT_PARSERS}\nCurrent parser: {parser}"
+    if isinstance(folder_path, str):
+        folder_path = Path(folder_path)
+
+    # Find all .txt files recursively in the folders
+    txt_files = discovery.find_txt_files(folder_path)
+
+    print(f"Total # Rx .txt files: {len(txt_files)}")
+
+    yield from _iter_txt_files(txt_files, "Rx", batch_files, jobs, parser)
+
+
 def _read_rx_txt(file_path, return_df=True):
     """Reads in a single Rx automatic test .txt file.
 
     Mostly just for the `read_rx_tests()` method. Usually won't need to call yourself
 
     Args:
-        file_path (String): path to the .txt file
+        file_path (String, pathlib.Path or discovery.TxtFile): the .txt file (see `discovery.find_txt_files()`)
         return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
 
     Returns:
         pd.DataFrame or dict: Test names and corresponding statuses
     """
-    # If receive str, convert to pathlib object
-    if isinstance(file_path, str):
-        file_path = Path(file_path)
+    # Release, RC, Owner etc. come from the folders the file is in
+    txt_file = _as_txt_file(file_path, "Rx")
+    file_metadata = _resolve_file_metadata(txt_file, "Rx")
 
     # Read in file using pathlib method, split on new line symbols
-    lines = file_path.read_text().split("\n")
+    lines = txt_file.path.read_text().split("\n")
 
     # Remove blank lines
     lines = [line for line in lines if len(line) > 0]
@@ -390,29 +1312,18 @@ def _read_rx_txt(file_path, return_df=True):
         # For some reason if theres multiple of that char, only consider the last one
         if len(line_data) > 2:
             print(f"found line with multiple '|' chars: {line}")
-            line_data = "".join(line_data[:-1]) + [line_data[-1]]
-        
-        # Get relevant data for other columns
-        base_folder_idx = [i for i, s in enumerate(file_path.parts) if "Rx" in str(s)][0]
-        
-        # Also add the V&V Test Report info by extracting it from file name
-        er_folder_name = file_path.parts[base_folder_idx - 2]
-        v_v = re.findall("ER([0-9]+ v[0-9]+|[0-9]+v[0-9]+)", er_folder_name)[0].replace("ER", "")
-        
-        # If there's no space in the file name (like ER2228014v53), add one
-        v_idx = v_v.find("v")
-        if v_v[v_idx - 1] != " ":
-            v_v = v_v[:v_idx] + " " + v_v[v_idx:]
+            line_data = ["".join(line_data[:-1]), line_data[-1]]
+
+        # A line without a '|' has no status; it's kept with a missing Test Status (like the
+        # other parsers do), so it ends up in the error log instead of stopping the run
+        if len(line_data) < 2:
+            line_data.append(None)
         
-        # Store data in list
+        # Store data in list; the other columns are the same for every line in the file
         data.append({
             'Test Name':line_data[0],
-            'Test Status':line_data[1].lower().capitalize(),
-            'Release': file_path.parts[base_folder_idx - 1],
-            'V&V Test Report': v_v,
-            'RC': file_path.parts[base_folder_idx + 1],
-            'Owner': file_path.parts[base_folder_idx + 2],
-            'File Path': str(file_path)
+            'Test Status':line_data[1].lower().capitalize() if line_data[1] is not None else None,
+            **file_metadata
         })
 
     if return_df:
@@ -421,28 +1332,297 @@ def _read_rx_txt(file_path, return_df=True):
         return data
     
     
-def write_error_log(output_path, invalid_dfs):
-    """Outputs dataframe with all invalid rows to csv file
+def write_error_log(output_path, invalid_dfs, fmt=None, chunksize=100000):
+    """Outputs dataframe with all invalid rows to a csv (or parquet/feather) file
+
+    The error log has the Error, Source, Run ID and File Path columns first, then every other
+    column found in the invalid dataframes. Rows are written straight from the dataframes,
+    a chunk at a time.
 
     Args:
-        output_path (String): file path of output csv
+        output_path (String): file path of output error log
         invalid_dfs (list): list of dataframes that have invalid rows
+        fmt (String, optional): one of ERROR_LOG_FORMATS. Defaults to None (picked from the file extension).
+        chunksize (int, optional): number of rows written at a time. Defaults to 100000.
 
     Output:
-        Outputs error_df to a csv file
+        Outputs the invalid rows to output_path
     """
-    with open(output_path, 'w', newline='') as f:
-        writer = csv.writer(f)
+    # Union of the columns of all the invalid dataframes
+    columns = list(ERROR_LOG_COLUMNS)
+    for df in invalid_dfs:
+        columns.extend(column for column in df.columns if column not in columns)
+
+    with ErrorLogWriter(output_path, columns, fmt) as writer:
         for df in invalid_dfs:
-            for entry in df.to_dict('records'):
-                row = str(entry).replace("{", "").replace("}", "")
-                writer.writerow(row.split(","))
-                
-            
-            # keys = df[0].keys()
-            # dict_writer = csv.DictWriter(output_file, keys)
-            # dict_writer.writeheader()
-            # dict_writer.writerows(df) 
-    
-    
-    
+            for start in range(0, len(df), chunksize):
+                writer.write(df.iloc[start:start + chunksize])
+
+
+# Columns that always come first in the error log
+ERROR_LOG_COLUMNS = ["Error", "Source", "Run ID", "File Path"]
+
+
+class ErrorLogWriter:
+    """Writes invalid rows to an error log file, one dataframe at a time.
+
+    Every dataframe is written with the same columns (missing ones are left blank), so the
+    rows never need to be combined in memory. Parquet and feather need pyarrow; all their
+    columns are stored as strings, since the invalid dataframes don't share types.
+
+    Use as a context manager:
+    >>> with ErrorLogWriter("error_log.csv", columns) as writer:
+    ...     writer.write(invalid_df)
+    """
+
+    def __init__(self, output_path, columns=None, fmt=None):
+        """
+        Args:
+            output_path (String): file path of output error log
+            columns (list, optional): columns of the error log. Defaults to ERROR_LOG_COLUMNS.
+            fmt (String, optional): one of ERROR_LOG_FORMATS. Defaults to None (picked from the file extension).
+
+        Raises:
+            ValueError: if fmt isn't given and the file extension isn't one of ERROR_LOG_FORMATS
+        """
+        self.output_path = str(output_path)
+        self.columns = list(columns) if columns is not None else list(ERROR_LOG_COLUMNS)
+        self.fmt = fmt if fmt is not None else _format_from_path(self.output_path, ERROR_LOG_FORMATS)
+        assert self.fmt in ERROR_LOG_FORMATS, f"Error log format must be one of {list(ERROR_LOG_FORMATS)}\nCurrent format: {self.fmt}"
+
+        if self.fmt in ["parquet", "feather"]:
+            pa = _import_pyarrow(self.fmt)
+            self._schema = pa.schema([(column, pa.string()) for column in self.columns])
+            if self.fmt == "parquet":
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(self.output_path, self._schema)
+            else:
+                import pyarrow.ipc
+                self._writer = pyarrow.ipc.new_file(self.output_path, self._schema)
+        else:
+            if self.fmt == "csv.gz":
+                self._file = gzip.open(self.output_path, 'wt', newline='')
+            else:
+                self._file = open(self.output_path, 'w', newline='')
+            _write_csv_header(self._file, self.columns)
+
+    def write(self, df):
+        """Appends the rows of a dataframe to the error log
+
+        Args:
+            df (pd.DataFrame): invalid rows
+        """
+        if len(df) == 0:
+            return
+        df = df.reindex(columns=self.columns)
+
+        if self.fmt in ["parquet", "feather"]:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df.astype("string"), schema=self._schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self._file, header=False, index=False)
+
+    def close(self):
+        """Finishes writing the error log"""
+        if self.fmt in ["parquet", "feather"]:
+            self._writer.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_trace(output_path, trace, fmt=None, chunksize=100000):
+    """Outputs the trace matrix to a csv, csv.gz, parquet, feather or xlsx file
+
+    Args:
+        output_path (String): file path of the output trace
+        trace (pd.DataFrame): trace matrix
+        fmt (String, optional): one of TRACE_FORMATS. Defaults to None (picked from the file extension).
+        chunksize (int, optional): number of rows written at a time. Defaults to 100000.
+
+    Output:
+        Outputs the trace to output_path
+    """
+    columns = list(TRACE_COLUMNS) + [column for column in trace.columns if column not in TRACE_COLUMNS]
+    with TraceWriter(output_path, columns, fmt) as writer:
+        for start in range(0, len(trace), chunksize):
+            writer.write(trace.iloc[start:start + chunksize])
+
+
+# Columns of the trace matrix, in order
+TRACE_COLUMNS = ["PRD", "SRS ID", "Method", "Test Name", "V&V Test Report", "TC ID",
+                 "Test Status", "Release", "Name", "Owner", "Application"]
+
+# Most rows an .xlsx sheet can hold (including the header)
+_XLSX_MAX_ROWS = 1048576
+
+
+class TraceWriter:
+    """Writes the trace matrix to a file, one dataframe at a time.
+
+    Every column has a fixed type: the CATEGORICAL_COLUMNS are stored dictionary encoded in
+    parquet, everything else as strings. Feather (Arrow IPC) files can't change a column's
+    dictionary between batches, so feather stores the categorical columns as strings and
+    `read_trace_file()` makes them categorical again. Parquet and feather need pyarrow.
+
+    Use as a context manager:
+    >>> with TraceWriter("trace.parquet") as writer:
+    ...     writer.write(trace)
+    """
+
+    def __init__(self, output_path, columns=None, fmt=None):
+        """
+        Args:
+            output_path (String): file path of the output trace
+            columns (list, optional): columns of the trace. Defaults to TRACE_COLUMNS.
+            fmt (String, optional): one of TRACE_FORMATS. Defaults to None (picked from the file extension).
+        """
+        self.output_path = str(output_path)
+        self.columns = list(columns) if columns is not None else list(TRACE_COLUMNS)
+        self.fmt = fmt if fmt is not None else _format_from_path(self.output_path, TRACE_FORMATS, "csv")
+        assert self.fmt in TRACE_FORMATS, f"Trace format must be one of {list(TRACE_FORMATS)}\nCurrent format: {self.fmt}"
+        self._num_rows = 0
+
+        if self.fmt in ["parquet", "feather"]:
+            pa = _import_pyarrow(self.fmt)
+            dictionary_type = pa.dictionary(pa.int32(), pa.string()) if self.fmt == "parquet" else pa.string()
+            self._schema = pa.schema([(column, dictionary_type if column in CATEGORICAL_COLUMNS else pa.string())
+                                      for column in self.columns])
+            if self.fmt == "parquet":
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(self.output_path, self._schema)
+            else:
+                import pyarrow.ipc
+                self._writer = pyarrow.ipc.new_file(self.output_path, self._schema)
+        elif self.fmt == "xlsx":
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+            self._sheet.append(self.columns)
+        else:
+            if self.fmt == "csv.gz":
+                self._file = gzip.open(self.output_path, 'wt', newline='')
+            else:
+                self._file = open(self.output_path, 'w', newline='')
+            _write_csv_header(self._file, self.columns)
+
+    def write(self, df):
+        """Appends the rows of a dataframe to the trace
+
+        Args:
+            df (pd.DataFrame): trace matrix rows
+        """
+        if len(df) == 0:
+            return
+        df = df.reindex(columns=self.columns)
+        self._num_rows += len(df)
+
+        if self.fmt in ["parquet", "feather"]:
+            import pyarrow as pa
+            # Everything that isn't dictionary encoded is stored as a string (all-NaN columns as nulls)
+            df = df.astype({column: "string" for column in self.columns
+                            if self.fmt == "feather" or column not in CATEGORICAL_COLUMNS})
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        elif self.fmt == "xlsx":
+            assert self._num_rows < _XLSX_MAX_ROWS, f"An .xlsx sheet can only hold {_XLSX_MAX_ROWS - 1} rows; use another format for this trace"
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                self._sheet.append(row)
+        else:
+            df.to_csv(self._file, header=False, index=False)
+
+    def close(self):
+        """Finishes writing the trace"""
+        if self.fmt in ["parquet", "feather"]:
+            self._writer.close()
+        elif self.fmt == "xlsx":
+            self._workbook.save(self.output_path)
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trace_file(file_path, fmt=None, return_df=True):
+    """Reads back a trace matrix written by `write_trace()`/`TraceWriter`
+
+    For the trace matrices from the DHF, see `read_trace()` instead.
+
+    Args:
+        file_path (String): path to the trace
+        fmt (String, optional): one of TRACE_FORMATS. Defaults to None (picked from the file extension).
+        return_df (bool, optional): If true, returns pandas dataframe. Else dict. Defaults to True.
+
+    Returns:
+        pd.DataFrame or dict: the trace matrix, with the CATEGORICAL_COLUMNS categorical
+    """
+    file_path = str(file_path)
+    fmt = fmt if fmt is not None else _format_from_path(file_path, TRACE_FORMATS, "csv")
+    assert fmt in TRACE_FORMATS, f"Trace format must be one of {list(TRACE_FORMATS)}\nCurrent format: {fmt}"
+
+    # Only empty cells are missing; test names like "NA" stay as they are
+    if fmt in ["csv", "csv.gz"]:
+        df = pd.read_csv(file_path, dtype=str, keep_default_na=False, na_values=[""])
+    elif fmt == "parquet":
+        _import_pyarrow(fmt)
+        df = pd.read_parquet(file_path)
+    elif fmt == "feather":
+        _import_pyarrow(fmt)
+        df = pd.read_feather(file_path)
+    else:
+        df = pd.read_excel(file_path, dtype=str, keep_default_na=False, na_values=[""])
+    df = apply_schema(df)
+
+    if return_df:
+        return df
+    else:
+        return df.to_dict('records')
+
+
+def _write_csv_header(file, columns):
+    """Writes the header line of a csv the same way `pd.DataFrame.to_csv()` does"""
+    pd.DataFrame(columns=columns).to_csv(file, index=False)
+
+
+def _format_from_path(file_path, formats, default=None):
+    """Picks a file format based on the file extension
+
+    Args:
+        file_path (String): path to the file
+        formats (dict): format name -> list of file extensions
+        default (String, optional): format if no extension matches. Defaults to None (no match is an error).
+
+    Returns:
+        String: the format
+
+    Raises:
+        ValueError: if no extension matches and there's no default
+    """
+    file_path = file_path.lower()
+    # Check longest extensions first, so .csv.gz isn't taken as .gz
+    extensions = sorted(((ext, fmt) for fmt, exts in formats.items() for ext in exts), key=lambda x: -len(x[0]))
+    for ext, fmt in extensions:
+        if file_path.endswith(ext):
+            return fmt
+    if default is None:
+        supported = [ext for exts in formats.values() for ext in exts]
+        raise ValueError(f"Unsupported file extension: {file_path}\nSupported extensions: {supported}")
+    return default
+
+
+def _import_pyarrow(fmt):
+    """Imports pyarrow, which is only needed for the parquet/feather formats"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(f"Writing {fmt} files needs pyarrow. Install it with `pip install pyarrow`")
+    return pyarrow
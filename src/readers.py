@@ -0,0 +1,105 @@
+import importlib
+from typing import NamedTuple
+
+# This module only uses the standard library, so the command line (`run.py --help`, the trace
+# service client) can list the readers, parsers and formats without importing pandas. A
+# reader's module, and the heavy packages it needs, are imported the first time it's used.
+
+# Ways of parsing the automatic test .txt files; see `read_write._read_txt_files()`
+TXT_PARSERS = ["rows", "columnar", "bytes"]
+
+# Error log formats, and the file extensions they're picked from
+ERROR_LOG_FORMATS = {
+    "csv": [".csv"],
+    "csv.gz": [".csv.gz"],
+    "parquet": [".parquet"],
+    "feather": [".feather", ".arrow"]
+}
+
+# Trace formats, and the file extensions they're picked from
+TRACE_FORMATS = {
+    "csv": [".csv"],
+    "csv.gz": [".csv.gz"],
+    "parquet": [".parquet"],
+    "feather": [".feather", ".arrow"],
+    "xlsx": [".xlsx"]
+}
+
+
+class Reader(NamedTuple):
+    """A reader of one type of input, registered in READERS
+
+    The reader is `<module>.<function>(path, **options)`, and returns a pd.DataFrame.
+    """
+    module: str
+    function: str
+    description: str
+    # Run options the reader takes as keyword arguments (e.g. "jobs", "parser", "cache")
+    options: tuple = ()
+    # The input is a single file that's kept in the parse cache as a whole (see `ParseCache.read_file()`)
+    cache_file: bool = False
+
+
+# Input type -> its reader
+READERS = {
+    "manual_as_run": Reader("read_write", "read_as_run_tests", "Manual as-runs .docx", cache_file=True),
+    "msgateway": Reader("read_write", "read_msgateway_results", "MSGateway automatic test results .docx"),
+    "performance_by_tc": Reader("read_write", "read_performance_test_results_by_tc", "PerformanceTestResultsByTC .xlsx"),
+    "rally": Reader("read_write", "read_rally_output", "Rally test case query export .csv"),
+    "trace": Reader("read_write", "read_trace", "Previous trace matrix .xlsx", ("matrix_type", "sidecar")),
+    "rest_api": Reader("read_write", "read_rest_api_tests", "RestApiTests folder of automatic test .txt files", ("jobs", "parser", "cache")),
+    "rx": Reader("read_write", "read_rx_tests", "Rx folder of automatic test .txt files", ("jobs", "parser", "cache")),
+}
+
+
+def register_reader(input_type, module, function, description, options=(), cache_file=False):
+    """Adds a reader for a new type of input (or replaces the reader of an existing one)
+
+    Args:
+        input_type (str): name of the input type, used with `read()`
+        module (str): name of the module the reader is in; not imported until the reader is used
+        function (str): name of the reader function, which takes the input's path and the options
+        description (str): what the input is
+        options (tuple): run options the reader takes as keyword arguments
+        cache_file (bool): if True, the input is a single file that `read()` keeps in the parse cache
+    """
+    READERS[input_type] = Reader(module, function, description, tuple(options), cache_file)
+
+
+def get_reader(input_type):
+    """Imports the reader of an input type
+
+    Args:
+        input_type (str): one of READERS
+
+    Returns:
+        function: the reader
+    """
+    assert input_type in READERS, f"Input type must be one of {list(READERS)}\nCurrent input type: {input_type}"
+    reader = READERS[input_type]
+    return getattr(importlib.import_module(reader.module), reader.function)
+
+
+def read(input_type, path, cache=None, **options):
+    """Reads an input with the reader of its type
+
+    Options the reader doesn't take are left out, so every input of a run can be read with
+    the same options.
+
+    Args:
+        input_type (str): one of READERS
+        path (str or pathlib.Path): the input file or folder
+        cache (parse_cache.ParseCache, optional): parse cache, for the readers that use one
+        **options: run options (see `Reader.options`)
+
+    Returns:
+        pd.DataFrame: the input
+    """
+    read_input = get_reader(input_type)
+    reader = READERS[input_type]
+    options = {name: value for name, value in options.items() if name in reader.options}
+    if "cache" in reader.options:
+        options["cache"] = cache
+    elif reader.cache_file and cache is not None:
+        return cache.read_file(path, lambda file_path: read_input(file_path, **options))
+    return read_input(path, **options)
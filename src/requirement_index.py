@@ -0,0 +1,179 @@
+from pathlib import Path
+
+import pandas as pd
+
+import readers
+from parse_cache import file_signature
+
+# Columns of the reference exports that the index is built from. The exports' layouts
+# aren't fixed, so these are assumptions; change them here if an export uses other names.
+RALLY_TC_COLUMN = "Formatted ID" # Rally test case export: TC ID
+RALLY_SRS_COLUMN = "Work Product" # Rally test case export: SRS the test case covers (e.g. "ESA-123: Name")
+SRS_ID_COLUMN = "ID" # SRS sheet: SRS ID
+SRS_PRD_COLUMN = "PRD" # SRS sheet: PRD the SRS belongs to
+SRS_NAME_COLUMN = "Name" # SRS sheet: name of the SRS
+PRD_ID_COLUMN = "ID" # PRD sheet: PRD ID
+PRD_NAME_COLUMN = "Name" # PRD sheet: name of the PRD
+
+
+class RequirementIndex:
+    """Lookup of the SRS of each TC, the PRD of each SRS and the name of each SRS/PRD
+
+    Built once per run from the Rally test case export and the SRS/PRD sheets. Each mapping is
+    a pd.Series indexed by its (unique) keys, so filling a trace column is a single vectorized
+    `Series.map()` instead of a search per row. If a key appears more than once in an export,
+    its first value is used.
+
+    Attributes:
+        tc_to_srs (pd.Series): SRS ID of each TC ID
+        srs_to_prd (pd.Series): PRD of each SRS ID
+        names (pd.Series): name of each SRS and PRD ID
+        sources (dict): path -> [size, mtime] of the exports the index was built from
+    """
+
+    def __init__(self, tc_to_srs, srs_to_prd, names, sources=None):
+        """
+        Args:
+            tc_to_srs (pd.Series): SRS ID of each TC ID
+            srs_to_prd (pd.Series): PRD of each SRS ID
+            names (pd.Series): name of each SRS and PRD ID
+            sources (dict, optional): path -> [size, mtime] of the exports the index was built from
+        """
+        self.tc_to_srs = tc_to_srs
+        self.srs_to_prd = srs_to_prd
+        self.names = names
+        self.sources = sources if sources is not None else {}
+
+    @classmethod
+    def from_files(cls, rally_path=None, srs_path=None, prd_path=None, cache_path=None):
+        """Builds the index from the reference exports; any of them can be left out
+
+        Args:
+            rally_path (str, optional): path to the Rally test case export .csv
+            srs_path (str, optional): path to the SRS .xlsx
+            prd_path (str, optional): path to the PRD .xlsx
+            cache_path (str, optional): if given, the index is saved here, and loaded from here
+                instead of the exports as long as none of the exports have changed
+
+        Returns:
+            RequirementIndex: the index
+        """
+        paths = [path for path in [rally_path, srs_path, prd_path] if path]
+        sources = {str(Path(path).resolve()): file_signature(path) for path in paths}
+
+        if cache_path and Path(cache_path).exists():
+            index = cls.load(cache_path)
+            if index.sources == sources:
+                print(f"Using cached requirement index {cache_path}")
+                return index
+
+        empty = pd.Series(dtype=object)
+        tc_to_srs = srs_to_prd = srs_names = prd_names = empty
+        if rally_path:
+            rally = readers.read("rally", rally_path)
+            tc_to_srs = _first_mapping(rally[RALLY_TC_COLUMN], _leading_ids(rally[RALLY_SRS_COLUMN]))
+        if srs_path:
+            srs = pd.read_excel(srs_path)
+            srs_to_prd = _first_mapping(srs[SRS_ID_COLUMN], srs[SRS_PRD_COLUMN])
+            srs_names = _first_mapping(srs[SRS_ID_COLUMN], srs[SRS_NAME_COLUMN])
+        if prd_path:
+            prd = pd.read_excel(prd_path)
+            prd_names = _first_mapping(prd[PRD_ID_COLUMN], prd[PRD_NAME_COLUMN])
+
+        # SRS names win if an ID somehow shows up in both sheets
+        names = pd.concat([srs_names, prd_names])
+        names = names[~names.index.duplicated()]
+
+        index = cls(tc_to_srs, srs_to_prd, names, sources)
+        print(f"Requirement index: {len(tc_to_srs)} TCs, {len(srs_to_prd)} SRSs with a PRD, {len(names)} names")
+        if cache_path:
+            index.save(cache_path)
+        return index
+
+    def save(self, file_path):
+        """Saves the index to a file, so it can be loaded without reading the exports again
+
+        Args:
+            file_path (str): path to save the index to
+        """
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle({"tc_to_srs": self.tc_to_srs, "srs_to_prd": self.srs_to_prd,
+                      "names": self.names, "sources": self.sources}, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        """Loads an index saved with `save()`
+
+        Args:
+            file_path (str): path the index was saved to
+
+        Returns:
+            RequirementIndex: the index
+        """
+        data = pd.read_pickle(file_path)
+        return cls(data["tc_to_srs"], data["srs_to_prd"], data["names"], data["sources"])
+
+    def fill(self, trace):
+        """Fills in the empty SRS ID, PRD and Name cells of a trace (or a batch of one)
+
+        SRS ID comes from the TC ID, PRD from the SRS ID, and Name is the name of the SRS
+        (or of the PRD, if the SRS has no name). Cells that already have a value are kept.
+
+        Args:
+            trace (pd.DataFrame): trace matrix
+
+        Returns:
+            pd.DataFrame: the trace with the columns filled in
+        """
+        trace = trace.copy()
+        trace["SRS ID"] = _fill_empty(trace["SRS ID"], trace["TC ID"], self.tc_to_srs)
+        trace["PRD"] = _fill_empty(trace["PRD"], trace["SRS ID"], self.srs_to_prd)
+        trace["Name"] = _fill_empty(trace["Name"], trace["SRS ID"], self.names)
+        trace["Name"] = _fill_empty(trace["Name"], trace["PRD"], self.names)
+        return trace
+
+
+def _fill_empty(column, keys, mapping):
+    """Fills the empty cells of a column with the mapping of their keys
+
+    Args:
+        column (pd.Series): column to fill
+        keys (pd.Series): key of each row
+        mapping (pd.Series): value of each key
+
+    Returns:
+        np.ndarray: the filled column (the column's own values if there was nothing to fill)
+    """
+    empty = column.isna().to_numpy()
+    if len(mapping) == 0 or not empty.any():
+        return column.to_numpy()
+    values = column.to_numpy(dtype=object, na_value=None).copy()
+    values[empty] = keys[empty].map(mapping).to_numpy(dtype=object, na_value=None)
+    return values
+
+
+def _first_mapping(keys, values):
+    """Mapping of each key to its first non-empty value
+
+    Args:
+        keys (pd.Series): key column
+        values (pd.Series): value column
+
+    Returns:
+        pd.Series: values, indexed by unique key
+    """
+    df = pd.DataFrame({"key": keys.to_numpy(), "value": values.to_numpy()}).dropna()
+    df = df.drop_duplicates("key")
+    return pd.Series(df["value"].to_numpy(), index=pd.Index(df["key"].to_numpy()))
+
+
+def _leading_ids(column):
+    """IDs at the start of Rally references like "ESA-123: Name of the SRS"
+
+    Args:
+        column (pd.Series): the references
+
+    Returns:
+        pd.Series: the IDs
+    """
+    return column.astype("string").str.split(":", n=1).str[0].str.strip()
@@ -1,46 +1,528 @@
 import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
-from read_write import write_error_log
-from create_trace import create_trace
-from validate_trace import validate_trace
+import profiling
+import readers
+import warm_cache
+
+# pandas and the modules that use it are imported by the functions that need them, not here, so
+# `--help` and runs sent to the trace service (`--service`) start without loading them
 
 
 def run(params):
-    """Code that's run when run.sh or python src/run.py is called"""
+    """Code that's run when run.sh or python src/run.py is called
+
+    Returns:
+        list(dict): a row per release, with its status, row counts, time and output paths (see BATCH_SUMMARY_COLUMNS)
+    """
     print("Running script")
+
+    # Time each stage of the run, if asked to
+    profiler = profiling.start(params["cprofile"]) if params["profile"] else None
+
+    # Several versions (or "all") make a trace per release
+    versions = params["version_num"]
+    if isinstance(versions, str):
+        versions = [versions]
+    if len(versions) > 1 or "all" in versions:
+        assert not params["watch"], "Watch mode keeps the trace of a single release up to date; give one version"
+        summaries = _run_batch(params, versions)
+    else:
+        params = dict(params, version_num=versions[0])
+        start = time.perf_counter()
+        if params["watch"]:
+            counts = _run_watch(params)
+        elif params["stream"]:
+            counts = _run_streaming(params)
+        else:
+            counts = _run_in_memory(params)
+        summaries = [{"Version": versions[0], "Status": "OK", **counts, "Seconds": round(time.perf_counter() - start, 2),
+                      "Trace Path": params["out_path"], "Error Log Path": params["error_log_path"]}]
+
+    # Timing report goes next to the trace
+    if profiler is not None:
+        profiling.stop()
+        profiler.write_report(f"{params['out_path']}.profile.json")
+        if params["cprofile"]:
+            profiler.dump_hottest_stats(f"{params['out_path']}.pstats")
     
+    print("Script finished")
+    return summaries
+
+
+def prewarm(params):
+    """Parses new and changed input files of a run into the parse cache, without making a trace
+
+    Used by the trace service (service.py) to keep up with the V&V folder between jobs; with
+    `warm_cache` on, the loaded indexes stay in memory too.
+
+    Args:
+        params (dict): run arguments
+    """
+    from create_trace import list_versions
+
+    versions = [params["version_num"]] if isinstance(params["version_num"], str) else params["version_num"]
+    if "all" in versions:
+        versions = list_versions(params["automated_tests_path"])
+    cache = _get_parse_cache(params)
+    for version in dict.fromkeys(versions):
+        _load_inputs(dict(params, version_num=version), cache)
+
+
+def _run_in_memory(params, shared=None):
+    """Creates the whole trace in memory, then validates and writes it
+
+    Args:
+        params (dict): run arguments
+        shared (dict, optional): inputs already loaded by `_run_batch()`, by `_load_inputs()` name
+
+    Returns:
+        dict: number of trace, error log and backfilled rows (see BATCH_SUMMARY_COLUMNS)
+    """
+    from create_trace import create_trace, BACKFILL_REPORT_COLUMNS
+    from read_write import write_error_log, write_trace, TraceWriter
+
     # Keep track of all errors as pd.DataFrame's of the error entries in a list
     invalid_dfs = []
 
-    # Step 1 (and implicitly 2): Read in data, process it to create trace matrix
-    trace, invalid = create_trace(params["automated_tests_path"], params["manual_as_runs"], params["version_num"], params["srs_prefix"])
+    # Reuse parsed input files that haven't changed since the last run
+    cache = _get_parse_cache(params)
+
+    # Step 1: Read in all the inputs at once
+    with profiling.stage("load_inputs"):
+        inputs = _load_inputs(params, cache, shared)
+    tests = {name: inputs[name] for name in ["as_run", "rest_api", "rx"]}
+
+    # Step 2: Process the tests to create trace matrix, filling in SRS ID, PRD and Name from the requirement exports
+    with profiling.stage("create_trace") as record:
+        trace, invalid = create_trace(params["automated_tests_path"], params["manual_as_runs"], params["version_num"], params["srs_prefix"],
+                                      params["jobs"], params["parser"], cache, inputs["requirements"], tests)
+        record.rows_out = len(trace)
     invalid_dfs.extend(invalid)
+
+    # Fill in PRD, SRS ID and Name from the previous trace matrix
+    backfill = inputs["backfill"]
+    carried = []
+    if backfill is not None:
+        with profiling.stage("backfill", rows_in=len(trace)) as record:
+            trace, carried = backfill.fill(trace)
+            record.rows_out = len(carried)
+        print(f"Backfilled {len(carried)} of {len(trace)} rows from the previous trace")
+        with TraceWriter(_backfill_report_path(params), BACKFILL_REPORT_COLUMNS, "csv") as report:
+            report.write(carried)
     
     # 3. Validate trace matrix
-    # TODO: Until logic for all columns completed, validation fails. Re-enable after all columns filled out.
-    # trace, invalid = validate_trace(trace, params["obs_srs_path"], params["active_prd_path"], params["prd_prefix"], params["srs_prefix"])
-    # invalid_dfs.extend(invalid)
+    # TODO: Until logic for all columns completed, validation fails, so it's only done with --validate.
+    # Make it the default after all columns filled out.
+    if params["validate"]:
+        from validate_trace import validate_trace
+        with profiling.stage("validate_trace", rows_in=len(trace)) as record:
+            trace, invalid = validate_trace(trace, params["obs_srs_path"], params["active_prd_path"], params["prd_prefix"], params["srs_prefix"],
+                                            reference=inputs["reference"])
+            record.rows_out = len(trace)
+        invalid_dfs.extend(invalid)
     
     # 4. Export trace matrix and error log
-    write_error_log("temp_error_log.csv", invalid_dfs)
-    trace.to_csv(params["out_path"], index=False)
-    
-    print("Script finished")
-    
-    
+    with profiling.stage("write_error_log", rows_in=sum(len(df) for df in invalid_dfs)):
+        write_error_log(params["error_log_path"], invalid_dfs)
+    with profiling.stage("write_trace", rows_in=len(trace)):
+        write_trace(params["out_path"], trace, params["format"])
 
-if __name__ == "__main__":
-    """This method allows for you to call this script from the console 
-    
-    >>> python run.py -o "output_file.xlsx" -m "path/to/manual_as_runs.docx" -s "obsolete_tests.csv" <CONTINUED; all the other args, listed below> 
+    return {"Trace Rows": len(trace), "Error Rows": sum(len(df) for df in invalid_dfs), "Backfilled Rows": len(carried)}
+
+
+def _run_streaming(params, shared=None):
+    """Creates the trace a batch of files at a time, writing each batch out as soon as it's made
+
+    Memory use stays flat however big the V&V folder is. The parse cache isn't used, and the
+    trace isn't validated, since both need the whole trace at once.
+
+    Args:
+        params (dict): run arguments
+        shared (dict, optional): inputs already loaded by `_run_batch()`, by `_load_inputs()` name
+
+    Returns:
+        dict: number of trace, error log and backfilled rows (see BATCH_SUMMARY_COLUMNS)
+    """
+    from create_trace import iter_trace, ERROR_LOG_COLUMNS, BACKFILL_REPORT_COLUMNS
+    from read_write import ErrorLogWriter, TraceWriter
+
+    if not params["no_cache"]:
+        print("Streaming mode doesn't use the parse cache; all input files are parsed")
+    print("Streaming mode doesn't validate the trace")
+
+    # The lookups are built once (at the same time), then each batch is filled in from them
+    with profiling.stage("load_inputs"):
+        inputs = _load_concurrently({
+            "requirements": lambda: _load_requirement_index(params),
+            "backfill": lambda: _load_backfill_index(params)
+        }, params["load_threads"], shared)
+    requirements = inputs["requirements"]
+    backfill = inputs["backfill"]
+    tests = {"as_run": inputs["as_run"]} if "as_run" in inputs else None
+
+    with profiling.stage("stream_trace") as record, \
+            TraceWriter(params["out_path"], fmt=params["format"]) as trace_writer, \
+            ErrorLogWriter(params["error_log_path"], ERROR_LOG_COLUMNS) as error_log, \
+            (TraceWriter(_backfill_report_path(params), BACKFILL_REPORT_COLUMNS, "csv") if backfill else nullcontext()) as report:
+        num_rows = 0
+        num_errors = 0
+        num_carried = 0
+        for trace, invalid in iter_trace(params["automated_tests_path"], params["manual_as_runs"], params["version_num"],
+                                         params["srs_prefix"], params["jobs"], params["parser"], params["batch_files"], requirements, tests):
+            if backfill is not None:
+                trace, carried = backfill.fill(trace)
+                report.write(carried)
+                num_carried += len(carried)
+            trace_writer.write(trace)
+            num_rows += len(trace)
+            for df in invalid:
+                error_log.write(df)
+                num_errors += len(df)
+        record.rows_out = num_rows
+    if backfill is not None:
+        print(f"Backfilled {num_carried} of {num_rows} rows from the previous trace")
+
+    return {"Trace Rows": num_rows, "Error Rows": num_errors, "Backfilled Rows": num_carried}
+
+
+def _run_watch(params):
+    """Creates the trace, then keeps it up to date with the release's automated test folders until stopped (Ctrl+C)
+
+    Every `--watch` seconds, the RestApiTests and Rx folders are checked for new, changed and
+    deleted .txt files without walking the whole folder (see `watch.TraceWatch`). Only those
+    files are parsed, and the trace, error log and backfill report are written again with their
+    rows replaced. Each output is written next to the old one and then moved over it, so
+    whatever reads it never sees a half-written file.
+
+    Args:
+        params (dict): run arguments
+
+    Returns:
+        dict: number of trace, error log and backfilled rows of the last trace written (see BATCH_SUMMARY_COLUMNS)
+    """
+    assert not params["stream"], "Watch mode keeps the trace in memory, so it can't be used with --stream"
+    from create_trace import load_as_run_tests
+    from watch import TraceWatch
+
+    cache = _get_parse_cache(params)
+    with profiling.stage("load_inputs"):
+        inputs = _load_concurrently({
+            "as_run": lambda: load_as_run_tests(params["manual_as_runs"], cache),
+            "requirements": lambda: _load_requirement_index(params),
+            "backfill": lambda: _load_backfill_index(params)
+        }, params["load_threads"])
+
+    with profiling.stage("create_trace"):
+        watch = TraceWatch(params["automated_tests_path"], params["manual_as_runs"], params["version_num"], params["srs_prefix"],
+                           params["jobs"], params["parser"], cache, inputs["requirements"], inputs["backfill"], inputs["as_run"],
+                           None if params["no_cache"] else params["cache_dir"])
+    counts = _write_watched_trace(params, watch)
+
+    print(f"Watching {params['automated_tests_path']} for new or changed test results every {params['watch']}s; press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(params["watch"])
+            if watch.update():
+                counts = _write_watched_trace(params, watch)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    return counts
+
+
+def _write_watched_trace(params, watch):
+    """Writes the trace, error log and backfill report of a `TraceWatch`, replacing the old ones
+
+    Returns:
+        dict: number of trace, error log and backfilled rows (see BATCH_SUMMARY_COLUMNS)
+    """
+    from create_trace import BACKFILL_REPORT_COLUMNS
+    from read_write import write_error_log, write_trace, TraceWriter
+
+    trace = watch.trace()
+    invalid_dfs = watch.invalid_dfs()
+    carried = watch.carried()
+
+    with profiling.stage("write_outputs", rows_in=len(trace)):
+        _replace_file(params["error_log_path"], readers.ERROR_LOG_FORMATS, lambda path: write_error_log(path, invalid_dfs))
+        _replace_file(params["out_path"], readers.TRACE_FORMATS, lambda path: write_trace(path, trace, params["format"]))
+        if carried is not None:
+            def write_report(path):
+                with TraceWriter(path, BACKFILL_REPORT_COLUMNS, "csv") as report:
+                    report.write(carried)
+            _replace_file(_backfill_report_path(params), readers.TRACE_FORMATS, write_report)
+
+    print(f"{time.strftime('%H:%M:%S')} Wrote {len(trace)} trace rows and {sum(len(df) for df in invalid_dfs)} error log rows")
+    return {"Trace Rows": len(trace), "Error Rows": sum(len(df) for df in invalid_dfs),
+            "Backfilled Rows": len(carried) if carried is not None else 0}
+
+
+def _replace_file(file_path, formats, write):
+    """Writes a file under a temporary name, then moves it over the file, so it's never seen half-written
+
+    Args:
+        file_path (str): path to the file
+        formats (dict): format name -> list of file extensions, to keep the extension the format is picked from
+        write (function): writes the file to the path it's given
     """
+    tmp_path = _suffixed_path(file_path, "partial", formats)
+    write(tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+# Columns of the summary that batch mode writes, one row per release
+BATCH_SUMMARY_COLUMNS = ["Version", "Status", "Trace Rows", "Error Rows", "Backfilled Rows", "Seconds", "Trace Path", "Error Log Path"]
+
+
+def _run_batch(params, versions):
+    """Creates a trace and an error log for each of several releases
+
+    The inputs the releases share (the manual as-runs, the requirement index and the previous
+    trace) are loaded once. The releases are then processed in parallel, one per worker process
+    of `--jobs` (each reading its own .txt files without a pool of its own), or one after another
+    in this process with the default of 1 job. A release that fails doesn't stop the others; its
+    error goes in the summary, `<trace path>_summary.csv`.
+
+    Args:
+        params (dict): run arguments; the trace and error log paths get `_<version>` added
+        versions (list): version numbers, or ["all"] for every version folder
+    """
+    import pandas as pd
+    import read_write as rw
+    from create_trace import list_versions, load_as_run_tests
+
+    if "all" in versions:
+        versions = list_versions(params["automated_tests_path"])
+    versions = list(dict.fromkeys(versions)) # Drop repeats, keep order
+    print(f"Batch mode: {len(versions)} releases ({', '.join(versions)})")
+
+    jobs = params["jobs"] or os.cpu_count() or 1
+    jobs = min(jobs, len(versions))
+
+    # Each worker process reads a release on its own, so releases don't also get a pool each
+    release_params = [_release_params(params, version, 1 if jobs > 1 else params["jobs"]) for version in versions]
+
+    with profiling.stage("load_shared_inputs"):
+        cache = None if params["stream"] else _get_parse_cache(params)
+        loaders = {
+            "as_run": lambda: load_as_run_tests(params["manual_as_runs"], cache),
+            "requirements": lambda: _load_requirement_index(params),
+            "backfill": lambda: _load_backfill_index(params)
+        }
+        if params["validate"] and not params["stream"]:
+            loaders["reference"] = lambda: _load_reference_index(params)
+        shared = _load_concurrently(loaders, params["load_threads"])
+
+    with profiling.stage("process_releases") as record:
+        if jobs <= 1:
+            summaries = [_run_release(release, shared) for release in release_params]
+        else:
+            # Workers get the shared inputs once, when they start, rather than with every release.
+            # Stages run in the workers aren't in the profile report.
+            with rw._process_pool(jobs, _init_release_worker, (shared,)) as executor:
+                summaries = list(executor.map(_run_release, release_params))
+        record.rows_out = sum(summary.get("Trace Rows", 0) for summary in summaries)
+
+    summary = pd.DataFrame(summaries, columns=BATCH_SUMMARY_COLUMNS)
+    # Failed releases have no counts; keep the counts of the rest whole numbers
+    summary[["Trace Rows", "Error Rows", "Backfilled Rows"]] = summary[["Trace Rows", "Error Rows", "Backfilled Rows"]].astype("Int64")
+    summary_path = _suffixed_path(params["out_path"], "summary", readers.TRACE_FORMATS, ".csv")
+    summary.to_csv(summary_path, index=False)
+    print(summary.drop(columns=["Trace Path", "Error Log Path"]).to_string(index=False))
+    print(f"Batch summary written to {summary_path}")
+
+    failed = summary[summary["Status"] != "OK"]
+    if len(failed) > 0:
+        print(f"{len(failed)} of {len(summary)} releases failed: {', '.join(failed['Version'])}")
+    return summaries
+
+
+# Shared inputs of a batch worker process, set by `_init_release_worker()`
+_worker_shared = None
+
+
+def _init_release_worker(shared):
+    """Keeps the shared inputs of a batch in a worker process"""
+    global _worker_shared
+    _worker_shared = shared
+
+
+def _run_release(params, shared=None):
+    """Creates the trace and error log of one release of a batch
+
+    Args:
+        params (dict): run arguments of the release (see `_release_params()`)
+        shared (dict, optional): shared inputs; defaults to the worker's, in a batch worker process
+
+    Returns:
+        dict: the release's row of the batch summary (see BATCH_SUMMARY_COLUMNS)
+    """
+    if shared is None:
+        shared = _worker_shared
+    version = params["version_num"]
+    summary = {"Version": version, "Trace Path": params["out_path"], "Error Log Path": params["error_log_path"]}
+
+    start = time.perf_counter()
+    print(f"Release {version}: creating trace")
+    try:
+        with profiling.stage(f"release_{version}"):
+            if params["stream"]:
+                summary.update(_run_streaming(params, shared))
+            else:
+                summary.update(_run_in_memory(params, shared))
+        summary["Status"] = "OK"
+    except Exception as e:
+        summary["Status"] = f"Failed: {e!r}"
+        print(f"Release {version}: {summary['Status']}")
+    summary["Seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def _release_params(params, version, jobs):
+    """Run arguments for one release of a batch: its own version, trace path and error log path"""
+    return dict(params,
+                version_num=version,
+                jobs=jobs,
+                out_path=_suffixed_path(params["out_path"], version, readers.TRACE_FORMATS),
+                error_log_path=_suffixed_path(params["error_log_path"], version, readers.ERROR_LOG_FORMATS))
+
+
+def _suffixed_path(file_path, suffix, formats, extension=None):
+    """Adds `_<suffix>` to a file name, before its extension: `trace.csv.gz` -> `trace_1.33.0.csv.gz`
+
+    Args:
+        file_path (str): path to the file
+        suffix (str): what to add to the name
+        formats (dict): format name -> list of file extensions (e.g. `readers.TRACE_FORMATS`)
+        extension (str, optional): extension to use instead of the file's own
+
+    Returns:
+        str: the new path
+    """
+    # Check longest extensions first, so .csv.gz isn't taken as .gz
+    for ext in sorted((ext for exts in formats.values() for ext in exts), key=len, reverse=True):
+        if file_path.lower().endswith(ext):
+            return f"{file_path[:-len(ext)]}_{suffix}{extension or file_path[-len(ext):]}"
+    return f"{file_path}_{suffix}{extension or ''}"
+
+
+def _load_inputs(params, cache, shared=None):
+    """Reads in all the inputs of an in-memory run at the same time
+
+    The manual as-runs, the Rest API and Rx folders, the obsolete SRS and active PRD lists (with
+    --validate), the requirement exports and the previous trace don't depend on each other, so
+    loading them takes about as long as the slowest one rather than all of them added up. Inputs
+    in `shared` were already loaded (by `_run_batch()`) and aren't loaded again.
+
+    Returns:
+        dict: "as_run", "rest_api", "rx" (see `test_loaders()`), "reference" (only with --validate),
+            "requirements" and "backfill" (None if not given) -> the loaded input
+    """
+    from create_trace import test_loaders
+
+    loaders = test_loaders(params["automated_tests_path"], params["manual_as_runs"], params["version_num"],
+                           params["jobs"], params["parser"], cache)
+    if params["validate"]:
+        loaders["reference"] = lambda: _load_reference_index(params)
+    loaders["requirements"] = lambda: _load_requirement_index(params)
+    loaders["backfill"] = lambda: _load_backfill_index(params)
+    return _load_concurrently(loaders, params["load_threads"], shared)
+
+
+def _load_concurrently(loaders, max_threads=0, loaded=None):
+    """Runs independent loaders at the same time, each in its own thread
+
+    Threads help because loading is mostly waiting on the disk, or on the worker processes
+    of `--jobs`; stages the loaders record are nested under the stage this is called in.
+
+    Args:
+        loaders (dict): name -> function with no arguments that loads an input
+        max_threads (int): most inputs to load at once (0 = all of them; 1 = one after another)
+        loaded (dict, optional): inputs that were already loaded; their loaders aren't run
+
+    Returns:
+        dict: name -> what its loader returned (or the already loaded input)
+    """
+    inputs = dict(loaded or {})
+    loaders = {name: load for name, load in loaders.items() if name not in inputs}
+    if not loaders:
+        return inputs
+    with ThreadPoolExecutor(max_workers=max_threads or len(loaders)) as executor:
+        futures = {name: profiling.submit(executor, load) for name, load in loaders.items()}
+        inputs.update({name: future.result() for name, future in futures.items()})
+    return inputs
+
+
+def _get_parse_cache(params):
+    """Parse cache of a run (None with --no-cache); with `warm_cache` on, one is kept in memory across runs"""
+    if params["no_cache"]:
+        return None
+    from parse_cache import ParseCache
+    return warm_cache.reuse("parse_cache", [], lambda: ParseCache(params["cache_dir"], params["cache_size_mb"], warm_cache.is_enabled()),
+                            params["cache_dir"], params["cache_size_mb"])
+
+
+def _load_requirement_index(params):
+    """Builds the requirement index if a Rally export or SRS sheet was given (None otherwise)
+
+    The index is cached in the parse cache folder, so it's only rebuilt when the exports change.
+    """
+    if not params["rally_path"] and not params["srs_path"]:
+        return None
+    from requirement_index import RequirementIndex
+    with profiling.stage("requirement_index"):
+        cache_path = None if params["no_cache"] else f"{params['cache_dir']}/requirement_index.pkl"
+        return warm_cache.reuse("requirement_index", [params["rally_path"], params["srs_path"], params["active_prd_path"]],
+                                lambda: RequirementIndex.from_files(params["rally_path"], params["srs_path"], params["active_prd_path"], cache_path),
+                                params["rally_path"], params["srs_path"], params["active_prd_path"])
+
+
+def _load_backfill_index(params):
+    """Loads the previous trace matrix and indexes it for backfilling, if one was given (None otherwise)"""
+    if not params["prev_trace_path"]:
+        return None
+    from create_trace import BackfillIndex
+    with profiling.stage("backfill_index"):
+        return warm_cache.reuse("backfill_index", [params["prev_trace_path"]],
+                                lambda: BackfillIndex(readers.read("trace", params["prev_trace_path"], matrix_type=params["matrix_type"],
+                                                                   sidecar=params["trace_sidecar"])),
+                                params["prev_trace_path"], params["matrix_type"])
+
+
+def _load_reference_index(params):
+    """Loads the active PRD and obsolete SRS lists that the trace is validated against"""
+    from validate_trace import ReferenceIndex
+    with profiling.stage("reference_index"):
+        return warm_cache.reuse("reference_index", [params["obs_srs_path"], params["active_prd_path"]],
+                                lambda: ReferenceIndex.from_files(params["obs_srs_path"], params["active_prd_path"]),
+                                params["obs_srs_path"], params["active_prd_path"])
+
+
+def _backfill_report_path(params):
+    """The report of backfilled rows goes next to the trace"""
+    return f"{params['out_path']}.backfill.csv"
+
+
+def build_parser():
+    """Command line arguments of `run.py`; the trace service takes the same ones, as a dict"""
     parser = argparse.ArgumentParser(description="Trace matrix generation and validation. "
                                      "Can run this python script `run.py` in console, providing arguments "
                                      "that will be parsed")
 
     parser.add_argument("-o", "--out_path",
-                        help="Output path of new trace matrix. Should have `.xlsx` in it",
-                        default="new_trace.xlsx", required=False)
+                        help="Output path of new trace matrix. The format is picked from the extension: `.csv`, `.csv.gz`, "
+                        "`.parquet`, `.feather`/`.arrow` or `.xlsx` (parquet and feather need pyarrow)",
+                        default="new_trace.csv", required=False)
+    parser.add_argument("--format",
+                        help="Format of the trace matrix, if it shouldn't be picked from the `-o` extension",
+                        choices=list(readers.TRACE_FORMATS),
+                        required=False)
+    parser.add_argument("-e", "--error_log_path",
+                        help="Output path of the error log. Can be `.csv`, `.csv.gz`, `.parquet` or `.feather` (the last two need pyarrow)",
+                        default="temp_error_log.csv", required=False)
     parser.add_argument("-m", "--manual_as_runs",
                         help="Path to manual as-runs `.docx` document. NOTE: `.doc` will not work. You must convert it by doing `Save As` in Word",
                         required=True)
@@ -54,8 +536,38 @@ if __name__ == "__main__":
                         help="Path to folder (named `ER####### v##` etc) containing the automated tests",
                         required=True)
     parser.add_argument("-v", "--version_num",
-                        help="Version number, with two periods in it (i.e. 1.33.0)",
+                        help="Version number, with two periods in it (i.e. 1.33.0). Give several (or `all`, for every version folder) "
+                        "to make a trace and error log per release, named `<out_path>_<version>`, plus `<out_path>_summary.csv`",
+                        nargs="+",
                         required=True)
+    parser.add_argument("-r", "--rally_path",
+                        help="Path to a Rally test case export `.csv` (Formatted ID and Work Product columns), used to fill in "
+                        "the SRS ID of each TC",
+                        required=False)
+    parser.add_argument("--srs_path",
+                        help="Path to an SRS `.xlsx` (ID, PRD and Name columns), used to fill in the PRD and Name of each SRS. "
+                        "PRD names come from the `-p` file's Name column",
+                        required=False)
+    parser.add_argument("-t", "--prev_trace_path",
+                        help="Path to the previous trace matrix `.xlsx`. Empty PRD, SRS ID and Name cells of the new trace are "
+                        "filled in from it (matched on TC ID, then Test Name), and the filled rows are listed in `<out_path>.backfill.csv`",
+                        required=False)
+    parser.add_argument("--matrix_type",
+                        help="Which trace matrix sheet of the previous trace to use",
+                        choices=["CO", "PSC"],
+                        default="CO",
+                        required=False)
+    parser.add_argument("--trace_sidecar",
+                        action="store_true",
+                        help="If this flag is specified, saves a columnar copy of the previous trace next to it, "
+                        "so later runs don't have to parse the `.xlsx` again",
+                        required=False)
+    parser.add_argument("--validate",
+                        action="store_true",
+                        help="If this flag is specified, validates the trace against the `-s` and `-p` lists (loaded at the same "
+                        "time as the other inputs), and moves the invalid rows to the error log. Off by default, since most rows "
+                        "fail until the PRD, SRS ID and Name columns are filled in. Not done with --stream or --watch",
+                        required=False)
     parser.add_argument("--prd_prefix",
                         help="PRD prefix (probably US)",
                         default="US",
@@ -64,14 +576,110 @@ if __name__ == "__main__":
                         help="SRS prefix (TC or ESA-)",
                         default="US",
                         required=False)
+    parser.add_argument("-j", "--jobs",
+                        help="Number of worker processes for reading the automated test `.txt` files, or with several versions, "
+                        "for processing releases in parallel. Use 0 for one per CPU",
+                        type=int,
+                        default=1,
+                        required=False)
+    parser.add_argument("--parser",
+                        help="How the automated test `.txt` files are parsed: `rows` (line by line), "
+                        "`columnar` (vectorized, faster and uses less memory on large folders), or `bytes` (scans the raw bytes, "
+                        "memory mapping big files; needs pyarrow)",
+                        choices=readers.TXT_PARSERS,
+                        default="rows",
+                        required=False)
+    parser.add_argument("--load_threads",
+                        help="Most input documents to read in at the same time. Use 0 (the default) to read them all at once, "
+                        "or 1 to read them one after another, which uses less memory",
+                        type=int,
+                        default=0,
+                        required=False)
+    parser.add_argument("--cache_dir",
+                        help="Folder for the parse cache, which keeps parsed input files between runs so only new or changed files are parsed",
+                        default=".trace_cache",
+                        required=False)
+    parser.add_argument("--cache_size_mb",
+                        help="Maximum size of the parse cache in MB; least recently used entries are removed past this",
+                        type=int,
+                        default=1024,
+                        required=False)
+    parser.add_argument("--no-cache",
+                        dest="no_cache",
+                        action="store_true",
+                        help="If this flag is specified, parses every input file from scratch and doesn't use the parse cache",
+                        required=False)
+    parser.add_argument("--stream",
+                        action="store_true",
+                        help="If this flag is specified, reads, processes and writes the automated tests a batch of files at a time, "
+                        "so memory use doesn't grow with the size of the V&V folder. Skips the parse cache and validation",
+                        required=False)
+    parser.add_argument("--batch_files",
+                        help="With --stream, number of automated test `.txt` files per batch",
+                        type=int,
+                        default=100,
+                        required=False)
+    parser.add_argument("--watch",
+                        help="Keep running, and every this many seconds check the release's RestApiTests and Rx folders for new, "
+                        "changed or deleted `.txt` files. Only those are parsed, and the trace and error log are written again "
+                        "with their rows replaced. Stop with Ctrl+C. Use 0 (the default) to make the trace once",
+                        type=float,
+                        default=0,
+                        required=False)
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="If this flag is specified, records time, CPU time, rows, files, bytes read and peak memory "
+                        "of each stage, and writes them to `<out_path>.profile.json`",
+                        required=False)
+    parser.add_argument("--cprofile",
+                        action="store_true",
+                        help="With --profile, also runs cProfile and writes the stats of the slowest stage to `<out_path>.pstats`",
+                        required=False)
+    parser.add_argument("--service",
+                        action="store_true",
+                        help="If this flag is specified, sends the run to the trace service (start it with `python src/service.py`) "
+                        "instead of running it here. The service keeps inputs it has already loaded in memory between runs",
+                        required=False)
+    parser.add_argument("--service_port",
+                        help="Port of the trace service on this machine",
+                        type=int,
+                        default=8765,
+                        required=False)
     parser.add_argument("--verbose",
                         action="store_true",
                         help="If this flag is specified, will save to error log all errors AND tests filtered out during processing",
                         default=True,
                         required=False)
+    return parser
+
+
+def complete_params(params):
+    """Fills in the arguments of `run()` that were left out with their command line defaults
+
+    Args:
+        params (dict): some of the arguments, by name (as in the `vars()` of the parsed command line)
+
+    Returns:
+        dict: all the arguments
+    """
+    actions = [action for action in build_parser()._actions if action.dest != "help"]
+    missing = [action.dest for action in actions if action.required and not params.get(action.dest)]
+    assert not missing, f"Missing required arguments: {missing}"
+    return {**{action.dest: action.default for action in actions}, **params}
+
+
+if __name__ == "__main__":
+    """This method allows for you to call this script from the console 
+    
+    >>> python run.py -o "output_file.xlsx" -m "path/to/manual_as_runs.docx" -s "obsolete_tests.csv" <CONTINUED; all the other args, listed below> 
+    """
     
     # Get args from console input and convert to dict
-    args = vars(parser.parse_args())
+    args = vars(build_parser().parse_args())
     
-    # Run the script
-    run(args)
+    # Run the script, here or in the trace service
+    if args["service"]:
+        import service
+        service.submit_run(args, args["service_port"])
+    else:
+        run(args)
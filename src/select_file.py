@@ -2,7 +2,12 @@ from tkinter import *
 import tkinter.filedialog as fd
 import tkinter.messagebox as messagebox
 import re
+import threading
 #import run
+import service
+
+# Longest the UI waits for the trace service to finish a run, in seconds
+SUBMIT_TIMEOUT = 3600
 
 class Application(Frame):
     def __init__(self, master=None):
@@ -153,6 +158,30 @@ class Application(Frame):
         else:
             param_dict={"prd":self.PRDfileName.get(), "srs":self.SRSfileName.get(), "obselete_srs":self.ObsoleteSRSfileName.get(), "manual_as_runs":self.ManualfileName.get(), "prev_trace_matrix": self.TraceMatrixfileName.get(), "automated_tests_folder":self.automatedTestsfileName.get(), "version_num":self.versionNumName.get(),"srs_prefix":self.srsPrefixName.get() }
             #run.run(param_dict)
+            self.submit(param_dict)
+
+    def submit(self, param_dict):
+        # Sent to the trace service (python src/service.py), which keeps inputs it has already loaded in memory
+        params={"active_prd_path":param_dict["prd"], "srs_path":param_dict["srs"], "obs_srs_path":param_dict["obselete_srs"], "manual_as_runs":param_dict["manual_as_runs"], "prev_trace_path":param_dict["prev_trace_matrix"], "automated_tests_path":param_dict["automated_tests_folder"], "version_num":param_dict["version_num"], "srs_prefix":param_dict["srs_prefix"] }
+        # The run can take minutes, so it's waited for on a worker thread and the window stays responsive
+        self.startBtn.config(state=DISABLED)
+        threading.Thread(target=self.waitForRun, args=({name: value for name, value in params.items() if value},), daemon=True).start()
+
+    def waitForRun(self, params):
+        # Worker thread: Tk isn't thread-safe, so the result is handed back to the Tk thread with after()
+        try:
+            summary=service.submit("run", params, timeout=SUBMIT_TIMEOUT)["summary"]
+        except (ConnectionError, RuntimeError, TimeoutError) as e:
+            self.master.after(0, self.showRunResult, None, str(e))
+            return
+        self.master.after(0, self.showRunResult, summary, None)
+
+    def showRunResult(self, summary, error):
+        self.startBtn.config(state=NORMAL)
+        if error is not None:
+            messagebox.showerror("Message", error)
+            return
+        messagebox.showinfo("Message", "\n".join(f"{row['Version']}: {row['Trace Rows']} trace rows written to {row['Trace Path']}" for row in summary))
     
 
 app = Application()
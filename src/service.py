@@ -0,0 +1,354 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import discovery
+import warm_cache
+
+# The service only listens on this machine
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Arguments of `run.run()` that are paths. The client makes them absolute, since the service
+# doesn't run in the client's folder.
+PATH_PARAMS = ["out_path", "error_log_path", "manual_as_runs", "obs_srs_path", "active_prd_path", "automated_tests_path",
+               "rally_path", "srs_path", "prev_trace_path", "cache_dir", "trace_path"]
+
+# Input files of a run, besides the automated test .txt files
+_INPUT_FILE_PARAMS = ["manual_as_runs", "obs_srs_path", "active_prd_path", "rally_path", "srs_path", "prev_trace_path"]
+
+
+class TraceService:
+    """Runs trace jobs in this process, keeping what they load in memory between jobs
+
+    Parsed input files (through an in-memory parse cache), the requirement, backfill and
+    reference indexes, and compiled regexes stay loaded, and are only reloaded when their
+    files change. A job whose arguments and input files haven't changed since it last ran,
+    and whose outputs are still there, isn't run again. A watcher thread re-parses new or
+    changed .txt files of recent jobs in the background, so the next job doesn't wait for them.
+    Jobs run one at a time.
+    """
+
+    def __init__(self, watch_seconds=10):
+        """
+        Args:
+            watch_seconds (int): how often the watcher checks the inputs of recent jobs for changes (0 = don't watch)
+        """
+        # Imported here, so the client functions below don't have to import pandas
+        import run
+        warm_cache.enable()
+        self._run = run
+
+        self._lock = threading.Lock()
+        self._results = {} # job key -> (inputs fingerprint, output signatures, response)
+        self._watched = {} # job key -> (params, inputs fingerprint), of the latest jobs
+        self.jobs_run = 0
+        self.jobs_reused = 0
+        self.started = time.time()
+
+        self._stop = threading.Event()
+        if watch_seconds:
+            threading.Thread(target=self._watch, args=(watch_seconds,), daemon=True).start()
+
+    def run(self, params):
+        """Runs `run.run()`, or returns the response of the same job if nothing changed since
+
+        Args:
+            params (dict): arguments of `run.run()`; missing ones get their command line defaults
+
+        Returns:
+            dict: "summary" (rows of `run.run()`), "log" (what the job printed), "seconds" and
+                "reused" (True if the job didn't have to run again)
+        """
+        params = self._run.complete_params(dict(params, service=False))
+        assert not params["watch"], "The service already watches the V&V folders of its jobs; run --watch on its own"
+        key = _job_key("run", params)
+        fingerprint = _inputs_fingerprint(params)
+
+        with self._lock:
+            cached = self._results.get(key)
+            if not params["profile"] and cached is not None and cached[0] == fingerprint and cached[1] == _output_signatures(cached[2]["summary"]):
+                self.jobs_reused += 1
+                return dict(cached[2], reused=True, seconds=0.0)
+
+            start = time.perf_counter()
+            log = io.StringIO()
+            with redirect_stdout(_Tee(log, sys.stdout)):
+                summary = self._run.run(params)
+            response = {"summary": summary, "log": log.getvalue(), "seconds": round(time.perf_counter() - start, 3), "reused": False}
+
+            self.jobs_run += 1
+            self._results[key] = (fingerprint, _output_signatures(summary), response)
+            self._watched[key] = (params, fingerprint)
+            return response
+
+    def validate(self, params):
+        """Validates a trace file against the active PRD and obsolete SRS lists
+
+        Args:
+            params (dict): "trace_path", "obs_srs_path", "active_prd_path", "out_path" (valid rows),
+                "error_log_path" (invalid rows) and optionally "prd_prefix" and "srs_prefix"
+
+        Returns:
+            dict: "summary" (valid and invalid row counts), "log", "seconds" and "reused" (always False)
+        """
+        import read_write as rw
+        from validate_trace import validate_trace
+
+        for name in ["trace_path", "obs_srs_path", "active_prd_path", "out_path", "error_log_path"]:
+            assert params.get(name), f"Missing required argument: {name}"
+
+        with self._lock:
+            start = time.perf_counter()
+            log = io.StringIO()
+            with redirect_stdout(_Tee(log, sys.stdout)):
+                trace = rw.read_trace_file(params["trace_path"])
+                reference = self._run._load_reference_index(params)
+                valid, invalid_dfs = validate_trace(trace, params["obs_srs_path"], params["active_prd_path"],
+                                                    params.get("prd_prefix", "US"), params.get("srs_prefix", "TC"), reference=reference)
+                rw.write_trace(params["out_path"], valid)
+                rw.write_error_log(params["error_log_path"], invalid_dfs)
+            summary = {"Valid Rows": len(valid), "Invalid Rows": sum(len(df) for df in invalid_dfs)}
+            self.jobs_run += 1
+            return {"summary": summary, "log": log.getvalue(), "seconds": round(time.perf_counter() - start, 3), "reused": False}
+
+    def status(self):
+        """Uptime, job counts and what's being kept in memory"""
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started),
+            "jobs_run": self.jobs_run,
+            "jobs_reused": self.jobs_reused,
+            "warm_inputs": warm_cache.names(),
+            "watched_folders": sorted({params["automated_tests_path"] for params, _ in self._watched.values()})
+        }
+
+    def stop(self):
+        """Stops the watcher"""
+        self._stop.set()
+
+    def _watch(self, interval):
+        """Re-parses the changed inputs of recent jobs into the warm caches, every `interval` seconds"""
+        while not self._stop.wait(interval):
+            for key, (params, fingerprint) in list(self._watched.items()):
+                try:
+                    new_fingerprint = _inputs_fingerprint(params)
+                    if new_fingerprint == fingerprint:
+                        continue
+                    with self._lock:
+                        print(f"Inputs of {params['automated_tests_path']} changed, re-parsing them")
+                        self._run.prewarm(params)
+                    self._watched[key] = (params, new_fingerprint)
+                except Exception:
+                    # A half-copied folder can fail to parse; the next check tries again
+                    traceback.print_exc()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP API of the trace service
+
+    GET /status; POST /run and /validate with the arguments as a JSON object; POST /shutdown.
+    Responses are JSON; a failed job answers 500 with its "error" and "log".
+    """
+
+    service = None # TraceService, set by serve()
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(200, self.service.status())
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/shutdown":
+            self._reply(200, {"stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        jobs = {"/run": self.service.run, "/validate": self.service.validate}
+        if self.path not in jobs:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+            self._reply(200, jobs[self.path](params))
+        except Exception as e:
+            traceback.print_exc()
+            self._reply(500, {"error": repr(e), "log": traceback.format_exc()})
+
+    def _reply(self, code, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port=DEFAULT_PORT, watch_seconds=10):
+    """Runs the trace service until it's sent /shutdown (or Ctrl+C)
+
+    Args:
+        port (int): port to listen on, on this machine only
+        watch_seconds (int): how often to check the inputs of recent jobs for changes (0 = don't watch)
+    """
+    _Handler.service = TraceService(watch_seconds)
+    server = ThreadingHTTPServer((HOST, port), _Handler)
+    print(f"Trace service listening on http://{HOST}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _Handler.service.stop()
+        server.server_close()
+    print("Trace service stopped")
+
+
+def submit(endpoint, params, port=DEFAULT_PORT, timeout=None):
+    """Sends a job to the trace service and waits for its response
+
+    Only uses the standard library, so clients (the command line, the UI) start quickly.
+
+    Args:
+        endpoint (str): "run" or "validate"
+        params (dict): arguments of the job; relative paths are made absolute
+        port (int): port of the service
+        timeout (float, optional): seconds to wait for the job
+
+    Returns:
+        dict: the response (see `TraceService.run()`)
+
+    Raises:
+        ConnectionError: if the service isn't running
+        RuntimeError: if the job failed
+        TimeoutError: if the job didn't finish within `timeout`
+    """
+    params = {name: (os.path.abspath(value) if name in PATH_PARAMS and isinstance(value, str) and value else value)
+              for name, value in params.items()}
+    request = urllib.request.Request(f"http://{HOST}:{port}/{endpoint}", data=json.dumps(params).encode(),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = json.loads(e.read() or b"{}")
+        raise RuntimeError(f"Trace service job failed: {body.get('error')}\n{body.get('log', '')}") from None
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, TimeoutError):
+            raise TimeoutError(f"Trace service didn't answer within {timeout}s") from None
+        raise ConnectionError(f"Trace service isn't running on port {port} (start it with `python src/service.py`): {e.reason}") from None
+    except TimeoutError:
+        # The job is still running in the service; only this client stopped waiting
+        raise TimeoutError(f"Trace service job didn't finish within {timeout}s") from None
+
+
+def submit_run(params, port=DEFAULT_PORT):
+    """Runs `run.run()` in the trace service, printing its output like a local run would
+
+    Args:
+        params (dict): arguments of `run.run()`
+        port (int): port of the service
+
+    Returns:
+        list(dict): the summary rows of the run
+    """
+    response = submit("run", params, port)
+    print(response["log"], end="")
+    if response["reused"]:
+        print("Nothing changed since the last run of this job; its outputs are up to date")
+    print(f"Trace service took {response['seconds']}s")
+    return response["summary"]
+
+
+def _job_key(endpoint, params):
+    """Key of a job: its endpoint and its arguments"""
+    return endpoint + json.dumps(params, sort_keys=True, default=str)
+
+
+def _inputs_fingerprint(params):
+    """Hash of the paths, sizes and modification times of all the input files of a run
+
+    Only the RestApiTests and Rx folders of the run's versions are walked, with
+    `discovery.find_txt_files()`, which gets the sizes and modification times while listing.
+    """
+    digest = hashlib.sha1()
+    for name in _INPUT_FILE_PARAMS:
+        if params.get(name):
+            digest.update(f"{params[name]}|{warm_cache.file_signature(params[name])}\n".encode())
+    for folder_path in _test_folders(params):
+        for txt_file in discovery.find_txt_files(folder_path):
+            digest.update(f"{txt_file.path}|{txt_file.size}|{txt_file.mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _test_folders(params):
+    """RestApiTests and Rx folders of the versions a run reads"""
+    versions = [params["version_num"]] if isinstance(params["version_num"], str) else params["version_num"]
+    if "all" in versions:
+        # The versions are listed again each time, so a new version folder changes the fingerprint
+        from create_trace import list_versions
+        versions = list_versions(params["automated_tests_path"])
+    return [os.path.join(params["automated_tests_path"], version, folder)
+            for version in dict.fromkeys(versions) for folder in ["RestApiTests", "Rx"]]
+
+
+def _output_signatures(summary):
+    """Sizes and modification times of the files a run wrote, to tell if they've been changed or deleted since"""
+    paths = [row[column] for row in summary for column in ["Trace Path", "Error Log Path"] if row.get(column)]
+    return [(path, warm_cache.file_signature(path)) for path in paths]
+
+
+class _Tee(io.TextIOBase):
+    """Writes to several streams at once, so a job's output is both logged and sent back"""
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+if __name__ == "__main__":
+    """Starts the trace service; jobs are then sent with `python src/run.py <args> --service`
+
+    >>> python src/service.py --port 8765
+    """
+    parser = argparse.ArgumentParser(description="Local trace matrix service. Keeps parsed inputs in memory between runs, "
+                                     "so runs sent with `run.py --service` only redo the work for inputs that changed")
+    parser.add_argument("--port",
+                        help="Port to listen on (on this machine only)",
+                        type=int, default=DEFAULT_PORT, required=False)
+    parser.add_argument("--watch_seconds",
+                        help="How often to check the V&V folders of recent jobs for changed files, which are then re-parsed "
+                        "in the background. Use 0 to not watch",
+                        type=int, default=10, required=False)
+    parser.add_argument("--stop",
+                        action="store_true",
+                        help="If this flag is specified, stops the service running on --port instead of starting one",
+                        required=False)
+    args = vars(parser.parse_args())
+
+    if args["stop"]:
+        request = urllib.request.Request(f"http://{HOST}:{args['port']}/shutdown", data=b"", method="POST")
+        urllib.request.urlopen(request).close()
+        print("Trace service stopped")
+    else:
+        serve(args["port"], args["watch_seconds"])
@@ -1,323 +1,303 @@
-import re
-
 import numpy as np
 import pandas as pd
 
-import read_write as rw
-
-
-def validate_trace(trace, obs_srs_file_path, active_prd_path, prd_prefix="US", srs_prefix="TC"):
-    # Load lists of obsolete srs and active prd  
-    obs_srs = pd.read_csv(obs_srs_file_path)
-    obs_srs_list = obs_srs["Formatted ID"].unique()
-    active_prd = pd.read_excel(active_prd_path)
-    active_prd_list = active_prd["ID"].unique()
-    
-    # Gather all the errors into this list of dfs
-    invalid_dfs = []
-    
-    # Run the tests
-    trace, invalid = _check_prd_has_srs(trace, prd_prefix, srs_prefix) 
-    invalid_dfs.extend(invalid)
-    
-    trace, invalid = _check_srs_has_test(trace, prd_prefix, srs_prefix)
-    invalid_dfs.extend(invalid)
-    
-    trace, invalid = _check_srs_has_prd(trace, prd_prefix, srs_prefix)
-    invalid_dfs.extend(invalid)
-    
-    trace, invalid = _check_prd_ref_by_srs_exists(trace, active_prd_list, prd_prefix, srs_prefix)
-    invalid_dfs.extend(invalid)
-    
-    trace, invalid = _check_srs_exists(trace, obs_srs_list, prd_prefix, srs_prefix)
-    invalid_dfs.extend(invalid)
-    
-    trace, invalid = _check_prd_exists(trace, active_prd_list, prd_prefix, srs_prefix)
-    invalid_dfs.extend(invalid)
-    
-    return trace, invalid_dfs
-    
-def _check_prd_has_srs(trace, prd_prefix, srs_prefix):
-    """check whether each PRD has SRS
-       invalid data frame will contain rows where PRDs do not have SRS
-    
+
+def validate_trace(trace, obs_srs_file_path, active_prd_path, prd_prefix="US", srs_prefix="TC", rules=None, reference=None):
+    """ Function for validating the new trace matrix
+
+    The Test Name and PRD columns are split into requirement IDs once, then every rule is
+    evaluated as a boolean mask over the whole trace. Rows that fail any rule are split off
+    at the end, with the reasons for all the rules they failed.
+
     Args:
         trace (pd.DataFrame): trace matrix
+        obs_srs_file_path (str): path to the Rally .csv of obsolete SRSs
+        active_prd_path (str): path to the .xlsx of active PRDs
         prd_prefix (str): string that PRD starts with
         srs_prefix (str): string that SRS starts with
-        
+        rules (list, optional): (error message, check function) pairs to run. Defaults to VALIDATION_RULES.
+        reference (ReferenceIndex, optional): active PRDs and obsolete SRSs, if they were already loaded;
+            the two files aren't read again
+
+    Returns:
+        pd.DataFrame: valid rows of the trace matrix
+        list(pd.DataFrame): list of invalid data frames
+    """
+    if rules is None:
+        rules = VALIDATION_RULES
+
+    # Load lists of obsolete srs and active prd
+    if reference is None:
+        reference = ReferenceIndex.from_files(obs_srs_file_path, active_prd_path)
+
+    # Split the requirement IDs out of the trace once for all the rules
+    tokenized = TokenizedTrace(trace, reference, prd_prefix, srs_prefix)
+
+    # Run the tests, gathering the reasons each row is invalid
+    invalid = np.zeros(len(trace), dtype=bool)
+    errors = np.full(len(trace), "", dtype=object)
+    for error, check in rules:
+        failed = check(tokenized)
+        errors[failed] = np.where(invalid[failed], errors[failed] + "; " + error, error)
+        invalid |= failed
+
+    valid_df = trace[~invalid]
+    invalid_df = trace[invalid].copy()
+    invalid_df.insert(0, "Error", errors[invalid])
+    invalid_df.insert(1, "Source", "Validation")
+
+    return valid_df, [invalid_df]
+
+
+class TokenizedTrace:
+    """The trace matrix plus the requirement ID columns that the validation rules share
+
+    Everything is computed once up front, so adding a rule doesn't add another pass
+    over the Test Name/PRD text.
+
+    Attributes:
+        trace (pd.DataFrame): trace matrix
+        reference (ReferenceIndex): active PRDs and obsolete SRSs
+        has_prd (np.ndarray): mask of the rows whose PRD column starts with the PRD prefix
+        has_srs (np.ndarray): mask of the rows whose SRS ID column starts with the SRS prefix
+        prd_refs (pd.Series): PRD IDs in the PRD column, one row per ID (see `_get_req_tokens()`)
+        test_prds (pd.Series): PRD IDs in the Test Name column, one row per ID
+        test_srss (pd.Series): SRS IDs in the Test Name column, one row per ID
+    """
+
+    def __init__(self, trace, reference, prd_prefix, srs_prefix):
+        """
+        Args:
+            trace (pd.DataFrame): trace matrix
+            reference (ReferenceIndex): active PRDs and obsolete SRSs
+            prd_prefix (str): string that PRD starts with
+            srs_prefix (str): string that SRS starts with
+        """
+        self.trace = trace
+        self.reference = reference
+        self.prd_prefix = prd_prefix
+        self.srs_prefix = srs_prefix
+
+        self.has_prd = _starts_with(trace["PRD"], prd_prefix).to_numpy()
+        self.has_srs = _starts_with(trace["SRS ID"], srs_prefix).to_numpy()
+
+        # PRD column can be a list separated by commas/spaces
+        self.prd_refs = _get_req_tokens(_split_tokens(trace["PRD"], split_commas=True), prd_prefix, digit_end=True)
+
+        test_name_tokens = _split_tokens(trace["Test Name"])
+        self.test_prds = _get_req_tokens(test_name_tokens, prd_prefix, digit_end=True)
+        self.test_srss = _get_req_tokens(test_name_tokens, srs_prefix)
+
+    def rows_with(self, tokens, token_mask):
+        """Boolean mask of the rows that have at least one token where token_mask is True
+
+        Args:
+            tokens (pd.Series): one of prd_refs, test_prds or test_srss
+            token_mask (np.ndarray): mask over the tokens
+
+        Returns:
+            np.ndarray: the row mask
+        """
+        rows = np.zeros(len(self.trace), dtype=bool)
+        rows[tokens.index.to_numpy()[token_mask]] = True
+        return rows
+
+
+def _check_prd_has_srs(tokenized):
+    """check whether each PRD has SRS
+       invalid rows are rows where PRDs do not have SRS
+
+    Args:
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (pd.DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (pd.DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    # Get rid of n/a values
-    valid_df = trace.loc[-trace['PRD'].str.startswith(prd_prefix)]
-    trace = trace.loc[trace['PRD'].str.startswith(prd_prefix)]
-    
-    for val in trace['SRS ID']:
-        val=str(val)
-        if not val.startswith(srs_prefix):
-            val = np.nan
-    
-    # Get number of unique SRS for each PRD
-    group = trace.groupby('PRD')['SRS ID'].nunique()
-    num_unique = pd.DataFrame({'PRD':group.index, 'SRS ID':group.values})
-    
-    # Get df of rows where PRD exists but SRS does not
-    invalid = num_unique.loc[num_unique["SRS ID"] == 0]
-    invalid = pd.DataFrame(invalid, columns=['PRD', 'SRS ID'])
-    invalid_df = pd.DataFrame()
-    for val in invalid['PRD']:
-        invalid_df = invalid_df.append(trace[trace['PRD'] == val])
-    invalid_df = invalid_df.sort_index()
-        
-    valid = num_unique.loc[num_unique["SRS ID"] != 0]
-    valid = pd.DataFrame(valid, columns=['PRD', 'SRS ID'])
-    for val in valid['PRD']:
-        valid_df = valid_df.append(trace[trace['PRD'] == val])
-    valid_df = valid_df.sort_index()
-
-    invalid_df.insert(0, "Error:",  "PRD does not have SRS")
-    
-    return valid_df, invalid_df
-    
-    
-def _check_srs_has_test(trace, prd_prefix, srs_prefix):
+    trace = tokenized.trace
+
+    # Get number of unique SRS for each PRD, on every row of that PRD
+    num_unique = trace['SRS ID'].groupby(trace['PRD'], observed=True).transform('nunique')
+
+    # Invalid rows are ones where PRD exists but SRS does not
+    return tokenized.has_prd & (num_unique == 0).to_numpy()
+
+
+def _check_srs_has_test(tokenized):
     """check whether each SRS has a test
-       invalid data frame will contain rows where SRSs do not have a test
-    
+       invalid rows are rows where SRSs do not have a test
+
     Args:
-        trace (DataFrame): trace matrix
-        prd_prefix (string): string that PRD starts with
-        srs_prefix (string): string that SRS starts with
-        
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    
-    # Get rid of n/a values
-    valid_df = trace.loc[-trace['SRS ID'].str.startswith(prd_prefix)]
-    trace = trace.loc[trace['SRS ID'].str.startswith(srs_prefix)]
-    
-    for val in trace['Test Name']:
-        val = str(val)
-        if not len(val) > 5:
-            val = np.nan
-
-    # Get number of unique tests for each SRS
-    group = trace.groupby('SRS ID')['Test Name'].nunique()
-    num_unique = pd.DataFrame({'SRS ID':group.index, 'Test Name':group.values})
-    
-    # Get df of rows where SRS exists but test does not
-    invalid = num_unique.loc[num_unique["Test Name"] == 0]
-    invalid = pd.DataFrame(invalid, columns=['SRS ID', 'Test Name'])
-    invalid_df = pd.DataFrame()
-    for val in invalid['SRS ID']:
-        invalid_df = invalid_df.append(trace[trace['SRS ID'] == val])
-    invalid_df = invalid_df.sort_index()
-    
-    # create valid df
-    valid = num_unique.loc[num_unique["Test Name"] != 0]
-    valid = pd.DataFrame(valid, columns=['SRS ID', 'Test Name'])
-    for val in valid['SRS ID']:
-        valid_df = valid_df.append(trace[trace['SRS ID'] == val])
-    valid_df = valid_df.sort_index()
-    
-    invalid_df.insert(0, "Error:", "SRS does not have test")
-
-    return valid_df, invalid_df
-    
-    
-def _check_srs_has_prd(trace, prd_prefix, srs_prefix):
+    trace = tokenized.trace
+
+    # Get number of unique tests for each SRS, on every row of that SRS
+    num_unique = trace['Test Name'].groupby(trace['SRS ID'], observed=True).transform('nunique')
+
+    # Invalid rows are ones where SRS exists but test does not
+    return tokenized.has_srs & (num_unique == 0).to_numpy()
+
+
+def _check_srs_has_prd(tokenized):
     """check whether each SRS has PRD
-       invalid rows will contain rows where SRSs do not have a PRD
-        
+       invalid rows are rows where SRSs do not have a PRD
+
     Args:
-        trace (DataFrame): trace matrix
-        prd_prefix (string): string that PRD starts with
-        srs_prefix (string): string that SRS starts with
-        
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    
-    # Get rid of n/a values
-    valid_df = trace.loc[-trace['SRS ID'].str.startswith(prd_prefix)]
-    trace = trace.loc[trace['SRS ID'].str.startswith(srs_prefix)]
-    
-    for val in trace['PRD']:
-        val=str(val)
-        if not val.startswith(prd_prefix):
-            val = np.nan
-    
-    # Get number of unique PRD for each SRS
-    group = trace.groupby('SRS ID')['PRD'].nunique()
-    num_unique = pd.DataFrame({'SRS ID':group.index, 'PRD':group.values})
-    
-    # Get df of rows where SRS exists but PRD does not
-    invalid = num_unique.loc[num_unique["PRD"] == 0]
-    invalid = pd.DataFrame(invalid, columns=['SRS ID', 'PRD'])
-    invalid_df = pd.DataFrame()
-    for val in invalid['SRS ID']:
-        invalid_df = invalid_df.append(trace[trace['SRS ID'] == val])
-    invalid_df = invalid_df.sort_index()
-    
-    # Create valid df
-    valid = num_unique.loc[num_unique["PRD"] != 0]
-    valid = pd.DataFrame(valid, columns=['SRS ID', 'PRD'])
-    for val in valid['SRS ID']:
-        valid_df = valid_df.append(trace[trace['SRS ID'] == val])
-    valid_df = valid_df.sort_index()
-    
-    invalid_df.insert(0, "Error:", "SRS does not have PRD")
-
-    return valid_df, invalid_df
-    
-
-def _check_prd_ref_by_srs_exists(trace, active_prd_list, prd_prefix, srs_prefix):
+    trace = tokenized.trace
+
+    # Get number of unique PRD for each SRS, on every row of that SRS
+    num_unique = trace['PRD'].groupby(trace['SRS ID'], observed=True).transform('nunique')
+
+    # Invalid rows are ones where SRS exists but PRD does not
+    return tokenized.has_srs & (num_unique == 0).to_numpy()
+
+
+def _check_prd_ref_by_srs_exists(tokenized):
     """check whether all PRD referenced by SRS exist
-       invalid rows will contain rows where PRDs referenced by SRSs do not exist
-        
+       invalid rows are rows where PRDs referenced by SRSs do not exist
+
     Args:
-        trace (DataFrame): trace matrix
-        active_prd_list (list): list of PRDs that are active
-        prd_prefix (string): string that PRD starts with
-        srs_prefix (string): string that SRS starts with
-        
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    
-    trace["PRD_clean"] = trace["PRD"]
-    
-    # function to clean PRD column
-    def _get_req_list(string, prefix):
-        string = string.replace(",", " ")
-        test_list = string.split()
-        req_list = []
-
-        for val in test_list:
-            if val.startswith(prefix) & val[-1].isdigit():
-                req_list.append(val)
-        return req_list
-    
-    
-    trace["PRD_clean"] = trace["PRD_clean"].apply(lambda row: get_req_list(row, prd_prefix))
-    
-    # Valid if PRDs are all in active list
-    trace["valid"] = trace["PRD_clean"].apply(lambda lst: all((True for x in lst if x in active_prd_list)))
-    
-    invalid_df = trace[(trace['valid'] == False) & (trace['PRD_clean'].str.len() != 0)]
-    invalid_df = invalid_df.drop(columns=['PRD_clean', 'valid'])
-    
-    # create valid df by subtracting invalid from trace
-    if (len(invalid_df.index) == 0):
-        valid_df = trace
-        valid_df = valid_df.drop(columns=['PRD_clean', 'valid'])
-    else:
-        valid_df = trace.merge(invalid_df, how='left', indicator=True)
-        valid_df = valid_df[valid_df['_merge'] == 'left_only']
-        valid_df = valid_df.drop(columns=['_merge', 'PRD_clean', 'valid'])
-    
-    valid_df = valid_df.sort_index()
-    
-    invalid_df.insert(0, "Error:",  "PRD referenced by SRS does not exist")
-
-    return valid_df, invalid_df
-    
-    
-def _check_srs_exists(trace, obs_srs_list, prd_prefix, srs_prefix):
+    # Invalid if any of the row's PRDs aren't in the active list
+    prds = tokenized.prd_refs
+    return tokenized.rows_with(prds, ~tokenized.reference.is_active_prd(prds))
+
+
+def _check_srs_exists(tokenized):
     """check whether all SRSs referenced by tests exist
-       invalid rows will contain rows where SRSs referenced by tests do not exist
-        
+       invalid rows are rows where SRSs referenced by tests do not exist
+
     Args:
-        trace (DataFrame): trace matrix
-        obs_srs_list (list): list of SRS that are obsolete
-        prd_prefix (string): string that PRD starts with
-        srs_prefix (string): string that SRS starts with
-        
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    
-    trace["srs_list"] = trace["Test Name"]
-    
-    # function to clean column and put into list
-    def _get_req_list(string, prefix):
-        test_list = string.split()
-        req_list = []
-
-        for val in test_list:
-            if val.startswith(prefix):
-                req_list.append(val)
-        return req_list
-    
-    trace["srs_list"] = trace["Test Name"].apply(lambda row: get_req_list(row, srs_prefix))
-    
-    # Valid if SRS are all not in obsolete list
-    trace["invalid"] = trace["srs_list"].apply(lambda lst: all((True for x in lst if x in obs_srs_list)))
-    
-    # Create valid and invalid dfs
-    valid_df = trace[trace['invalid'] == False]
-    valid_df = valid_df.drop(columns=['srs_list', 'invalid'])
-    
-    invalid_df = trace[trace['invalid'] == True]
-    invalid_df = invalid_df.drop(columns=['srs_list', 'invalid'])
-    
-    invalid_df.insert(0, "Error:", "Test references obsolete SRS")
-    
-    return valid_df, invalid_df
-   
-    
-def _check_prd_exists(trace, active_prd_list, prd_prefix, srs_prefix):
+    # Invalid if any of the row's SRSs are in the obsolete list
+    srss = tokenized.test_srss
+    return tokenized.rows_with(srss, tokenized.reference.is_obsolete_srs(srss))
+
+
+def _check_prd_exists(tokenized):
     """check whether all PRD referenced by tests exist
-       invalid rows will contain rows where PRDs referenced by tests are not active
-        
+       invalid rows are rows where PRDs referenced by tests are not active
+
     Args:
-        trace (DataFrame): trace matrix
-        active_prd_list (list): list of PRDs that are active
-        prd_prefix (string): string that PRD starts with
-        srs_prefix (string): string that SRS starts with
-        
+        tokenized (TokenizedTrace): trace matrix and its requirement IDs
+
     Returns:
-        valid_df (DataFrame): data frame with all valid rows of trace matrix
-        invalid_df (DataFrame): data frame with all invalid rows of trace matrix
+        np.ndarray: mask of the invalid rows
     """
-    
-    trace["prd_list"] = trace["Test Name"]
-    
-    # function to clean column and put into list
-    def _get_req_list(string, prefix):
-        test_list = string.split()
-        req_list = []
-
-        for val in test_list:
-            if val.startswith(prefix) & val[-1].isdigit():
-                req_list.append(val)
-        return req_list
-    
-    trace["prd_list"] = trace["prd_list"].apply(lambda row: get_req_list(row, prd_prefix))
-    
-    # Valid if PRD are all in active list
-    trace["valid"] = trace["prd_list"].apply(lambda lst: all((True for x in lst if x in active_prd_list)))
-    
-    # Create invalid and valid dfs
-    invalid_df = trace[(trace['valid'] == False) & (trace['prd_list'].str.len() != 0)]
-    invalid_df = invalid_df.drop(columns=['prd_list', 'valid'])
-    
-    if (len(invalid_df.index) == 0):
-        valid_df = trace
-        valid_df = valid_df.drop(columns=['prd_list', 'valid'])
-    else:
-        valid_df = trace.merge(invalid_df, how='left', indicator=True)
-        valid_df = valid_df[valid_df['_merge'] == 'left_only']
-        valid_df = valid_df.drop(columns=['_merge', 'prd_list', 'valid'])
-    
-    invalid_df.insert(0, "Error:", "PRD referenced by test does not exist")
-    
-    return valid_df, invalid_df
-  
+    # Invalid if any of the row's PRDs aren't in the active list
+    prds = tokenized.test_prds
+    return tokenized.rows_with(prds, ~tokenized.reference.is_active_prd(prds))
+
+
+# Rules run by `validate_trace()`, in order: (error message, check function).
+# A check takes a TokenizedTrace and returns a boolean mask of the invalid rows.
+VALIDATION_RULES = [
+    ("PRD does not have SRS", _check_prd_has_srs),
+    ("SRS does not have test", _check_srs_has_test),
+    ("SRS does not have PRD", _check_srs_has_prd),
+    ("PRD referenced by SRS does not exist", _check_prd_ref_by_srs_exists),
+    ("Test references obsolete SRS", _check_srs_exists),
+    ("PRD referenced by test does not exist", _check_prd_exists),
+]
+
+
+def _starts_with(column, prefix):
+    """Boolean mask of the values in a column that start with prefix; n/a values are False
+
+    Args:
+        column (pd.Series): column of the trace matrix
+        prefix (string): prefix to look for
+
+    Returns:
+        pd.Series: the mask
+    """
+    return column.astype("string").str.startswith(prefix).fillna(False).astype(bool)
+
+
+def _split_tokens(column, split_commas=False):
+    """Splits a text column on whitespace, one row per word
+
+    Args:
+        column (pd.Series): column of the trace matrix
+        split_commas (bool): if True, also split on commas
+
+    Returns:
+        pd.Series: the words; index is the position of the row each word came from
+    """
+    tokens = pd.Series(column.to_numpy(), dtype=object)
+    if split_commas:
+        tokens = tokens.str.replace(",", " ")
+    return tokens.str.split().explode().dropna()
+
+
+def _get_req_tokens(tokens, prefix, digit_end=False):
+    """Gets the requirement IDs (PRD/SRS) out of the output of `_split_tokens()`
+
+    Args:
+        tokens (pd.Series): words of a column
+        prefix (string): string that the IDs start with
+        digit_end (bool): if True, IDs must also end with a digit
+
+    Returns:
+        pd.Series: the IDs; index is the position of the row each ID came from
+    """
+    keep = tokens.str.startswith(prefix)
+    if digit_end:
+        keep &= tokens.str[-1].str.isdigit()
+    return tokens[keep.fillna(False).astype(bool)]
+
+
+class ReferenceIndex:
+    """Lookup of active PRDs and obsolete SRSs
+
+    Built once per validation. The IDs are kept in hashed pd.Index objects, so checking
+    millions of IDs is a single vectorized lookup instead of a scan of the list per ID.
+    """
+
+    def __init__(self, active_prd_ids, obsolete_srs_ids):
+        """
+        Args:
+            active_prd_ids (list-like): IDs of the active PRDs
+            obsolete_srs_ids (list-like): IDs of the obsolete SRSs
+        """
+        self.active_prd = pd.Index(pd.unique(pd.Series(active_prd_ids, dtype=object).dropna()))
+        self.obsolete_srs = pd.Index(pd.unique(pd.Series(obsolete_srs_ids, dtype=object).dropna()))
+
+    @classmethod
+    def from_files(cls, obs_srs_file_path, active_prd_path):
+        """Loads the index from the Rally obsolete SRS .csv and the active PRD .xlsx
+
+        Args:
+            obs_srs_file_path (str): path to the obsolete SRS .csv
+            active_prd_path (str): path to the active PRD .xlsx
+
+        Returns:
+            ReferenceIndex: the index
+        """
+        obs_srs = pd.read_csv(obs_srs_file_path)
+        active_prd = pd.read_excel(active_prd_path)
+        return cls(active_prd["ID"], obs_srs["Formatted ID"])
+
+    def is_active_prd(self, ids):
+        """Boolean mask of the ids that are active PRDs"""
+        return self.active_prd.get_indexer(ids) != -1
+
+    def is_obsolete_srs(self, ids):
+        """Boolean mask of the ids that are obsolete SRSs"""
+        return self.obsolete_srs.get_indexer(ids) != -1
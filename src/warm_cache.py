@@ -0,0 +1,68 @@
+import os
+import threading
+
+# Loaded inputs kept between runs, by name: (signature, value); None when keeping them is off
+_inputs = None
+_lock = threading.Lock()
+
+
+def enable():
+    """Keeps loaded inputs in memory between runs, for as long as the files they came from don't change
+
+    Used by the trace service (service.py), which runs many jobs in one process. One-shot runs
+    leave it off, so `reuse()` just loads.
+    """
+    global _inputs
+    if _inputs is None:
+        _inputs = {}
+
+
+def is_enabled():
+    """True if loaded inputs are kept between runs"""
+    return _inputs is not None
+
+
+def reuse(name, file_paths, load, *key):
+    """Loads an input, or returns it from an earlier run if the files it's loaded from haven't changed
+
+    Only the latest input of each name is kept, so memory doesn't grow with the number of runs.
+
+    >>> backfill = warm_cache.reuse("backfill_index", [prev_trace_path], lambda: BackfillIndex(...), matrix_type)
+
+    Args:
+        name (str): what's being loaded
+        file_paths (list): files that load() reads (None entries are skipped)
+        load (function): function with no arguments that loads the input
+        *key: anything else that changes what load() returns
+
+    Returns:
+        what load() returns
+    """
+    if _inputs is None:
+        return load()
+
+    signature = (key, [(str(path), file_signature(path)) for path in file_paths if path])
+    with _lock:
+        entry = _inputs.get(name)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+
+    value = load()
+    with _lock:
+        _inputs[name] = (signature, value)
+    return value
+
+
+def names():
+    """Names of the inputs kept in memory"""
+    with _lock:
+        return sorted(_inputs or {})
+
+
+def file_signature(file_path):
+    """Size and modification time of a file, to tell if it has changed (None if it doesn't exist)"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
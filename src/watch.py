@@ -0,0 +1,180 @@
+import time
+
+import pandas as pd
+
+import read_write as rw
+from create_trace import load_as_run_tests, _get_version_path, _process_as_run_tests, _process_automatic_batch
+from folder_manifest import FolderManifest
+
+# Folders of a release's automated tests that are watched, in the order their rows go in the trace
+WATCHED_FOLDERS = ["RestApiTests", "Rx"]
+
+# How often an update lists every folder again, for files that were overwritten in place (see `FolderManifest`)
+FULL_SCAN_SECONDS = 600
+
+
+class TraceWatch:
+    """Trace of one release that's kept up to date with its automated test folders, a file at a time
+
+    The RestApiTests and Rx folders are indexed by a `FolderManifest`, so finding the files that
+    were dropped in, overwritten or deleted since the last update only lists the folders that
+    changed (and every folder every FULL_SCAN_SECONDS). Only those files are parsed; their rows (trace, error log and backfill report) replace
+    the rows they had before, or are added in the place a full run would put them.
+
+    The trace is the same as `create_trace()` (plus backfilling) makes from scratch. The error
+    log has the same rows, in file order rather than grouped by error, like with --stream.
+    """
+
+    def __init__(self, vv_folder_path, as_run_path, version_num, srs_prefix="TC", jobs=1, parser="rows", cache=None,
+                 requirements=None, backfill=None, as_run_df=None, manifest_dir=None):
+        """Makes the trace from scratch (through the parse cache, if given)
+
+        Args:
+            vv_folder_path (str): folder path of root folder
+            as_run_path (str): file path of the manual as-runs .docx
+            version_num (str): version number
+            srs_prefix (str): str that SRS starts with
+            jobs (int): number of worker processes for parsing the automatic test files (0 = one per CPU)
+            parser (str): how the automatic test files are parsed, "rows", "columnar" or "bytes"
+            cache (parse_cache.ParseCache): if given, the first trace only parses files that changed since the last run
+            requirements (requirement_index.RequirementIndex): if given, fills in the SRS ID, PRD and Name columns
+            backfill (create_trace.BackfillIndex): if given, fills in the empty PRD, SRS ID and Name columns from the previous trace
+            as_run_df (pd.DataFrame): the manual as-runs, if already read (see `load_as_run_tests()`)
+            manifest_dir (str): folder to save the folder manifests in, so a restarted watch doesn't list every folder again
+        """
+        self.srs_prefix = srs_prefix
+        self.jobs = jobs
+        self.parser = parser
+        self.requirements = requirements
+        self.backfill = backfill
+
+        # The manual as-runs are a single document, processed once
+        if as_run_df is None:
+            as_run_df = load_as_run_tests(as_run_path, cache)
+        trace, self._manual_invalid = _process_as_run_tests(as_run_df, as_run_path, srs_prefix)
+        self._manual_trace, self._manual_carried = self._fill(trace)
+
+        # Folder -> rows of its files, with the "File Path" they came from, in file order
+        self._rows = {}
+        self._invalid = {}
+        self._carried = {}
+
+        version_path = _get_version_path(vv_folder_path, version_num)
+        self._last_full_scan = time.monotonic()
+        self._manifests = {}
+        for folder in WATCHED_FOLDERS:
+            manifest = FolderManifest(version_path / folder, manifest_dir)
+            manifest.scan()
+            self._manifests[folder] = manifest
+
+            file_list = list(manifest.files)
+            print(f"Total # {folder} .txt files: {len(file_list)}")
+            if cache is not None:
+                # Same cache entry as `rw.read_rest_api_tests()`/`rw.read_rx_tests()`
+                tests_df = cache.read_files(f"{folder}:{manifest.folder_path.resolve()}", file_list,
+                                            lambda files: rw._read_txt_files(manifest.txt_files(files), folder, jobs, parser),
+                                            signatures=manifest.files)
+            else:
+                tests_df = rw._read_txt_files(manifest.txt_files(), folder, jobs, parser)
+            self._replace(folder, tests_df, [])
+
+    def update(self):
+        """Parses the .txt files that were added or changed since the last update, and replaces their rows
+
+        Rows of deleted files are dropped.
+
+        Returns:
+            int: number of files that were added, changed or deleted
+        """
+        full = time.monotonic() - self._last_full_scan >= FULL_SCAN_SECONDS
+        if full:
+            self._last_full_scan = time.monotonic()
+
+        num_changed = 0
+        for folder, manifest in self._manifests.items():
+            changes = manifest.scan(full)
+            changed = changes["added"] + changes["changed"]
+            if len(changed) == 0 and len(changes["removed"]) == 0:
+                continue
+
+            print(f"{folder}: {len(changes['added'])} new, {len(changes['changed'])} changed and {len(changes['removed'])} deleted .txt files")
+            self._replace(folder, rw._read_txt_files(manifest.txt_files(changed), folder, self.jobs, self.parser), changed + changes["removed"])
+            num_changed += len(changed) + len(changes["removed"])
+        return num_changed
+
+    def trace(self):
+        """The whole trace: the manual tests, then the Rest API tests, then the Rx tests"""
+        return rw.concat_frames([self._manual_trace] + [self._rows[folder].drop(columns="File Path") for folder in WATCHED_FOLDERS])
+
+    def invalid_dfs(self):
+        """Rows that didn't go in the trace, as a list of pd.DataFrame's (for `rw.write_error_log()`)"""
+        return self._manual_invalid + [self._invalid[folder] for folder in WATCHED_FOLDERS]
+
+    def carried(self):
+        """Rows that were backfilled from the previous trace (see `BackfillIndex.fill()`), or None if not backfilling"""
+        if self.backfill is None:
+            return None
+        return rw.concat_frames([self._manual_carried] + [self._carried[folder] for folder in WATCHED_FOLDERS], ignore_index=True)
+
+    def _fill(self, trace):
+        """Fills in SRS ID, PRD and Name from the requirement index and the previous trace, if given
+
+        Returns:
+            pd.DataFrame: the filled trace rows
+            pd.DataFrame: the rows that were backfilled, or None if not backfilling
+        """
+        if self.requirements is not None:
+            trace = self.requirements.fill(trace)
+        carried = None
+        if self.backfill is not None:
+            trace, carried = self.backfill.fill(trace)
+        return trace, carried
+
+    def _replace(self, folder, tests_df, stale_files):
+        """Replaces the rows of some of the files of a folder
+
+        Args:
+            folder (str): "RestApiTests" or "Rx"
+            tests_df (pd.DataFrame): newly parsed rows of the added and changed files
+            stale_files (list): files whose old rows are dropped (the changed and deleted files)
+        """
+        if len(tests_df) > 0:
+            trace, invalid_dfs = _process_automatic_batch(tests_df, self.srs_prefix, ["File Path"])
+            trace, carried = self._fill(trace)
+            invalid = rw.concat_frames(invalid_dfs)
+        else:
+            # No rows to add (the files were only deleted, or are empty)
+            trace = invalid = pd.DataFrame(columns=["File Path"])
+            carried = trace if self.backfill is not None else None
+
+        stale = set(str(file_path) for file_path in stale_files)
+        file_order = {str(file_path): i for i, file_path in enumerate(self._manifests[folder].files)}
+        self._rows[folder] = _merge_rows(self._rows.get(folder), trace, stale, file_order)
+        self._invalid[folder] = _merge_rows(self._invalid.get(folder), invalid, stale, file_order)
+        if carried is not None:
+            self._carried[folder] = _merge_rows(self._carried.get(folder), carried, stale, file_order)
+
+
+def _merge_rows(old_df, new_df, stale, file_order):
+    """Swaps the rows of stale files for newly parsed ones, keeping the rows in file order
+
+    Args:
+        old_df (pd.DataFrame): rows so far, with a "File Path" column (None if there are none yet)
+        new_df (pd.DataFrame): rows of the added and changed files
+        stale (set): paths of the files whose rows in old_df are dropped
+        file_order (dict): path -> position of each file
+
+    Returns:
+        pd.DataFrame: the merged rows
+    """
+    if old_df is not None:
+        old_df = old_df[~old_df["File Path"].isin(stale)]
+        if len(new_df) == 0:
+            return old_df.reset_index(drop=True)
+        if len(old_df) > 0:
+            new_df = rw.concat_frames([old_df, new_df], ignore_index=True)
+    df = new_df
+
+    # Stable sort, so the rows of each file stay in the order they were read in
+    order = df["File Path"].map(file_order).to_numpy()
+    return df.iloc[order.argsort(kind="stable")].reset_index(drop=True)
@@ -0,0 +1,42 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts import each other as plain modules from the src folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import benchmark
+
+
+@pytest.fixture(scope="session")
+def corpus_template(tmp_path_factory):
+    """A small synthetic V&V corpus (see `benchmark.generate_corpus()`), generated once"""
+    return benchmark.generate_corpus(tmp_path_factory.mktemp("corpus"), txt_files=6, lines_per_file=20, manual_tests=10,
+                                     prds=50, obsolete_srs=5)
+
+
+@pytest.fixture
+def corpus(corpus_template, tmp_path):
+    """A copy of the synthetic corpus that a test can change"""
+    source = Path(corpus_template["automated_tests_path"]).parent
+    shutil.copytree(source, tmp_path / "corpus")
+    return {name: value.replace(str(source), str(tmp_path / "corpus")) for name, value in corpus_template.items()}
+
+
+def run_params(corpus, tmp_path, **params):
+    """`run.run()` arguments for a corpus, writing the outputs to tmp_path"""
+    import run
+    return run.complete_params({
+        "out_path": str(tmp_path / "trace.csv"),
+        "error_log_path": str(tmp_path / "error_log.csv"),
+        "manual_as_runs": corpus["manual_as_runs"],
+        "obs_srs_path": corpus["obs_srs_path"],
+        "active_prd_path": corpus["active_prd_path"],
+        "automated_tests_path": corpus["automated_tests_path"],
+        "version_num": corpus["version_num"],
+        "srs_prefix": "TC",
+        "cache_dir": str(tmp_path / "cache"),
+        **params
+    })
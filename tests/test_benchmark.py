@@ -0,0 +1,30 @@
+import pytest
+
+import benchmark
+
+
+@pytest.mark.parametrize("base_folder_name", ["RestApiTests", "Rx"])
+def test_txt_metadata_benchmark_reads_the_same_rows(corpus, base_folder_name):
+    stages = benchmark.benchmark_txt_metadata(corpus, base_folder_name)
+    assert [stage["stage"] for stage in stages] == ["per_line", "per_file"]
+    # 6 files x 20 lines
+    assert [stage["rows"] for stage in stages] == [120, 120]
+
+
+def test_coverage_benchmark_times_each_check_on_each_trace():
+    stages = benchmark.benchmark_coverage([1000, 2000])
+    assert [(stage["stage"], stage["rows"]) for stage in stages] == [(name, rows) for rows in [1000, 2000]
+                                                                     for name, _ in benchmark.COVERAGE_CHECKS]
+    assert all(stage["invalid_rows"] > 0 for stage in stages)
+
+
+def test_pipeline_benchmark_reports_the_profiled_stages_of_a_run(corpus, tmp_path):
+    stages = {stage["stage"]: stage for stage in benchmark.run_benchmark(corpus, tmp_path)}
+
+    for name in ["load_inputs/read_as_run_tests", "load_inputs/read_rest_api_tests", "load_inputs/read_rx_tests",
+                 "create_trace", "validate_trace", "write_trace", "write_error_log", "run"]:
+        assert name in stages
+    assert stages["load_inputs/read_rx_tests"]["rows"] == 120
+    assert stages["load_inputs/read_rx_tests"]["files"] == 6
+    # The whole run's rows are the rows of the trace it wrote
+    assert stages["run"]["rows"] == stages["write_trace"]["rows"] == len((tmp_path / "trace.csv").read_text().splitlines()) - 1
@@ -0,0 +1,133 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import create_trace as ct
+
+
+def _expand_trace_rows_by_row(tests_df, srs_prefix, method, application):
+    """The row-by-row expansion that `_expand_trace_rows()` replaced: one dict per TC ID"""
+    new_trace = []
+    for _, row in tests_df.iterrows():
+        test_name = row["Test Name"]
+        for tc in re.findall(f"{srs_prefix}[0-9]+", test_name):
+            new_trace.append({
+                "PRD": np.nan,
+                "SRS ID": np.nan,
+                "Method": method,
+                "Test Name": test_name,
+                "V&V Test Report": row["V&V Test Report"],
+                "TC ID": tc,
+                "Test Status": row["Test Status"],
+                "Release": row["Release"],
+                "Name": np.nan,
+                "Owner": row["Owner"],
+                "Application": row["Application"] if isinstance(application, pd.Series) else application
+            })
+    return pd.DataFrame(new_trace, columns=["PRD", "SRS ID", "Method", "Test Name", "V&V Test Report", "TC ID", "Test Status",
+                                            "Release", "Name", "Owner", "Application"])
+
+
+def _assert_same_rows(df, expected):
+    pd.testing.assert_frame_equal(df.astype(object).reset_index(drop=True), expected.astype(object).reset_index(drop=True))
+
+
+def test_trace_matches_row_by_row_expansion(corpus, monkeypatch):
+    # Check every expansion create_trace() makes on the corpus against the row-by-row one
+    calls = []
+    expand_trace_rows = ct._expand_trace_rows
+
+    def spy(tests_df, srs_prefix, method, application, extra_columns=()):
+        trace = expand_trace_rows(tests_df, srs_prefix, method, application, extra_columns)
+        calls.append((tests_df, srs_prefix, method, application, trace))
+        return trace
+
+    monkeypatch.setattr(ct, "_expand_trace_rows", spy)
+    trace, _ = ct.create_trace(corpus["automated_tests_path"], corpus["manual_as_runs"], corpus["version_num"], "TC")
+
+    assert [call[2] for call in calls] == ["Manual", "Automatic"]
+    expected = []
+    for tests_df, srs_prefix, method, application, rows in calls:
+        expected.append(_expand_trace_rows_by_row(tests_df, srs_prefix, method, application))
+        _assert_same_rows(rows, expected[-1])
+        assert len(rows) > 0
+    _assert_same_rows(trace, pd.concat(expected))
+
+
+@pytest.mark.parametrize("srs_prefix", ["TC", "ESA-"])
+def test_expansion_of_tricky_test_names(srs_prefix):
+    tests_df = pd.DataFrame({
+        "Test Name": [f"{srs_prefix}1", f"{srs_prefix}1_{srs_prefix}22 and {srs_prefix}333", "No IDs", "",
+                      f"x{srs_prefix}4{srs_prefix}5", f"{srs_prefix}"],
+        "Test Status": ["Passed", "Failed", "Passed", "Passed", "Failed", "Passed"],
+        "Release": "1.0",
+        "V&V Test Report": "ER1 v1",
+        "Owner": ["a", "b", "c", "d", "e", "f"],
+        "Application": ["App1", "App2", "App3", "App4", "App5", "App6"],
+    })
+
+    for application in ["Sapphire", tests_df["Application"]]:
+        rows = ct._expand_trace_rows(tests_df, srs_prefix, "Automatic", application)
+        _assert_same_rows(rows, _expand_trace_rows_by_row(tests_df, srs_prefix, "Automatic", application))
+    assert list(rows["TC ID"]) == [f"{srs_prefix}{n}" for n in [1, 1, 22, 333, 4, 5]]
+
+
+def _sorted_rows(dfs):
+    """Rows of some dataframes, in a fixed order, for comparing rows that come out in a different order"""
+    df = pd.concat(dfs, ignore_index=True).astype(object)
+    df = df.where(df.notna(), "")
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_streamed_batches_match_create_trace(corpus):
+    inputs = (corpus["automated_tests_path"], corpus["manual_as_runs"], corpus["version_num"], "TC")
+    trace, invalid_dfs = ct.create_trace(*inputs)
+
+    batches = list(ct.iter_trace(*inputs, batch_files=4))
+    # The manual as-runs, then 2 batches of 6 files for each of RestApiTests and Rx
+    assert len(batches) == 5
+
+    _assert_same_rows(pd.concat([batch_trace for batch_trace, _ in batches]), trace)
+    # Same invalid rows, but batch by batch instead of grouped by error
+    streamed_invalid = [df for _, batch_invalid in batches for df in batch_invalid]
+    assert sum(len(df) for df in invalid_dfs) > 0
+    pd.testing.assert_frame_equal(_sorted_rows(streamed_invalid), _sorted_rows(invalid_dfs))
+
+
+def _merge_backfill(trace, prev_trace):
+    """Backfill with a left merge on the previous trace per key and column, like before `BackfillIndex`"""
+    trace = trace.copy()
+    for key in ct.BACKFILL_KEYS:
+        for column in ct.BACKFILL_COLUMNS:
+            # First non-empty value of each key
+            first = prev_trace[[key, column]].dropna().drop_duplicates(key)
+            merged = trace[[key]].merge(first, on=key, how="left")
+            trace[column] = trace[column].astype(object).fillna(pd.Series(merged[column].to_numpy(), index=trace.index))
+    return trace
+
+
+def test_backfill_index_matches_merge(corpus):
+    trace, _ = ct.create_trace(corpus["automated_tests_path"], corpus["manual_as_runs"], corpus["version_num"], "TC")
+    rng = np.random.default_rng(0)
+
+    # Previous trace: most of the rows, shuffled, with values for some of them (some keys more than once)
+    prev_trace = trace.sample(frac=0.8, random_state=0).astype(object).reset_index(drop=True)
+    prev_trace["TC ID"] = prev_trace["TC ID"].where(rng.random(len(prev_trace)) > 0.3)
+    for column in ct.BACKFILL_COLUMNS:
+        values = pd.Series([f"{column} {n}" for n in rng.integers(0, 20, len(prev_trace))], dtype=object)
+        prev_trace[column] = values.where(rng.random(len(prev_trace)) > 0.4)
+    # Some cells of the new trace already have values, which are kept
+    trace = trace.astype(object)
+    trace.loc[trace.index[::7], "PRD"] = "US0"
+
+    filled, report = ct.BackfillIndex(prev_trace).fill(trace)
+    expected = _merge_backfill(trace, prev_trace)
+
+    for column in ct.BACKFILL_COLUMNS:
+        assert filled[column].tolist() == expected[column].tolist(), column
+    assert (filled.loc[trace.index[::7], "PRD"] == "US0").all()
+    changed = (filled[ct.BACKFILL_COLUMNS].astype(object).fillna("") != trace[ct.BACKFILL_COLUMNS].astype(object).fillna("")).any(axis=1)
+    assert report.index.tolist() == trace.index[changed].tolist()
+    assert set(report["Matched On"]) == set(ct.BACKFILL_KEYS)
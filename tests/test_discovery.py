@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pandas as pd
+
+import discovery
+import read_write as rw
+
+
+def test_walker_splits_release_rc_and_owner(tmp_path):
+    folder = tmp_path / "ER2228014 v51" / "1.33.0" / "Rx"
+    for sub in ["RC1/alice", "RC2/bob/deeper", "__MACOSX/RC1/alice"]:
+        (folder / sub).mkdir(parents=True)
+        (folder / sub / "tests.txt").write_text("TC1 test|PASSED\n")
+    (folder / "top.txt").write_text("TC2 test|FAILED\n")
+
+    txt_files = {txt_file.path.relative_to(folder).as_posix(): txt_file for txt_file in discovery.find_txt_files(folder)}
+
+    assert sorted(txt_files) == ["RC1/alice/tests.txt", "RC2/bob/deeper/tests.txt", "top.txt"]
+    assert txt_files["RC2/bob/deeper/tests.txt"][1:5] == ("ER2228014 v51", "1.33.0", "RC2", "bob")
+    assert txt_files["top.txt"][1:5] == ("ER2228014 v51", "1.33.0", None, None)
+    for txt_file in txt_files.values():
+        assert discovery.describe_txt_file(txt_file.path, folder) == txt_file
+
+
+def test_parsers_use_the_walker_metadata(tmp_path):
+    folder = tmp_path / "ER2228014v53" / "1.33.0" / "RestApiTests"
+    (folder / "RC1" / "alice").mkdir(parents=True)
+    (folder / "RC1" / "alice" / "tests.txt").write_text("TC1 test|PASSED\nTC2 test|failed\n")
+    txt_files = discovery.find_txt_files(folder)
+
+    for parser in rw.TXT_PARSERS:
+        df = rw._read_txt_shard(txt_files, "RestApiTests", parser)
+        # Plain paths give the same rows
+        pd.testing.assert_frame_equal(df, rw._read_txt_shard([str(txt_file.path) for txt_file in txt_files], "RestApiTests", parser))
+        assert df[["Release", "V&V Test Report", "RC", "Owner"]].astype(str).drop_duplicates().values.tolist() == \
+            [["1.33.0", "2228014 v53", "RC1", "alice"]]
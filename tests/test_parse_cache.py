@@ -0,0 +1,175 @@
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import read_write as rw
+import run
+import parse_cache
+from conftest import run_params
+from parse_cache import ParseCache
+
+
+def test_read_files_with_no_files_on_cold_cache(tmp_path):
+    cache = ParseCache(tmp_path / "cache")
+    parsed = []
+
+    def parse_files(files):
+        parsed.append(list(files))
+        return pd.DataFrame({"Test Name": [], "File Path": []})
+
+    for _ in range(2):
+        df = cache.read_files("Rx:empty", [], parse_files)
+        assert df is not None and len(df) == 0
+    # Parsed once, then taken from the cache
+    assert parsed == [[]]
+
+
+def test_empty_folder_gives_same_trace_with_and_without_cache(corpus, tmp_path):
+    rx_folder = Path(corpus["automated_tests_path"]) / corpus["version_num"] / "Rx"
+    shutil.rmtree(rx_folder)
+    rx_folder.mkdir()
+
+    outputs = []
+    for no_cache in [True, False, False]:
+        out_dir = tmp_path / f"out_{len(outputs)}"
+        out_dir.mkdir()
+        summaries = run.run(run_params(corpus, out_dir, no_cache=no_cache, cache_dir=str(tmp_path / "cache")))
+        assert summaries[0]["Status"] == "OK"
+        outputs.append(rw.read_trace_file(out_dir / "trace.csv"))
+    assert outputs[0].equals(outputs[1]) and outputs[0].equals(outputs[2])
+
+
+def test_release_without_txt_files_with_and_without_cache(corpus, tmp_path):
+    version_path = Path(corpus["automated_tests_path"]) / corpus["version_num"]
+    shutil.rmtree(version_path / "RestApiTests")
+    (version_path / "RestApiTests").mkdir()
+    shutil.rmtree(version_path / "Rx")
+
+    outputs = []
+    for no_cache in [True, False, False]:
+        out_dir = tmp_path / f"out_{len(outputs)}"
+        out_dir.mkdir()
+        summaries = run.run(run_params(corpus, out_dir, no_cache=no_cache, cache_dir=str(tmp_path / "cache")))
+        assert summaries[0]["Status"] == "OK"
+        trace = rw.read_trace_file(out_dir / "trace.csv")
+        assert (trace["Method"] == "Manual").all()
+        outputs.append(trace)
+    assert outputs[0].equals(outputs[1]) and outputs[0].equals(outputs[2])
+
+
+def _parse_lines(parsed):
+    """Parser of a group of files, one row per line, that records which files it parsed"""
+    def parse_files(files):
+        parsed.extend(str(file_path) for file_path in files)
+        rows = [(line, str(file_path)) for file_path in files for line in Path(file_path).read_text().splitlines()]
+        return pd.DataFrame(rows, columns=["Test Name", "File Path"])
+    return parse_files
+
+
+def _write_group(folder, num_files):
+    folder.mkdir()
+    file_list = []
+    for i in range(num_files):
+        file_path = folder / f"{i:03d}.txt"
+        file_path.write_text(f"Test_{i}_a\nTest_{i}_b\n")
+        file_list.append(file_path)
+    return file_list
+
+
+def test_read_files_only_rewrites_the_entries_of_changed_files(tmp_path, monkeypatch):
+    file_list = _write_group(tmp_path / "files", 40)
+    cache = ParseCache(tmp_path / "cache")
+    parsed = []
+    expected = _parse_lines([])(file_list)
+    pd.testing.assert_frame_equal(cache.read_files("group", file_list, _parse_lines(parsed)), expected)
+    assert len(parsed) == 40
+
+    stored = []
+    store = ParseCache._store
+    monkeypatch.setattr(ParseCache, "_store", lambda self, key, *args, **kwargs: (stored.append(key), store(self, key, *args, **kwargs)))
+
+    # One file changed, one deleted and one added
+    file_list[3].write_text("Test_3_changed\n")
+    file_list[7].unlink()
+    (tmp_path / "files" / "new.txt").write_text("Test_new\n")
+    file_list = sorted((tmp_path / "files").glob("*.txt"))
+    parsed.clear()
+
+    df = ParseCache(tmp_path / "cache").read_files("group", file_list, _parse_lines(parsed))
+    pd.testing.assert_frame_equal(df, _parse_lines([])(file_list))
+    assert sorted(parsed) == sorted([str(file_list[3]), str(tmp_path / "files" / "new.txt")])
+    # Only the entries of the changed, deleted and new files were written again
+    assert 0 < len(stored) <= 3
+    assert all(key.startswith("files:group:") for key in stored)
+
+    # Only deleted
+    file_list[10].unlink()
+    file_list = sorted((tmp_path / "files").glob("*.txt"))
+    parsed.clear()
+    stored.clear()
+    df = ParseCache(tmp_path / "cache").read_files("group", file_list, _parse_lines(parsed))
+    pd.testing.assert_frame_equal(df, _parse_lines([])(file_list))
+    assert parsed == [] and len(stored) <= 1
+
+
+def test_cache_hits_dont_save_the_index_each_time(tmp_path, monkeypatch):
+    file_list = _write_group(tmp_path / "files", 40)
+    docx_path = tmp_path / "as_run.docx"
+    docx_path.write_text("as-runs")
+    cache = ParseCache(tmp_path / "cache")
+    cache.read_files("group", file_list, _parse_lines([]))
+    cache.read_file(docx_path, lambda file_path: pd.DataFrame({"Test Name": ["Manual"]}))
+
+    saves = []
+    save_index = ParseCache._save_index
+    monkeypatch.setattr(ParseCache, "_save_index", lambda self, *args, **kwargs: (saves.append(args), save_index(self, *args, **kwargs)))
+    cache = ParseCache(tmp_path / "cache")
+    cache.read_file(docx_path, lambda file_path: pytest.fail("parsed again"))
+    assert saves == []
+    cache.read_files("group", file_list, lambda files: pytest.fail("parsed again"))
+
+    # The last uses of all the entries are saved in one go
+    assert len(saves) == 1
+    entries = json.loads((tmp_path / "cache" / "index.json").read_text())["entries"]
+    docx_key = f"file:{docx_path.resolve()}"
+    assert entries[docx_key]["last_used"] == cache._index[docx_key]["last_used"]
+
+
+def test_cache_from_another_version_is_emptied(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    old_cache = ParseCache(cache_dir)
+    # Version 1 index: just the entries
+    old_key = "files:Rx:/some/folder"
+    old_cache._data_path(old_key).write_bytes(b"old data")
+    (cache_dir / "index.json").write_text(json.dumps({old_key: {"files": {}, "size": 8, "last_used": 0}}))
+    (cache_dir / "requirement_index.pkl").write_bytes(b"not the parse cache's")
+
+    cache = ParseCache(cache_dir)
+    assert cache._index == {}
+    assert not old_cache._data_path(old_key).exists()
+    assert (cache_dir / "requirement_index.pkl").exists()
+    assert json.loads((cache_dir / "index.json").read_text()) == {"version": parse_cache.CACHE_VERSION, "entries": {}}
+
+
+def test_profile_counts_the_input_files_taken_from_the_cache(corpus, tmp_path):
+    reports = []
+    for i in range(2):
+        out_dir = tmp_path / f"out_{i}"
+        out_dir.mkdir()
+        params = run_params(corpus, out_dir, profile=True, cache_dir=str(tmp_path / "cache"))
+        run.run(params)
+        with open(f"{params['out_path']}.profile.json") as f:
+            reports.append({record["stage"]: record for record in json.load(f)["stages"]})
+
+    cold, warm = reports
+    for stage in ["load_inputs/read_rest_api_tests", "load_inputs/read_rx_tests"]:
+        assert cold[stage]["files"] == 6 and cold[stage]["cached_files"] == 0
+        # Same files, now served from the cache
+        assert warm[stage]["files"] == 0 and warm[stage]["cached_files"] == 6
+        assert warm[stage]["cached_bytes"] == cold[stage]["bytes_read"] > 0
+    assert warm["load_inputs"]["cached_files"] == cold["load_inputs"]["files"]
+    assert warm["load_inputs"]["files"] == 0
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import profiling
+
+
+def _spin(seconds):
+    with profiling.stage("spin"):
+        start = time.thread_time()
+        while time.thread_time() - start < seconds:
+            pass
+
+
+def test_cpu_time_of_concurrent_stages_is_not_double_counted():
+    profiler = profiling.start()
+    try:
+        with profiling.stage("outer"):
+            with ThreadPoolExecutor(2) as executor:
+                futures = [profiling.submit(executor, _spin, 0.2) for _ in range(2)]
+                [future.result() for future in futures]
+    finally:
+        profiling.stop()
+
+    cpu = {record.name: record.cpu_seconds for record in profiler.records}
+    # Each spin only counts its own thread; the outer stage counts both
+    assert all(0.2 <= record.cpu_seconds < 0.3 for record in profiler.records if record.name == "outer/spin")
+    assert 0.4 <= cpu["outer"] < 0.6
+
+
+def test_peak_memory_is_per_stage():
+    profiler = profiling.Profiler()
+    if not profiler._can_reset_peak:
+        pytest.skip("peak memory can only be reset on Linux")
+
+    with profiler.stage("big") as big:
+        array = np.ones(50_000_000) # 400 MB
+        del array
+    with profiler.stage("small") as small:
+        pass
+
+    assert big.peak_rss_mb - small.peak_rss_mb > 300
+    assert small.process_peak_rss_mb >= big.peak_rss_mb
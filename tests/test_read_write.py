@@ -0,0 +1,215 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from docx import Document
+
+import read_write as rw
+
+# Lines the automatic test .txt files aren't supposed to have, but sometimes do
+MALFORMED_FILES = {
+    "crlf.txt": b"com.philips.sapphire.systemintegrationtests.TestA|PASSED\r\nTestB|failed\r\n",
+    "blank_lines.txt": b"TestA|PASSED\n\n\nTestB|FAILED\n",
+    "short_lines.txt": b"A\n|\n|FAILED\nB|\n",
+    "multiple_bars.txt": b"Test|With|Bars|PASSED\nTestC|PASSED\n",
+    "no_bar.txt": b"TestWithoutStatus\nTestD|PASSED\nAnother line without a status\n",
+    "non_ascii.txt": "Tëst·Ünïcode|PASSED\nTestE|ÉCHOUÉ\n".encode(),
+    "package_mid_line.txt": b"Prefix com.philips.sapphire.systemintegrationtests.TestF|PASSED\n",
+    "no_trailing_newline.txt": b"TestG|PASSED\nTestH|FAILED",
+    "lone_cr.txt": b"TestI|PASSED\rTestJ|FAILED\n",
+    "empty.txt": b"",
+}
+
+
+def _write_files(root, base_folder_name):
+    folder = Path(root) / "ER2228014 v51" / "1.0" / base_folder_name / "RC1" / "owner"
+    folder.mkdir(parents=True)
+    file_list = []
+    for file_name, contents in MALFORMED_FILES.items():
+        file_path = folder / file_name
+        file_path.write_bytes(contents)
+        file_list.append(str(file_path))
+    return file_list
+
+
+@pytest.mark.parametrize("base_folder_name", ["RestApiTests", "Rx"])
+def test_parsers_agree_on_malformed_files(tmp_path, base_folder_name):
+    file_list = _write_files(tmp_path, base_folder_name)
+
+    dfs = {parser: rw._read_txt_shard(file_list, base_folder_name, parser) for parser in rw.TXT_PARSERS}
+
+    expected = dfs["rows"]
+    for parser, df in dfs.items():
+        pd.testing.assert_frame_equal(df.astype(object), expected.astype(object), obj=f"{parser} parser")
+
+    # Lines without a '|' are kept with a missing status
+    no_bar = expected[expected["Test Name"].isin(["TestWithoutStatus", "Another line without a status"])]
+    assert len(no_bar) == 2 and no_bar["Test Status"].isna().all()
+
+
+def test_bytes_parser_falls_back_to_columnar_without_pyarrow(tmp_path, monkeypatch):
+    file_list = _write_files(tmp_path, "Rx")
+    monkeypatch.setattr(rw, "_arrow_string_dtype", lambda: None)
+
+    df = rw._read_txt_shard(file_list, "Rx", "bytes")
+
+    pd.testing.assert_frame_equal(df, rw._read_txt_shard(file_list, "Rx", "columnar"))
+
+
+@pytest.mark.parametrize("file_name", ["error_log.txt", "error_log.xlsx", "error_log"])
+def test_error_log_with_unsupported_extension_is_an_error(tmp_path, file_name):
+    with pytest.raises(ValueError, match="Unsupported file extension"):
+        rw.ErrorLogWriter(tmp_path / file_name)
+    assert not (tmp_path / file_name).exists()
+
+    # Unless the format is given
+    with rw.ErrorLogWriter(tmp_path / file_name, fmt="csv") as writer:
+        writer.write(pd.DataFrame({"Error": ["Test error"]}))
+    assert (tmp_path / file_name).read_text().splitlines()[1].startswith("Test error")
+
+
+def _write_as_runs(file_path):
+    """Manual as-runs .docx with a merged cell, an empty cell and a blank test name"""
+    document = Document()
+    tests = [
+        ("Plain test", "Passed", "alice"),
+        ("Merged cells", "Failed", "bob"),
+        ("Empty cell", "Passed", ""),
+        ("", "Blocked", "carol"), # blank test name
+    ]
+    for i, (name, status, owner) in enumerate(tests):
+        document.add_paragraph(name)
+        document.add_paragraph(f"Run ID: {100 + i}")
+        table = document.add_table(rows=3, cols=4)
+        table.cell(0, 0).text = "Status:"
+        table.cell(0, 1).text = status
+        table.cell(1, 1).text = owner
+        table.cell(1, 2).text = "1. Product"
+        table.cell(1, 3).text = "Sapphire"
+        table.cell(2, 1).text = "1.33.0.1"
+        if name == "Merged cells":
+            # Owner merged down into the Release cell, and a heading merged across
+            table.cell(1, 1).merge(table.cell(2, 1))
+            table.cell(0, 2).merge(table.cell(0, 3)).text = "Notes"
+        document.add_paragraph("Test steps and results")
+    document.save(file_path)
+
+
+def _read_as_runs_with_python_docx(file_path):
+    """`rw.read_as_run_tests()` as it was with python-docx, before the XML was streamed"""
+    document = Document(file_path)
+    test_names = []
+    run_ids = []
+    for i, paragraph in enumerate(document.paragraphs):
+        if "Run ID:" in paragraph.text:
+            test_names.append(document.paragraphs[i - 1].text)
+            run_ids.append(int(paragraph.text.replace("Run ID:", "")))
+
+    data = []
+    entry_idx = 0
+    for table in document.tables:
+        if table.cell(0, 0).text == "Status:" and table.cell(1, 2).text == "1. Product":
+            data.append({
+                "Test Name": test_names[entry_idx],
+                "Run ID": run_ids[entry_idx],
+                "Test Status": table.cell(0, 1).text,
+                "Release": table.cell(2, 1).text,
+                "Application": table.cell(1, 3).text,
+                "Owner": table.cell(1, 1).text
+            })
+            entry_idx += 1
+    return document, data
+
+
+def test_streamed_as_runs_match_python_docx(tmp_path):
+    file_path = tmp_path / "ER2228014 v51 ATT1 Manual As-Runs.docx"
+    _write_as_runs(file_path)
+    document, expected = _read_as_runs_with_python_docx(file_path)
+
+    # Every paragraph and table cell reads the same
+    body = list(rw._iter_docx_body(file_path))
+    assert [content for element_type, content in body if element_type == "p"] == [p.text for p in document.paragraphs]
+    assert [content for element_type, content in body if element_type == "tbl"] == [
+        [[table.cell(row, col).text for col in range(len(table.columns))] for row in range(len(table.rows))]
+        for table in document.tables
+    ]
+
+    rows = rw.read_as_run_tests(file_path, return_df=False)
+    assert rows == [dict(row, **{"V&V Test Report": "2228014 v51"}) for row in expected]
+    assert [row["Test Name"] for row in rows] == ["Plain test", "Merged cells", "Empty cell", ""]
+    assert rows[1]["Owner"] == rows[1]["Release"] == "bob\n1.33.0.1"
+    assert rows[2]["Owner"] == ""
+
+
+def _trace():
+    """Trace rows with blank cells, numbers as text, and a Test Name pandas reads as n/a by default"""
+    trace = pd.DataFrame([
+        ("US1", "TC1", "Manual", "Login works", "2228014 v51", "TC1", "Passed", "1.33.0.1", "Login", "alice", "Sapphire"),
+        (None, None, "Automatic", "NA", "2228014 v51", "TC2", "Failed", "1.10", None, "bob", "Rest API"),
+        ("US2, US3", "TC3", "Automatic", "Tëst ünicode, with comma", "2228014 v51", "TC3", "Passed", "1.10", "Ünicode", "bob", "Rx"),
+        ("US4", None, "Manual", "007", "2228014 v52", "TC4", "Blocked", "1.33.0.2", None, None, "Sapphire"),
+    ], columns=rw.TRACE_COLUMNS)
+    return rw.apply_schema(trace)
+
+
+@pytest.mark.parametrize("file_name", ["trace.csv", "trace.csv.gz", "trace.parquet", "trace.feather", "trace.xlsx"])
+def test_trace_round_trip(tmp_path, file_name):
+    if file_name.endswith((".parquet", ".feather")):
+        pytest.importorskip("pyarrow")
+    trace = _trace()
+
+    # Written in two batches, whose categorical columns have different categories
+    with rw.TraceWriter(tmp_path / file_name) as writer:
+        writer.write(rw.apply_schema(trace.iloc[:2].astype(object)))
+        writer.write(rw.apply_schema(trace.iloc[2:].astype(object)))
+    df = rw.read_trace_file(tmp_path / file_name)
+
+    assert list(df.columns) == rw.TRACE_COLUMNS
+    for column in rw.CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            assert isinstance(df[column].dtype, pd.CategoricalDtype), column
+    pd.testing.assert_frame_equal(df.astype(object).where(df.notna(), None),
+                                  trace.astype(object).where(trace.notna(), None))
+
+
+def _write_trace_workbook(file_path, rows):
+    """DHF-style trace workbook: title in A1, headers in row 3, rows from row 4"""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "CO Trace Matrix"
+    sheet.append(["CO Trace Matrix"])
+    sheet.append([])
+    sheet.append(["PRD", "SRS ID", "Name", "TC ID", "Test Name"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file_path)
+
+
+def test_trace_sidecar_is_used_until_the_workbook_changes(tmp_path, monkeypatch):
+    import openpyxl
+    file_path = tmp_path / "trace.xlsx"
+    _write_trace_workbook(file_path, [("US1", "TC1", "Login", "TC1", "Login works")])
+
+    first = rw.read_trace(file_path, "CO", sidecar=True)
+    sidecar_path = rw._trace_sidecar_path(file_path, "CO")
+    assert sidecar_path.exists()
+
+    # While the sidecar is newer than the workbook, the workbook isn't opened
+    load_workbook = openpyxl.load_workbook
+    monkeypatch.setattr(openpyxl, "load_workbook", lambda *args, **kwargs: pytest.fail("workbook was parsed"))
+    pd.testing.assert_frame_equal(rw.read_trace(file_path, "CO", sidecar=True), first)
+    monkeypatch.setattr(openpyxl, "load_workbook", load_workbook)
+
+    # Once the workbook is saved again, it's parsed and the sidecar is replaced
+    _write_trace_workbook(file_path, [("US2", "TC2", "Logout", "TC2", "Logout works")])
+    # (make sure the sidecar looks older, on file systems with coarse modification times)
+    stale_ns = os.stat(file_path).st_mtime_ns - 1_000_000_000
+    os.utime(sidecar_path, ns=(stale_ns, stale_ns))
+    second = rw.read_trace(file_path, "CO", sidecar=True)
+    assert second["PRD"].tolist() == ["US2"]
+    assert sidecar_path.stat().st_mtime_ns >= os.stat(file_path).st_mtime_ns
+
+    monkeypatch.setattr(openpyxl, "load_workbook", lambda *args, **kwargs: pytest.fail("workbook was parsed"))
+    pd.testing.assert_frame_equal(rw.read_trace(file_path, "CO", sidecar=True), second)
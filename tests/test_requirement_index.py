@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+import create_trace as ct
+import requirement_index as ri
+
+
+def _write_exports(folder, seed=0):
+    """Rally test case export, SRS sheet and PRD sheet, with repeated IDs and blank cells"""
+    rng = np.random.default_rng(seed)
+    rally = pd.DataFrame({
+        ri.RALLY_TC_COLUMN: [f"TC{n}" for n in rng.integers(1, 250, 300)],
+        ri.RALLY_SRS_COLUMN: [f"ESA-{n}: SRS {n}" if n % 9 else None for n in rng.integers(1, 80, 300)],
+    })
+    srs = pd.DataFrame({
+        ri.SRS_ID_COLUMN: [f"ESA-{n}" for n in rng.integers(1, 80, 100)],
+        ri.SRS_PRD_COLUMN: [f"US{n}" if n % 7 else None for n in rng.integers(1, 50, 100)],
+        ri.SRS_NAME_COLUMN: [f"SRS name {n}" if n % 3 else None for n in range(100)],
+    })
+    prd = pd.DataFrame({
+        ri.PRD_ID_COLUMN: [f"US{n}" for n in range(1, 50)],
+        ri.PRD_NAME_COLUMN: [f"PRD name {n}" for n in range(1, 50)],
+    })
+    paths = (folder / "rally.csv", folder / "SRS.xlsx", folder / "PRD.xlsx")
+    rally.to_csv(paths[0], index=False)
+    srs.to_excel(paths[1], index=False)
+    prd.to_excel(paths[2], index=False)
+    return paths, rally, srs, prd
+
+
+def _merge_fill(trace, rally, srs, prd):
+    """Fills SRS ID, PRD and Name with left merges on the exports, like before `RequirementIndex`"""
+    def fill(trace, column, key, mapping):
+        # First non-empty value of each key
+        mapping = mapping.dropna().drop_duplicates("key")
+        merged = trace[[key]].merge(mapping, left_on=key, right_on="key", how="left")
+        trace[column] = trace[column].astype(object).fillna(pd.Series(merged["value"].to_numpy(), index=trace.index))
+
+    trace = trace.copy()
+    srs_ids = rally[ri.RALLY_SRS_COLUMN].str.split(":").str[0].str.strip()
+    fill(trace, "SRS ID", "TC ID", pd.DataFrame({"key": rally[ri.RALLY_TC_COLUMN], "value": srs_ids}))
+    fill(trace, "PRD", "SRS ID", pd.DataFrame({"key": srs[ri.SRS_ID_COLUMN], "value": srs[ri.SRS_PRD_COLUMN]}))
+    names = pd.concat([
+        pd.DataFrame({"key": srs[ri.SRS_ID_COLUMN], "value": srs[ri.SRS_NAME_COLUMN]}).dropna().drop_duplicates("key"),
+        pd.DataFrame({"key": prd[ri.PRD_ID_COLUMN], "value": prd[ri.PRD_NAME_COLUMN]}),
+    ])
+    fill(trace, "Name", "SRS ID", names)
+    fill(trace, "Name", "PRD", names)
+    return trace
+
+
+def test_fill_matches_merge(corpus, tmp_path):
+    (rally_path, srs_path, prd_path), rally, srs, prd = _write_exports(tmp_path)
+    trace, _ = ct.create_trace(corpus["automated_tests_path"], corpus["manual_as_runs"], corpus["version_num"], "TC")
+    # Cells that already have a value are kept
+    trace = trace.astype(object)
+    trace.loc[trace.index[::5], "SRS ID"] = "ESA-1000"
+
+    filled = ri.RequirementIndex.from_files(rally_path, srs_path, prd_path).fill(trace)
+    expected = _merge_fill(trace, rally, srs, prd)
+
+    for column in ["PRD", "SRS ID", "Name"]:
+        assert filled[column].tolist() == expected[column].tolist(), column
+        assert filled[column].notna().any() and filled[column].isna().any(), column
+    assert (filled.loc[trace.index[::5], "SRS ID"] == "ESA-1000").all()
+
+
+def test_cached_index_is_rebuilt_when_an_export_changes(tmp_path, capsys):
+    (rally_path, srs_path, prd_path), _, _, _ = _write_exports(tmp_path)
+    cache_path = tmp_path / "cache" / "requirement_index.pkl"
+
+    first = ri.RequirementIndex.from_files(rally_path, srs_path, prd_path, cache_path)
+    assert "Using cached" not in capsys.readouterr().out
+    cached = ri.RequirementIndex.from_files(rally_path, srs_path, prd_path, cache_path)
+    assert "Using cached" in capsys.readouterr().out
+    assert cached.srs_to_prd.equals(first.srs_to_prd)
+
+    # A new SRS sheet changes the export's signature, so the index is built from it again
+    pd.DataFrame({ri.SRS_ID_COLUMN: ["ESA-1"], ri.SRS_PRD_COLUMN: ["US99"], ri.SRS_NAME_COLUMN: ["New"]}).to_excel(srs_path, index=False)
+    rebuilt = ri.RequirementIndex.from_files(rally_path, srs_path, prd_path, cache_path)
+    assert "Using cached" not in capsys.readouterr().out
+    assert rebuilt.srs_to_prd.to_dict() == {"ESA-1": "US99"}
+    assert rebuilt.sources[str(srs_path.resolve())] == ri.file_signature(srs_path)
+
+    # And the rebuilt index is what's cached now
+    assert ri.RequirementIndex.from_files(rally_path, srs_path, prd_path, cache_path).srs_to_prd.to_dict() == {"ESA-1": "US99"}
+    assert "Using cached" in capsys.readouterr().out
@@ -0,0 +1,62 @@
+import json
+import shutil
+import threading
+from pathlib import Path
+
+import run
+from conftest import run_params
+
+
+def test_batch_with_jobs_on_cold_cache(corpus, tmp_path):
+    vv_folder = Path(corpus["automated_tests_path"])
+    versions = [corpus["version_num"], "1.34.0", "1.35.0"]
+    for version in versions[1:]:
+        shutil.copytree(vv_folder / corpus["version_num"], vv_folder / version)
+
+    summaries = run.run(run_params(corpus, tmp_path, version_num=versions, jobs=3))
+
+    assert [summary["Status"] for summary in summaries] == ["OK"] * 3
+    # Every worker's entries made it into the shared index
+    entries = json.loads((tmp_path / "cache" / "index.json").read_text())["entries"]
+    for version in versions:
+        for folder in ["RestApiTests", "Rx"]:
+            folder_path = vv_folder / version / folder
+            prefix = f"files:{folder}:{folder_path.resolve()}:"
+            cached_files = [file_path for key, entry in entries.items() if key.startswith(prefix) for file_path in entry["files"]]
+            assert sorted(cached_files) == sorted(str(file_path) for file_path in folder_path.rglob("*.txt"))
+    assert not list((tmp_path / "cache").glob(".tmp_*"))
+
+
+def test_validate_loads_the_reference_lists_with_the_other_inputs(corpus, tmp_path, monkeypatch):
+    threads = {}
+    load_reference_index = run._load_reference_index
+
+    def spy(params):
+        threads["reference"] = threading.current_thread()
+        return load_reference_index(params)
+
+    monkeypatch.setattr(run, "_load_reference_index", spy)
+    (tmp_path / "plain").mkdir()
+    (tmp_path / "validated").mkdir()
+    unvalidated = run.run(run_params(corpus, tmp_path / "plain", no_cache=True))[0]
+    assert "reference" not in threads
+
+    validated = run.run(run_params(corpus, tmp_path / "validated", no_cache=True, validate=True))[0]
+    # Loaded by the pool that loads the other inputs
+    assert threads["reference"] is not threading.main_thread()
+    assert validated["Trace Rows"] < unvalidated["Trace Rows"]
+    assert validated["Trace Rows"] + validated["Error Rows"] == unvalidated["Trace Rows"] + unvalidated["Error Rows"]
+
+
+def test_stream_writes_the_same_trace_and_error_log_rows(corpus, tmp_path):
+    (tmp_path / "full").mkdir()
+    (tmp_path / "streamed").mkdir()
+    run.run(run_params(corpus, tmp_path / "full", no_cache=True))
+    run.run(run_params(corpus, tmp_path / "streamed", stream=True, batch_files=4))
+
+    assert (tmp_path / "streamed" / "trace.csv").read_text() == (tmp_path / "full" / "trace.csv").read_text()
+    # The error log rows come out batch by batch instead of grouped by error
+    full_lines = (tmp_path / "full" / "error_log.csv").read_text().splitlines()
+    streamed_lines = (tmp_path / "streamed" / "error_log.csv").read_text().splitlines()
+    assert streamed_lines[0] == full_lines[0]
+    assert sorted(streamed_lines[1:]) == sorted(full_lines[1:])
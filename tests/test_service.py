@@ -0,0 +1,58 @@
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import service
+from conftest import run_params
+
+
+def test_fingerprint_only_covers_the_versions_of_the_run(corpus, tmp_path):
+    params = run_params(corpus, tmp_path)
+    tests_path = Path(corpus["automated_tests_path"])
+    version_path = tests_path / corpus["version_num"]
+    shutil.copytree(version_path, tests_path / "9.9.9")
+    fingerprint = service._inputs_fingerprint(params)
+
+    # Another version's files aren't inputs of the run
+    other_file = next((tests_path / "9.9.9" / "Rx").rglob("*.txt"))
+    other_file.write_text(other_file.read_text() + "TestNew|PASSED\n")
+    (tests_path / "9.9.9" / "Rx" / "new.txt").write_text("TestNew|PASSED\n")
+    assert service._inputs_fingerprint(params) == fingerprint
+
+    # The run's own files are, even when one's changed in place
+    txt_file = next((version_path / "RestApiTests").rglob("*.txt"))
+    stat = txt_file.stat()
+    txt_file.write_text(txt_file.read_text() + "TestNew|PASSED\n")
+    os.utime(txt_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert service._inputs_fingerprint(params) != fingerprint
+
+    # With "all", every version is
+    params_all = dict(params, version_num=["all"])
+    fingerprint_all = service._inputs_fingerprint(params_all)
+    (tests_path / "9.9.9" / "Rx" / "new.txt").write_text("TestNew|FAILED\n")
+    assert service._inputs_fingerprint(params_all) != fingerprint_all
+
+
+def test_submit_times_out_if_the_job_takes_too_long():
+    class SlowHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            time.sleep(1)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((service.HOST, 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(TimeoutError, match="didn't finish within 0.2s"):
+            service.submit("run", {}, port=server.server_address[1], timeout=0.2)
+    finally:
+        server.shutdown()
+        server.server_close()
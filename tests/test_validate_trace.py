@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import validate_trace as vt
+
+# Active PRDs US1-US3, obsolete SRS TC9
+REFERENCE = vt.ReferenceIndex(["US1", "US2", "US3"], ["TC9"])
+
+# Trace with rows that break each validation rule, some of them twice
+TRACE = pd.DataFrame([
+    ("TC1 Login works", "US1", "TC1"),
+    ("TC1 Login works", "US1", "TC1"), # duplicate of a valid row
+    ("TC9 Old feature", "US2", "TC9"),
+    ("US7 TC2 Check limits", "US2", "TC2"),
+    ("TC3 Export", "US8", "TC3"),
+    ("Report totals", "US3", None),
+    (None, "US1", "TC4"),
+    ("TC5 Import", None, "TC5"),
+    ("TC5 Import", None, "TC5"), # duplicate of an invalid row
+    ("TC6 Sync", "US2, US8", "TC6"),
+    ("TC9 US7 Everything wrong", "US9", None),
+], columns=["Test Name", "PRD", "SRS ID"])
+
+# Row of TRACE -> errors it's in the error log with
+TRACE_ERRORS = {
+    2: "Test references obsolete SRS",
+    3: "PRD referenced by test does not exist",
+    4: "PRD referenced by SRS does not exist",
+    5: "PRD does not have SRS",
+    6: "SRS does not have test",
+    7: "SRS does not have PRD",
+    8: "SRS does not have PRD",
+    9: "PRD referenced by SRS does not exist",
+    10: "PRD does not have SRS; PRD referenced by SRS does not exist; Test references obsolete SRS; PRD referenced by test does not exist",
+}
+
+
+def _per_group_invalid_rows(trace, key_column, value_column, key_prefix):
+    """Invalid rows of a coverage check, found like the checks did before the groupby-transform masks:
+    one pass over the trace per invalid key (with pd.concat in place of the removed DataFrame.append)"""
+    keyed = trace.loc[trace[key_column].astype("string").str.startswith(key_prefix).fillna(False).astype(bool)]
+    num_unique = keyed.groupby(key_column)[value_column].nunique()
+
+    invalid_df = pd.DataFrame()
+    for val in num_unique.index[num_unique == 0]:
+        invalid_df = pd.concat([invalid_df, keyed[keyed[key_column] == val]])
+    return sorted(invalid_df.index)
+
+
+@pytest.mark.parametrize("check, key_column, value_column, key_prefix", [
+    (vt._check_prd_has_srs, "PRD", "SRS ID", "US"),
+    (vt._check_srs_has_test, "SRS ID", "Test Name", "TC"),
+    (vt._check_srs_has_prd, "SRS ID", "PRD", "TC"),
+])
+def test_coverage_masks_match_per_group_loops(check, key_column, value_column, key_prefix):
+    trace = benchmark.generate_trace(5000)
+    tokenized = vt.TokenizedTrace(trace, vt.ReferenceIndex([], []), "US", "TC")
+
+    invalid = np.flatnonzero(check(tokenized)).tolist()
+    assert len(invalid) > 0
+    assert invalid == _per_group_invalid_rows(trace, key_column, value_column, key_prefix)
+
+
+def test_reference_index_from_files(tmp_path):
+    obs_srs_path = tmp_path / "Obsolete SRS.csv"
+    pd.DataFrame({"Formatted ID": ["TC9", "TC8", "TC9", None]}).to_csv(obs_srs_path, index=False)
+    active_prd_path = tmp_path / "PRD.xlsx"
+    pd.DataFrame({"ID": ["US1", "US2", "US2", None], "Name": ["One", "Two", "Two again", "Blank"]}).to_excel(active_prd_path, index=False)
+
+    reference = vt.ReferenceIndex.from_files(obs_srs_path, active_prd_path)
+
+    # Repeated IDs are kept once and blank cells are dropped
+    assert list(reference.active_prd) == ["US1", "US2"]
+    assert list(reference.obsolete_srs) == ["TC9", "TC8"]
+    assert reference.is_active_prd(pd.Series(["US2", "US3", "US1"])).tolist() == [True, False, True]
+    assert reference.is_obsolete_srs(pd.Series(["TC1", "TC8", "TC9"])).tolist() == [False, True, True]
+    assert reference.is_active_prd(pd.Series([], dtype=object)).tolist() == []
+
+
+def test_tokenized_trace():
+    tokenized = vt.TokenizedTrace(TRACE, REFERENCE, "US", "TC")
+
+    assert tokenized.has_prd.tolist() == [True] * 7 + [False, False, True, True]
+    assert tokenized.has_srs.tolist() == [True] * 5 + [False] + [True] * 4 + [False]
+    # One entry per ID, indexed by the row it's in
+    assert list(tokenized.prd_refs.items()) == [(0, "US1"), (1, "US1"), (2, "US2"), (3, "US2"), (4, "US8"), (5, "US3"),
+                                                (6, "US1"), (9, "US2"), (9, "US8"), (10, "US9")]
+    assert list(tokenized.test_prds.items()) == [(3, "US7"), (10, "US7")]
+    assert list(tokenized.test_srss.items()) == [(0, "TC1"), (1, "TC1"), (2, "TC9"), (3, "TC2"), (4, "TC3"),
+                                                 (7, "TC5"), (8, "TC5"), (9, "TC6"), (10, "TC9")]
+    assert tokenized.rows_with(tokenized.prd_refs, tokenized.prd_refs.to_numpy() == "US8").tolist() == [False] * 4 + [True] + [False] * 4 + [True, False]
+
+
+@pytest.mark.parametrize("error, check", vt.VALIDATION_RULES)
+def test_each_validation_rule(error, check):
+    failed = check(vt.TokenizedTrace(TRACE, REFERENCE, "US", "TC"))
+    assert np.flatnonzero(failed).tolist() == [row for row, errors in TRACE_ERRORS.items() if error in errors.split("; ")]
+
+
+def test_validate_trace_splits_off_the_invalid_rows_with_their_errors():
+    valid_df, invalid_dfs = vt.validate_trace(TRACE, None, None, reference=REFERENCE)
+
+    assert valid_df.equals(TRACE.loc[[0, 1]])
+    assert len(invalid_dfs) == 1
+    invalid_df = invalid_dfs[0]
+    assert invalid_df.index.tolist() == list(TRACE_ERRORS)
+    assert invalid_df["Error"].tolist() == list(TRACE_ERRORS.values())
+    assert (invalid_df["Source"] == "Validation").all()
+    assert invalid_df.drop(columns=["Error", "Source"]).equals(TRACE.loc[list(TRACE_ERRORS)])
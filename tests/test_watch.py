@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pandas as pd
+
+import create_trace as ct
+from folder_manifest import FolderManifest
+from watch import TraceWatch
+
+
+def _rows(dfs, columns=None, sort=False):
+    """Rows of some dataframes as text, optionally only some columns and sorted, for comparing"""
+    df = pd.concat(dfs, ignore_index=True).astype(object)
+    df = df.where(df.notna(), "")
+    if columns is not None:
+        df = df[columns]
+    if sort:
+        df = df.sort_values(list(df.columns))
+    return df.reset_index(drop=True)
+
+
+def test_update_matches_a_fresh_trace(corpus, tmp_path, monkeypatch):
+    inputs = (corpus["automated_tests_path"], corpus["manual_as_runs"], corpus["version_num"], "TC")
+    version_path = Path(corpus["automated_tests_path"]) / corpus["version_num"]
+    watch = TraceWatch(*inputs, manifest_dir=tmp_path / "manifests")
+
+    # Changes each folder's manifest reports
+    changes = []
+    scan = FolderManifest.scan
+
+    def spy(manifest, full=False):
+        result = scan(manifest, full)
+        changes.append(result)
+        return result
+
+    monkeypatch.setattr(FolderManifest, "scan", spy)
+
+    added = version_path / "Rx" / "RC1" / "TeamCity" / "new-LegacyTrace-GroupByMethod.txt"
+    added.write_text("RxTest TC7 New_case|PASSED\nRxTest TC8 Skipped_case|SKIPPED\n")
+    changed = sorted((version_path / "RestApiTests").rglob("*.txt"))[0]
+    changed.write_text(changed.read_text() + "com.philips.sapphire.systemintegrationtests.TC9 tests.auth.Added|FAILED\n")
+    removed = sorted((version_path / "Rx").rglob("*.txt"))[1]
+    removed.unlink()
+
+    assert watch.update() == 3
+    assert [path for result in changes for path in result["added"]] == [added]
+    assert [path for result in changes for path in result["changed"]] == [changed]
+    assert [path for result in changes for path in result["removed"]] == [removed]
+
+    trace, invalid_dfs = ct.create_trace(*inputs)
+    pd.testing.assert_frame_equal(_rows([watch.trace()]), _rows([trace]))
+    # The error log rows come out file by file instead of grouped by error
+    expected = _rows(invalid_dfs, sort=True)
+    pd.testing.assert_frame_equal(_rows(watch.invalid_dfs(), list(expected.columns), sort=True), expected)
+
+    # Nothing changed since
+    changes.clear()
+    assert watch.update() == 0
+    assert all(len(paths) == 0 for result in changes for paths in result.values())